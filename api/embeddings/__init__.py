@@ -3,10 +3,19 @@
 Embeddings package: chunking and embedding Job Descriptions into MinIO + Milvus.
 """
 
-from .chunk_utils import chunk_text
-from .jd_chunk_embed import main as run_jd_chunk_embed
+from .chunk_utils import Chunk, chunk_text, iter_chunks
+
+
+def run_jd_chunk_embed():
+    # Imported lazily: jd_chunk_embed pulls in psycopg2/MinIO/Milvus clients,
+    # which offline users of this package (batching, benchmarks) don't need.
+    from .jd_chunk_embed import main
+    return main()
+
 
 __all__ = [
+    "Chunk",
     "chunk_text",
+    "iter_chunks",
     "run_jd_chunk_embed",
 ]
@@ -0,0 +1,92 @@
+"""
+embeddings/batching.py
+
+Cross-document batching for the embedding stage.
+
+Chunks from many JDs are packed into API-maximal batches (bounded by item
+count and an approximate token budget), the batches are embedded concurrently
+by a bounded worker pool, and the vectors are scattered back to their
+(jd_id, chunk_index) keys.
+"""
+
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Hashable, Iterable, Iterator
+
+EMBED_BATCH_MAX_ITEMS  = int(os.getenv("EMBED_BATCH_MAX_ITEMS", "100"))    # Gemini batch limit
+EMBED_BATCH_MAX_TOKENS = int(os.getenv("EMBED_BATCH_MAX_TOKENS", "20000"))
+EMBED_WORKERS          = int(os.getenv("EMBED_WORKERS", "4"))
+
+EmbedFn = Callable[[list[str]], list[list[float]]]
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token), good enough for packing."""
+    return max(1, len(text) // 4)
+
+
+def pack_batches(
+    items: Iterable[tuple[Hashable, str]],
+    max_items: int = EMBED_BATCH_MAX_ITEMS,
+    max_tokens: int = EMBED_BATCH_MAX_TOKENS,
+) -> Iterator[list[tuple[Hashable, str]]]:
+    """
+    Greedily pack (key, text) pairs into batches of at most `max_items`
+    items and `max_tokens` estimated tokens. A single text larger than
+    `max_tokens` is sent in a batch of its own.
+    """
+    batch: list[tuple[Hashable, str]] = []
+    batch_tokens = 0
+    for key, text in items:
+        tokens = estimate_tokens(text)
+        if batch and (len(batch) >= max_items or batch_tokens + tokens > max_tokens):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append((key, text))
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+
+def embed_batched(
+    items: Iterable[tuple[Hashable, str]],
+    embed_fn: EmbedFn,
+    max_items: int = EMBED_BATCH_MAX_ITEMS,
+    max_tokens: int = EMBED_BATCH_MAX_TOKENS,
+    workers: int = EMBED_WORKERS,
+) -> dict[Hashable, list[float]]:
+    """
+    Embed (key, text) pairs with `embed_fn`, running up to `workers` batches
+    concurrently. At most `2 * workers` batches are in flight, so the input
+    iterable is consumed lazily.
+
+    Returns:
+        A dict mapping each key (e.g. (jd_id, chunk_index)) to its vector.
+    """
+    out: dict[Hashable, list[float]] = {}
+
+    def run(batch: list[tuple[Hashable, str]]):
+        vectors = embed_fn([text for _, text in batch])
+        if len(vectors) != len(batch):
+            raise RuntimeError(f"Embedder returned {len(vectors)} vectors for {len(batch)} inputs")
+        return batch, vectors
+
+    if workers <= 1:
+        for batch in pack_batches(items, max_items, max_tokens):
+            batch, vectors = run(batch)
+            out.update((key, vec) for (key, _), vec in zip(batch, vectors))
+        return out
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for batch in pack_batches(items, max_items, max_tokens):
+            pending.add(pool.submit(run, batch))
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    batch, vectors = fut.result()
+                    out.update((key, vec) for (key, _), vec in zip(batch, vectors))
+        for fut in pending:
+            batch, vectors = fut.result()
+            out.update((key, vec) for (key, _), vec in zip(batch, vectors))
+    return out
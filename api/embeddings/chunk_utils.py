@@ -2,51 +2,288 @@
 embeddings/chunk_utils.py
 
 Utility functions for splitting text into manageable chunks.
+
+One chunking engine for JDs and resumes: a single linear pass over the lines
+of a (Markdown) document.
+
+- Blocks are paragraphs (runs of non-blank lines); a heading line
+  ("### Responsibilities") always starts a new block and is kept together
+  with the block that follows it, so a chunk never ends on a bare heading.
+- Blocks are packed greedily into chunks of at most `max_words` words (and
+  `max_tokens` tokens, if given). A block that is too large on its own is
+  split at line boundaries (list items), then into word windows.
+- A chunk that starts in the middle of a section repeats the section's
+  heading line, and can start with the last `overlap` words of the previous
+  chunk.
+
+Every block's size is computed once, so the cost is linear in the document
+length; iter_chunks streams chunks as a generator.
 """
-from typing import List
+import os
+import re
+from bisect import bisect_right
+from itertools import accumulate
+from typing import Callable, Iterator, List, NamedTuple, Optional
+
+CHUNK_MAX_WORDS     = int(os.getenv("CHUNK_MAX_WORDS", "300"))
+CHUNK_OVERLAP_WORDS = int(os.getenv("CHUNK_OVERLAP_WORDS", "0"))
+CHUNK_MAX_TOKENS    = int(os.getenv("CHUNK_MAX_TOKENS", "0")) or None  # 0 = no token limit
+
+# Bump when the chunking rules change, so indexes built with the old rules are refreshed
+CHUNKER_VERSION = 2
+# Everything that determines the chunks (part of jd_chunk_embed's content hash)
+CHUNK_SIGNATURE = f"v{CHUNKER_VERSION}:{CHUNK_MAX_WORDS}:{CHUNK_OVERLAP_WORDS}:{CHUNK_MAX_TOKENS}"
+
+HEADING_RE = re.compile(r"^\s{0,3}(#{1,6})\s+(.*?)[\s#]*$")
+
+
+class Chunk(NamedTuple):
+    index: int
+    text: str
+    section: Optional[str]  # heading path the chunk starts in, e.g. "Requirements"
+    words: int
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) when no tokenizer is given."""
+    return (len(text) + 3) // 4
+
+
+class _Block(NamedTuple):
+    sep: str              # separator before the block in the source ("\n\n" or "\n")
+    text: str
+    section: Optional[str]
+    heading: Optional[str]  # heading line of the section the block belongs to
+    starts_section: bool
+    words: int
+    tokens: int
+
+
+def _runs(text: str) -> Iterator[tuple[str, list[str]]]:
+    """(separator, lines) of each paragraph; heading lines start a new one."""
+    run: list[str] = []
+    sep, gap = "", ""
+    for line in text.splitlines():
+        if not line.strip():
+            if run:
+                yield sep, run
+                run = []
+            gap = "\n\n"
+            continue
+        if run and HEADING_RE.match(line):
+            yield sep, run
+            run, gap = [], "\n"
+        if not run:
+            sep, gap = (gap if gap else ""), ""
+        run.append(line)
+    if run:
+        yield sep, run
+
+
+def _leading_section(text: str) -> Optional[str]:
+    """Section of the first block: the heading path the document starts with."""
+    titles: dict[int, str] = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        m = HEADING_RE.match(line)
+        if not m:
+            break
+        level = len(m.group(1))
+        titles = {lvl: t for lvl, t in titles.items() if lvl < level}
+        titles[level] = m.group(2)
+    return " > ".join(titles[lvl] for lvl in sorted(titles)) or None
+
+
+def _blocks(text: str, count_tokens: Optional[Callable[[str], int]]) -> Iterator[_Block]:
+    """Paragraph blocks with their section; bare headings are merged into the next block."""
+    titles: dict[int, str] = {}
+    section = heading = None
+    pending_sep, pending = None, []
+    for sep, lines in _runs(text):
+        m = HEADING_RE.match(lines[0])
+        if m:
+            level = len(m.group(1))
+            titles = {lvl: t for lvl, t in titles.items() if lvl < level}
+            titles[level] = m.group(2)
+            section = " > ".join(titles[lvl] for lvl in sorted(titles))
+            heading = lines[0].strip()
+        if m and len(lines) == 1:
+            # Bare heading: glue it to whatever follows
+            if pending_sep is None:
+                pending_sep = sep
+            else:
+                pending.append(sep)
+            pending.append(lines[0])
+            continue
+        body = "\n".join(lines)
+        starts = bool(m)
+        if pending:
+            body = "".join(pending) + sep + body
+            sep, pending_sep, pending, starts = pending_sep, None, [], True
+        yield _Block(sep, body, section, heading, starts, len(body.split()),
+                     count_tokens(sep + body) if count_tokens else 0)
+    if pending:
+        body = "".join(pending)
+        yield _Block(pending_sep, body, section, heading, True, len(body.split()),
+                     count_tokens(pending_sep + body) if count_tokens else 0)
+
+
+def _split_block(block: _Block, max_words: int, max_tokens: Optional[int],
+                 count_tokens: Optional[Callable[[str], int]]) -> Iterator[_Block]:
+    """Pieces of an oversized block: whole lines where possible, else word windows."""
+    def piece(sep, text, first):
+        return block._replace(sep=sep, text=text, starts_section=block.starts_section and first,
+                              words=len(text.split()), tokens=count_tokens(sep + text) if count_tokens else 0)
 
+    def fits(w, t):
+        return w <= max_words and (max_tokens is None or t <= max_tokens)
 
-def chunk_text(text: str, max_words: int = 300) -> List[str]:
+    lines: list[str] = []
+    words = tokens = 0
+    first = True
+    headings_only = False  # `lines` holds nothing but heading lines
+    for line in block.text.split("\n"):
+        split_line = line.split()
+        line_words = len(split_line)
+        line_tokens = count_tokens(line + "\n") if count_tokens else 0
+        is_heading = bool(HEADING_RE.match(line))
+        if fits(words + line_words, tokens + line_tokens):
+            headings_only = is_heading and (headings_only or not lines)
+            lines.append(line)
+            words += line_words
+            tokens += line_tokens
+            continue
+        if lines and not headings_only:
+            yield piece(block.sep if first else "\n", "\n".join(lines), first)
+            lines, words, tokens, first = [], 0, 0, False
+            if fits(line_words, line_tokens):
+                lines, words, tokens, headings_only = [line], line_words, line_tokens, is_heading
+                continue
+        # Word windows (list slices); headings right before the line go into the first one
+        lead = "\n".join(lines)
+        line_words = split_line
+        cum = list(accumulate((count_tokens(w + " ") for w in line_words), initial=0)) if count_tokens else None
+        pos = 0
+        while pos < len(line_words):
+            end = min(pos + max_words - words, len(line_words))
+            if cum is not None:
+                end = min(end, bisect_right(cum, cum[pos] + max_tokens - tokens) - 1)
+            if end <= pos:
+                if lead:
+                    # Not even one more word fits next to the headings
+                    yield piece(block.sep if first else "\n", lead, first)
+                    lead, words, tokens, first = "", 0, 0, False
+                    continue
+                end = pos + 1  # a single word over the token limit
+            window = " ".join(line_words[pos:end])
+            text = f"{lead}\n{window}" if lead else window
+            window_tokens = cum[end] - cum[pos] if cum is not None else 0
+            if end < len(line_words):
+                yield piece(block.sep if first else "\n", text, first)
+                lead, words, tokens, first = "", 0, 0, False
+            else:
+                # The last window stays open for the lines that follow
+                lines, words, tokens = [text], words + end - pos, tokens + window_tokens
+            pos = end
+        headings_only = False
+    if lines:
+        yield piece(block.sep if first else "\n", "\n".join(lines), first)
+
+
+def iter_chunks(text: str, max_words: int = CHUNK_MAX_WORDS, overlap: int = CHUNK_OVERLAP_WORDS,
+                max_tokens: Optional[int] = CHUNK_MAX_TOKENS,
+                count_tokens: Optional[Callable[[str], int]] = None,
+                repeat_headings: bool = True) -> Iterator[Chunk]:
+    """
+    Stream the chunks of `text` (see module docstring).
+
+    Args:
+        text: The full text to chunk (e.g., a job description in Markdown).
+        max_words: Maximum number of words per chunk.
+        overlap: Words of the previous chunk repeated at the start of the next one.
+        max_tokens: Optional token limit per chunk, counted with `count_tokens`
+            (default: estimate_tokens). Pieces are costed with their separators,
+            which keeps the summed estimate an upper bound.
+        repeat_headings: Prefix chunks that start mid-section with the section heading.
+    """
+    if overlap >= max_words:
+        raise ValueError("overlap must be smaller than max_words")
+    if max_tokens is not None and count_tokens is None:
+        count_tokens = estimate_tokens
+    if max_tokens is None:
+        count_tokens = None
+
+    def fits(w, t):
+        return w <= max_words and (max_tokens is None or t <= max_tokens)
+
+    def size(s):
+        # Token costs include separators, so summing them never underestimates
+        return len(s.split()), (count_tokens(s + "\n\n") if count_tokens else 0)
+
+    # Short documents usually fit in one chunk: the document itself
+    words = len(text.split()) if len(text) <= 50 * max_words else 0
+    if words and fits(words, size(text)[1]):
+        yield Chunk(0, text.strip(), _leading_section(text), words)
+        return
+
+    index = 0
+    parts: list[str] = []
+    words = tokens = 0
+    section = None
+    for raw in _blocks(text, count_tokens):
+        if fits(raw.words, raw.tokens):
+            pieces = [raw]
+        else:
+            # Leave room for the heading / overlap prefix of continuation pieces
+            reserve_w, reserve_t = size(raw.heading) if repeat_headings and raw.heading else (0, 0)
+            reserve_w += overlap
+            reserve_t += 2 * overlap if max_tokens else 0
+            pieces = _split_block(raw, max(max_words - reserve_w, 1),
+                                  max(max_tokens - reserve_t, 1) if max_tokens else None, count_tokens)
+        for block in pieces:
+            if parts and fits(words + block.words, tokens + block.tokens):
+                parts += [block.sep, block.text]
+                words += block.words
+                tokens += block.tokens
+                continue
+            prefix = ""
+            if parts:
+                chunk = "".join(parts).strip()
+                yield Chunk(index, chunk, section, words)
+                index += 1
+                # Context carried into the next chunk, dropped if the block would not fit
+                tail = " ".join(chunk.split()[-overlap:]) if overlap else ""
+                heading = block.heading if repeat_headings and not block.starts_section else ""
+                candidates = [f"{heading}\n{tail}"] if heading and tail else []
+                for candidate in candidates + [c for c in (heading, tail) if c]:
+                    w, t = size(candidate)
+                    if fits(w + block.words, t + block.tokens):
+                        prefix = candidate
+                        break
+            words, tokens = size(prefix) if prefix else (0, 0)
+            parts = [prefix, "\n\n" if prefix else "", block.text]
+            words += block.words
+            tokens += block.tokens
+            section = block.section
+    if parts:
+        chunk = "".join(parts).strip()
+        if chunk:
+            yield Chunk(index, chunk, section, words)
+
+
+def chunk_text(text: str, max_words: int = CHUNK_MAX_WORDS, overlap: int = CHUNK_OVERLAP_WORDS,
+               max_tokens: Optional[int] = CHUNK_MAX_TOKENS) -> List[str]:
     """
     Split the given text into chunks of up to `max_words` words, preserving paragraph boundaries.
 
     Args:
         text: The full text to chunk (e.g., a job description in Markdown).
         max_words: Maximum number of words per chunk.
+        overlap: Words repeated from the previous chunk.
+        max_tokens: Optional token limit per chunk.
 
     Returns:
         A list of text chunks.
     """
-    # Split by double newlines to respect paragraphs
-    paragraphs = text.split("\n\n")
-    chunks: List[str] = []
-    current_chunk = []
-    current_word_count = 0
-
-    for para in paragraphs:
-        words = para.split()
-        if current_word_count + len(words) <= max_words:
-            # Add paragraph to current chunk
-            current_chunk.append(para)
-            current_word_count += len(words)
-        else:
-            # Flush current chunk
-            if current_chunk:
-                chunks.append("\n\n".join(current_chunk).strip())
-            # Start new chunk(s)
-            if len(words) > max_words:
-                # If a single paragraph is too long, split it by words
-                for i in range(0, len(words), max_words):
-                    part = words[i : i + max_words]
-                    chunks.append(" ".join(part).strip())
-                current_chunk = []
-                current_word_count = 0
-            else:
-                current_chunk = [para]
-                current_word_count = len(words)
-
-    # Append the final chunk
-    if current_chunk:
-        chunks.append("\n\n".join(current_chunk).strip())
-
-    return chunks
+    return [c.text for c in iter_chunks(text, max_words, overlap, max_tokens)]
@@ -0,0 +1,105 @@
+"""
+embeddings/index_state.py
+
+What the vector index holds for each JD (jd_index_state, see migrations 004
+and 010) and how jd_chunk_embed picks the JDs to re-index.
+
+A JD is a candidate when it is new, when its version / updated_at moved, or
+when the md5 of its metadata columns (META_HASH_SQL) differs from the one
+stored at index time: tags and front-matter attributes change without a
+version bump (e.g. jd_taxonomy_etl tagging JDs). Among the candidates, only
+those whose content_hash (chunking config + metadata + content) changed are
+re-chunked and re-embedded; the others just get their state row refreshed.
+"""
+
+import hashlib
+from typing import Iterable, NamedTuple
+
+from api.embeddings.chunk_utils import CHUNK_SIGNATURE, chunk_text
+from utils.jd_metadata import FILTER_FIELDS, MAX_TAGS, MAX_VALUE_LENGTH, TAGS, normalize_meta
+
+STATE_DDL = """
+ALTER TABLE job_descriptions ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;
+
+CREATE TABLE IF NOT EXISTS jd_index_state (
+  jd_id             INT PRIMARY KEY,
+  version           INT NOT NULL,
+  source_updated_at TIMESTAMP,
+  content_hash      CHAR(64) NOT NULL,
+  chunk_count       INT NOT NULL,
+  indexed_at        TIMESTAMP NOT NULL DEFAULT NOW()
+);
+ALTER TABLE jd_index_state ADD COLUMN IF NOT EXISTS meta_hash CHAR(32);
+"""
+
+# Joins META_SQL needs next to `job_descriptions jd`; tags are aggregated once per JD
+META_JOINS = """
+    LEFT JOIN job_families f ON f.family_id = jd.family_id
+    CROSS JOIN LATERAL (
+        SELECT ARRAY(SELECT t.tag_name FROM jd_tag_map m JOIN jd_taxonomy_tags t ON t.tag_id = m.tag_id
+                     WHERE m.jd_id = jd.jd_id ORDER BY 1) AS tags
+    ) tg
+"""
+
+# JD metadata columns, in FILTER_FIELDS order followed by tags
+META_SQL = "jd.department, f.name, jd.level, jd.location, jd.employment_type, tg.tags"
+
+META_HASH_SQL = f"md5(ROW({META_SQL})::text)"
+
+CANDIDATES_SQL = f"""
+    SELECT jd.jd_id, jd.version, jd.updated_at, jd.content_md, s.content_hash, s.chunk_count,
+           {META_HASH_SQL}, {META_SQL}
+    FROM job_descriptions jd
+    LEFT JOIN jd_index_state s ON s.jd_id = jd.jd_id
+    {META_JOINS}
+    WHERE s.jd_id IS NULL
+       OR s.version <> jd.version
+       OR s.source_updated_at IS DISTINCT FROM jd.updated_at
+       OR s.meta_hash IS DISTINCT FROM {META_HASH_SQL}
+    ORDER BY jd.jd_id;
+"""
+
+
+def jd_meta(row) -> dict:
+    """Metadata dict from the META_SQL columns, values in normalize_value form."""
+    department, family, level, location, employment_type, tags = row
+    values = {"family": family, "level": level, "department": department,
+              "location": location, "employment_type": employment_type}
+    meta = normalize_meta({**values, TAGS: tags})
+    for field in FILTER_FIELDS:
+        meta[field] = meta[field][:MAX_VALUE_LENGTH] if meta[field] else None
+    meta[TAGS] = [t[:MAX_VALUE_LENGTH] for t in meta[TAGS]][:MAX_TAGS]
+    return meta
+
+
+def content_hash(content: str, meta: dict = None) -> str:
+    # The chunking config is part of the hash so changing it re-indexes everything;
+    # so is the metadata, which is stored on every chunk
+    meta_key = repr(sorted((meta or {}).items()))
+    return hashlib.sha256(f"{CHUNK_SIGNATURE}\n{meta_key}\n{content}".encode("utf-8")).hexdigest()
+
+
+class WindowPlan(NamedTuple):
+    state_rows: list     # (jd_id, version, updated_at, content_hash, chunk_count, meta_hash)
+    jd_chunks: dict      # jd_id -> chunks to embed, for JDs whose content or metadata changed
+    old_counts: dict     # jd_id -> chunk count currently indexed
+    metas: dict          # jd_id -> metadata dict
+    unchanged: int       # candidates that only need their state row refreshed
+
+
+def plan_window(rows: Iterable[tuple]) -> WindowPlan:
+    """Split a window of CANDIDATES_SQL rows into JDs to re-index and bookkeeping-only ones."""
+    plan = WindowPlan([], {}, {}, {}, 0)
+    unchanged = 0
+    for jd_id, version, updated_at, content, old_hash, old_count, meta_hash, *meta_row in rows:
+        plan.metas[jd_id] = jd_meta(meta_row)
+        new_hash = content_hash(content, plan.metas[jd_id])
+        if new_hash == old_hash:
+            # Version bumped but content and metadata identical: bookkeeping only
+            plan.state_rows.append((jd_id, version, updated_at, new_hash, old_count, meta_hash))
+            unchanged += 1
+            continue
+        plan.jd_chunks[jd_id] = chunk_text(content)
+        plan.old_counts[jd_id] = old_count or 0
+        plan.state_rows.append((jd_id, version, updated_at, new_hash, len(plan.jd_chunks[jd_id]), meta_hash))
+    return plan._replace(unchanged=unchanged)
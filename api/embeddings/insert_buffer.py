@@ -0,0 +1,108 @@
+"""
+embeddings/insert_buffer.py
+
+Row buffer in front of Milvus insert/upsert.
+
+Rows from many JDs are accumulated and written in large column-wise requests
+once a row-count or byte-size threshold is reached. Nothing calls
+collection.flush() until close(), so Milvus seals segments at its own size
+thresholds instead of one tiny segment per JD.
+"""
+
+import os
+import sys
+import time
+from typing import Optional
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from utils.jd_metadata import FILTER_FIELDS, MAX_TAGS, TAGS
+
+MILVUS_INSERT_MAX_ROWS = int(os.getenv("MILVUS_INSERT_MAX_ROWS", "5000"))
+MILVUS_INSERT_MAX_MB   = float(os.getenv("MILVUS_INSERT_MAX_MB", "32"))  # gRPC messages cap at 64 MB
+
+
+class InsertBuffer:
+    """
+    Buffer of (chunk_id, embedding, jd_id, chunk_index, object_url, <JD
+    metadata fields>, tags) rows.
+
+    Args:
+        collection: target pymilvus Collection.
+        upsert: use collection.upsert (replaces rows with the same chunk_id)
+            instead of collection.insert.
+        max_rows / max_bytes: write once either threshold is reached.
+    """
+
+    def __init__(self, collection, upsert: bool = False,
+                 max_rows: int = MILVUS_INSERT_MAX_ROWS,
+                 max_bytes: int = int(MILVUS_INSERT_MAX_MB * 1024 * 1024)):
+        self.collection = collection  # schema: see jd_chunk_embed.open_collection
+        self.upsert = upsert
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self._columns: list[list] = self._empty_columns()
+        self._bytes = 0
+        self.rows_written = 0
+        self.requests = 0
+        self.write_seconds = 0.0
+        self.flush_seconds = 0.0
+        self.compact_seconds = 0.0
+
+    @staticmethod
+    def _empty_columns() -> list[list]:
+        return [[] for _ in range(5 + len(FILTER_FIELDS) + 1)]
+
+    def __len__(self) -> int:
+        return len(self._columns[0])
+
+    def add(self, chunk_id: str, vector: list[float], jd_id: int, chunk_index: int, object_url: str,
+            meta: Optional[dict] = None) -> None:
+        meta = meta or {}
+        # Milvus scalar fields are not nullable: missing values are stored as ""
+        values = [meta.get(field) or "" for field in FILTER_FIELDS]
+        tags = list(meta.get(TAGS) or [])[:MAX_TAGS]
+        row = (chunk_id, vector, jd_id, chunk_index, object_url, *values, tags)
+        for column, value in zip(self._columns, row):
+            column.append(value)
+        # float32 on the wire + varchar payloads + two INT64s
+        self._bytes += (4 * len(vector) + len(chunk_id) + len(object_url) + 16
+                        + sum(map(len, values)) + sum(map(len, tags)))
+        if len(self) >= self.max_rows or self._bytes >= self.max_bytes:
+            self.write()
+
+    def write(self) -> int:
+        """Send buffered rows to Milvus (no flush). Returns the number written."""
+        if not len(self):
+            return 0
+        t0 = time.perf_counter()
+        if self.upsert:
+            count = self.collection.upsert(self._columns).upsert_count
+        else:
+            count = self.collection.insert(self._columns).insert_count
+        self.write_seconds += time.perf_counter() - t0
+        self.rows_written += count
+        self.requests += 1
+        self._columns = self._empty_columns()
+        self._bytes = 0
+        return count
+
+    def close(self, compact: bool = False) -> None:
+        """Write what is left, flush once and optionally trigger a compaction."""
+        self.write()
+        t0 = time.perf_counter()
+        self.collection.flush()
+        self.flush_seconds = time.perf_counter() - t0
+        if compact:
+            t0 = time.perf_counter()
+            self.collection.compact()
+            self.collection.wait_for_compaction_completed()
+            self.compact_seconds = time.perf_counter() - t0
+
+    def stats(self) -> dict:
+        return {
+            "rows_written": self.rows_written,
+            "requests": self.requests,
+            "write_seconds": round(self.write_seconds, 3),
+            "flush_seconds": round(self.flush_seconds, 3),
+            "compact_seconds": round(self.compact_seconds, 3),
+        }
@@ -4,6 +4,25 @@ embeddings/jd_chunk_embed.py
 
 Chunk Job Descriptions, embed via Gemini REST, upload chunk text to MinIO,
 and store embeddings + metadata in Milvus.
+
+By default the run is incremental: jd_index_state records the version,
+updated_at, content hash and metadata hash of every indexed JD, and only
+new/changed JDs are re-embedded and upserted (removed JDs are deleted; see
+index_state.py). Set EMBED_MODE=full to
+drop and rebuild the collection.
+
+Every chunk also carries its JD's metadata (family, level, department,
+location, employment_type, tags; see utils/jd_metadata.py) so the retriever
+can filter inside the vector / lexical search.
+
+When anything changed, the BM25 lexical index (utils/lexical_index.py) is
+rebuilt from the same chunks, so the retriever's lexical/hybrid modes see
+exactly what is in the vector index.
+
+The vector index is sized to the collection at the end of every run (see
+recommend_index in utils/vector_index.py): with the default
+MILVUS_INDEX_TYPE=AUTO and MILVUS_NLIST=0 it is rebuilt when the collection
+outgrows FLAT, or when its nlist no longer matches the row count.
 """
 
 from dotenv import load_dotenv
@@ -11,13 +30,27 @@ import os
 import sys
 import time
 import psycopg2
+from psycopg2.extras import execute_values
 from minio import Minio
+from minio.deleteobjects import DeleteObject
 from pymilvus import connections, FieldSchema, CollectionSchema, DataType, Collection, utility
+from pymilvus.client.types import LoadState
 from tqdm import tqdm
 import io
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 from utils.gemini_embed import embed_text  
+from utils.embed_cache import embed_cache_stats
+from api.embeddings.batching import embed_batched
+from api.embeddings.chunk_utils import chunk_text
+from api.embeddings.insert_buffer import InsertBuffer
+from utils.vector_index import (LocalIndexBuilder, LocalVectorIndex, LOCAL_INDEX_DIR, milvus_current_index,
+                                milvus_index_params)
+from utils.chunk_store import ChunkTextStore
+from utils.lexical_index import BM25Index, LEXICAL_INDEX_DIR
+from utils.index_generation import bump_generation
+from utils.jd_metadata import FILTER_FIELDS, MAX_TAGS, MAX_VALUE_LENGTH, TAGS, MetadataColumns
+from api.embeddings.index_state import CANDIDATES_SQL, META_JOINS, META_SQL, STATE_DDL, jd_meta, plan_window
 
 # 1. Load .env
 load_dotenv()
@@ -43,120 +76,337 @@ VECTOR_DIM        = int(os.getenv("VECTOR_DIM", "768"))
 print(f"INFO: Using vector dimension: {VECTOR_DIM}")
 
 
-# Connect MinIO
-minio_client = Minio(
-    MINIO_ENDPOINT,
-    access_key=MINIO_ACCESS_KEY,
-    secret_key=MINIO_SECRET_KEY,
-    secure=False
-)
-if not minio_client.bucket_exists(MINIO_BUCKET):
-    minio_client.make_bucket(MINIO_BUCKET)
+EMBED_WINDOW_JDS  = int(os.getenv("EMBED_WINDOW_JDS", "1000"))  # JDs chunked+embedded per window
+# "incremental": only re-embed JDs whose content changed since the last run;
+# "full": drop the collection and rebuild everything.
+EMBED_MODE        = os.getenv("EMBED_MODE", "incremental")
+MILVUS_COMPACT    = os.getenv("MILVUS_COMPACT", "0").lower() in ("1", "true", "yes")
+# Where vectors go: "milvus", "local" (in-process index under LOCAL_INDEX_DIR,
+# no Milvus needed) or "both" (e.g. to measure Milvus recall against exact search)
+VECTOR_BACKEND    = os.getenv("VECTOR_BACKEND", "milvus")
+LEXICAL_INDEX     = os.getenv("LEXICAL_INDEX", "1").lower() in ("1", "true", "yes")
 
-# Connect Milvus with retry logic
-print("Connecting to Milvus...")
-for i in range(30):  # thử 30 lần, mỗi lần cách nhau 2s
-    try:
-        connections.connect("default", host=MILVUS_HOST, port=MILVUS_PORT)
-        print("✅ Milvus connected!")
-        break
-    except Exception as e:
-        print(f"Waiting for Milvus to be ready... ({i+1}/30)")
-        time.sleep(2)
-else:
-    raise RuntimeError("Milvus is not ready after waiting.")
-
-# Define schema
-fields = [
-    FieldSchema(name="chunk_id",    dtype=DataType.VARCHAR,     is_primary=True, max_length=64),
-    FieldSchema(name="embedding",   dtype=DataType.FLOAT_VECTOR, dim=VECTOR_DIM),
-    FieldSchema(name="jd_id",       dtype=DataType.INT64),
-    FieldSchema(name="chunk_index", dtype=DataType.INT64),
-    FieldSchema(name="object_url",  dtype=DataType.VARCHAR,     max_length=512), 
-]
-schema = CollectionSchema(fields, description="JD chunks with embeddings")
-
-if utility.has_collection(MILVUS_COLLECTION):
-    print(f"Dropping existing collection '{MILVUS_COLLECTION}' to ensure clean state...")
-    utility.drop_collection(MILVUS_COLLECTION)
-
-print(f"INFO: Creating collection '{MILVUS_COLLECTION}' with schema...")
-collection = Collection(name=MILVUS_COLLECTION, schema=schema)
-
-# Create index with COSINE similarity for better text embedding search
-index_params = {
-    "metric_type": "COSINE",
-    "index_type": "IVF_FLAT",
-    "params": {"nlist": 1024}
-}
-print("Creating COSINE similarity index on embedding field...")
-collection.create_index(field_name="embedding", index_params=index_params)
-print("✅ Index created successfully")
-
-
-# Connect PostgreSQL
-psql_conn = psycopg2.connect(
-    host=DB_HOST, port=DB_PORT,
-    database=DB_NAME, user=DB_USER, password=DB_PASS
-)
-psql_cur = psql_conn.cursor()
-
-def chunk_text(text: str, max_words: int = 300) -> list[str]:
-    paras, chunks, current = text.split("\n\n"), [], ""
-    for p in paras:
-        words = (current + " " + p).split()
-        if len(words) <= max_words:
-            current = (current + "\n\n" + p).strip()
-        else:
-            if current:
-                chunks.append(current.strip())
-            current = p
-    if current:
-        chunks.append(current.strip())
-    return chunks
-
-# Process JDs
-psql_cur.execute("SELECT jd_id, content_md FROM job_descriptions;")
-total_inserted_count = 0
-for jd_id, content in tqdm(psql_cur.fetchall(), desc="Embedding JDs"):
-    chunks = chunk_text(content)
-    if not chunks:
-        continue
-        
-    embeddings = embed_text(chunks)  # Gemini SDK
-    chunk_ids, vecs, jd_ids, idxs, urls = [], [], [], [], []
-    for idx, (chunk, vec) in enumerate(zip(chunks, embeddings)):
-        cid = f"{jd_id}_{idx}"
-        obj = f"jd_{jd_id}_chunk_{idx}.txt"
-        data = chunk.encode("utf-8")
+
+def connect_minio() -> Minio:
+    minio_client = Minio(
+        MINIO_ENDPOINT,
+        access_key=MINIO_ACCESS_KEY,
+        secret_key=MINIO_SECRET_KEY,
+        secure=False
+    )
+    if not minio_client.bucket_exists(MINIO_BUCKET):
+        minio_client.make_bucket(MINIO_BUCKET)
+    return minio_client
+
+
+def connect_milvus() -> None:
+    # Connect Milvus with retry logic
+    print("Connecting to Milvus...")
+    for i in range(30):  # thử 30 lần, mỗi lần cách nhau 2s
         try:
-            minio_client.put_object(
-                MINIO_BUCKET, 
-                obj, 
-                io.BytesIO(data), 
-                len(data),
-                content_type="text/plain"
-            )
-            url = f"http://{MINIO_ENDPOINT}/{MINIO_BUCKET}/{obj}"
-
-            chunk_ids.append(cid)
-            vecs.append(vec)
-            jd_ids.append(jd_id)
-            idxs.append(idx)
-            urls.append(url)
-        except Exception as minio_err:
-            print(f"❌ Failed to upload chunk {cid} to MinIO: {minio_err}")
-
-
-    if chunk_ids: 
-        insert_result = collection.insert([chunk_ids, vecs, jd_ids, idxs, urls])
-        collection.flush() # Ensure data is written to disk
-        inserted_count = insert_result.insert_count
-        total_inserted_count += inserted_count
-        # print(f"INFO: Flushed {inserted_count} new entities to Milvus for JD {jd_id}.")
-
-
-psql_cur.close()
-psql_conn.close()
-print(f"✅ Completed chunking & embedding. Total new entities flushed to Milvus: {total_inserted_count}.")
+            connections.connect("default", host=MILVUS_HOST, port=MILVUS_PORT)
+            print("✅ Milvus connected!")
+            break
+        except Exception as e:
+            print(f"Waiting for Milvus to be ready... ({i+1}/30)")
+            time.sleep(2)
+    else:
+        raise RuntimeError("Milvus is not ready after waiting.")
+
+
+def open_collection(full: bool) -> tuple[Collection, bool]:
+    """
+    Reuse the existing collection, or (re)create it when `full` or missing.
+    Returns the collection and whether it was freshly created.
+    """
+    if not full and utility.has_collection(MILVUS_COLLECTION):
+        collection = Collection(MILVUS_COLLECTION)
+        if TAGS in [f.name for f in collection.schema.fields]:
+            print(f"INFO: Reusing existing collection '{MILVUS_COLLECTION}' (incremental mode)")
+            return collection, False
+        # Created before metadata filtering: rebuild once (embeddings come from the cache)
+        print(f"⚠️ Collection '{MILVUS_COLLECTION}' has no metadata fields, rebuilding it")
+
+    # Define schema
+    fields = [
+        FieldSchema(name="chunk_id",    dtype=DataType.VARCHAR,     is_primary=True, max_length=64),
+        FieldSchema(name="embedding",   dtype=DataType.FLOAT_VECTOR, dim=VECTOR_DIM),
+        FieldSchema(name="jd_id",       dtype=DataType.INT64),
+        FieldSchema(name="chunk_index", dtype=DataType.INT64),
+        FieldSchema(name="object_url",  dtype=DataType.VARCHAR,     max_length=512), 
+        # JD metadata for filtered search ("" when unknown)
+        *[FieldSchema(name=field, dtype=DataType.VARCHAR, max_length=MAX_VALUE_LENGTH) for field in FILTER_FIELDS],
+        FieldSchema(name=TAGS, dtype=DataType.ARRAY, element_type=DataType.VARCHAR,
+                    max_capacity=MAX_TAGS, max_length=MAX_VALUE_LENGTH),
+    ]
+    schema = CollectionSchema(fields, description="JD chunks with embeddings")
+
+    if utility.has_collection(MILVUS_COLLECTION):
+        print(f"Dropping existing collection '{MILVUS_COLLECTION}' to ensure clean state...")
+        utility.drop_collection(MILVUS_COLLECTION)
+
+    print(f"INFO: Creating collection '{MILVUS_COLLECTION}' with schema...")
+    collection = Collection(name=MILVUS_COLLECTION, schema=schema)
+
+    # Create index with COSINE similarity for better text embedding search
+    # (sized for an empty collection; ensure_index resizes it after the inserts)
+    index_params = milvus_index_params(VECTOR_DIM, 0)
+    print(f"Creating COSINE similarity index on embedding field: {index_params}")
+    collection.create_index(field_name="embedding", index_params=index_params)
+    print("✅ Index created successfully")
+    return collection, True
+
+
+def ensure_index(collection: Collection) -> bool:
+    """
+    Rebuild the vector index when its type or nlist differs from what the
+    config asks for at the current row count (the stored vectors are kept).
+    Returns whether it was rebuilt; the collection is loaded either way.
+
+    Milvus only drops the index of a released collection, so searches fail
+    from release() until the new index is built and loaded again, right here.
+    The caller must bump the index generation after a rebuild so the
+    retriever picks up the new index type / nprobe.
+    """
+    wanted = milvus_index_params(VECTOR_DIM, collection.num_entities)
+    current = milvus_current_index(collection)
+    rebuilt = current is None or current["index_type"] != wanted["index_type"] \
+        or current["params"].get("nlist") != wanted["params"].get("nlist")
+    if rebuilt:
+        print(f"INFO: Rebuilding index of '{MILVUS_COLLECTION}' ({collection.num_entities} rows): "
+              f"{current} -> {wanted}")
+        collection.release()
+        try:
+            if current is not None:
+                collection.drop_index()
+            collection.create_index(field_name="embedding", index_params=wanted)
+            utility.wait_for_index_building_complete(MILVUS_COLLECTION)
+        finally:
+            collection.load()
+        print("✅ Index rebuilt")
+    else:
+        collection.load()   # no-op when already loaded
+    state = utility.load_state(MILVUS_COLLECTION)
+    if state != LoadState.Loaded:
+        raise RuntimeError(f"Collection '{MILVUS_COLLECTION}' is not loaded after indexing: {state}")
+    return rebuilt
+
+
+def chunk_ids_for(jd_id: int, start: int, stop: int) -> list[str]:
+    return [f"{jd_id}_{idx}" for idx in range(start, stop)]
+
+
+def remove_chunks(collection: Collection, minio_client: Minio, chunk_store: ChunkTextStore,
+                  jd_id: int, start: int, stop: int) -> None:
+    """Delete chunks [start, stop) of a JD from Milvus (if used), the chunk-text store and MinIO."""
+    if stop <= start:
+        return
+    ids = chunk_ids_for(jd_id, start, stop)
+    if collection is not None:
+        collection.delete(f"chunk_id in {ids!r}".replace("'", '"'))
+    chunk_store.delete_many(ids)
+    errors = minio_client.remove_objects(
+        MINIO_BUCKET,
+        [DeleteObject(f"jd_{jd_id}_chunk_{idx}.txt") for idx in range(start, stop)],
+    )
+    for err in errors:
+        print(f"❌ Failed to remove MinIO object {err.name}: {err}")
+
+
+def build_lexical_index(conn) -> str:
+    """
+    Rebuild the BM25 index over the chunks of every indexed JD. Each chunk
+    is indexed with its JD's job_code and title so those match too.
+    """
+    cur = conn.cursor(name="jd_lexical_index")
+    cur.itersize = EMBED_WINDOW_JDS
+    cur.execute(f"""
+        SELECT jd.jd_id, jd.job_code, jd.title, jd.content_md, {META_SQL}
+        FROM job_descriptions jd
+        JOIN jd_index_state s ON s.jd_id = jd.jd_id
+        {META_JOINS}
+        ORDER BY jd.jd_id;
+    """)
+
+    def docs():
+        for jd_id, job_code, title, content, *meta_row in cur:
+            meta = jd_meta(meta_row)
+            for idx, chunk in enumerate(chunk_text(content)):
+                url = f"http://{MINIO_ENDPOINT}/{MINIO_BUCKET}/jd_{jd_id}_chunk_{idx}.txt"
+                yield f"{jd_id}_{idx}", jd_id, idx, url, f"{job_code} {title}\n{chunk}", meta
+
+    path = BM25Index.write(LEXICAL_INDEX_DIR, docs())
+    cur.close()
+    conn.commit()
+    return path
+
+
+def segment_count(collection: Collection):
+    """
+    Number of sealed (persisted) segments of the collection, or None if
+    unknown. Read from data coord, so the collection need not be loaded.
+    """
+    if collection is None:
+        return None
+    try:
+        return len(utility.get_persistent_segment_info(collection.name))
+    except Exception:
+        return None
+
+
+def main():
+    full = EMBED_MODE == "full"
+    minio_client = connect_minio()
+    # Chunk text for inline hydration in the retriever (see utils/chunk_store.py)
+    chunk_store = ChunkTextStore()
+    collection, buffer, local_index = None, None, None
+    created = milvus_created = False
+    if VECTOR_BACKEND in ("milvus", "both"):
+        connect_milvus()
+        collection, milvus_created = open_collection(full)
+        created = milvus_created
+    if VECTOR_BACKEND in ("local", "both"):
+        # A missing local index means nothing is indexed there yet; one written
+        # before metadata filtering is rebuilt once
+        local_path = LocalVectorIndex.current_path(LOCAL_INDEX_DIR)
+        created = created or full or local_path is None or MetadataColumns.load(local_path) is None
+        local_index = LocalIndexBuilder(LOCAL_INDEX_DIR, full=created)
+
+    # Connect PostgreSQL
+    psql_conn = psycopg2.connect(
+        host=DB_HOST, port=DB_PORT,
+        database=DB_NAME, user=DB_USER, password=DB_PASS
+    )
+    state_cur = psql_conn.cursor()
+    state_cur.execute(STATE_DDL)
+    if created:
+        # Empty index: whatever the state table says is no longer indexed
+        state_cur.execute("TRUNCATE jd_index_state;")
+    psql_conn.commit()
+    started = time.perf_counter()
+    segments_before = segment_count(collection)
+    # Rows are buffered across JDs and written in bulk; a fresh collection can
+    # use plain inserts, an existing one needs upserts to replace changed JDs.
+    if collection is not None:
+        buffer = InsertBuffer(collection, upsert=not milvus_created)
+
+    # 1. JDs removed from job_descriptions since the last run
+    state_cur.execute("""
+        SELECT s.jd_id, s.chunk_count
+        FROM jd_index_state s
+        LEFT JOIN job_descriptions jd ON jd.jd_id = s.jd_id
+        WHERE jd.jd_id IS NULL;
+    """)
+    removed = state_cur.fetchall()
+    for jd_id, chunk_count in removed:
+        remove_chunks(collection, minio_client, chunk_store, jd_id, 0, chunk_count)
+    if local_index is not None:
+        local_index.drop_jds(r[0] for r in removed)
+    if removed:
+        state_cur.execute("DELETE FROM jd_index_state WHERE jd_id = ANY(%s);", ([r[0] for r in removed],))
+        psql_conn.commit()
+
+    # 2. Candidate JDs: new, or version/updated_at/metadata moved since they were
+    #    indexed (see index_state.py). Only these rows are read; the content hash
+    #    then filters out version bumps that didn't change the content.
+    # Named (server-side) cursor so large corpora are streamed, not fetched at once;
+    # WITH HOLD keeps it open across the per-window commits below.
+    psql_cur = psql_conn.cursor(name="jd_chunk_embed", withhold=True)
+    psql_cur.itersize = EMBED_WINDOW_JDS
+    psql_cur.execute(CANDIDATES_SQL)
+
+    # Process JDs window by window: chunks of every changed JD in the window are
+    # packed into cross-document batches and embedded concurrently, then
+    # scattered back to (jd_id, chunk_index).
+    unchanged_count = 0
+    changed_count = 0
+    progress = tqdm(desc="Embedding JDs", unit="jd")
+    while True:
+        rows = psql_cur.fetchmany(EMBED_WINDOW_JDS)
+        if not rows:
+            break
+
+        state_rows, jd_chunks, old_counts, metas, unchanged = plan_window(rows)
+        unchanged_count += unchanged
+        changed_count += len(jd_chunks)
+        if local_index is not None:
+            local_index.drop_jds(jd_chunks)
+
+        vectors = embed_batched(
+            (((jd_id, idx), chunk) for jd_id, chunks in jd_chunks.items() for idx, chunk in enumerate(chunks)),
+            embed_text,  # Gemini SDK
+        )
+
+        chunk_store.put_many(
+            (f"{jd_id}_{idx}", chunk) for jd_id, chunks in jd_chunks.items() for idx, chunk in enumerate(chunks)
+        )
+        for jd_id, chunks in jd_chunks.items():
+            for idx, chunk in enumerate(chunks):
+                vec = vectors[(jd_id, idx)]
+                cid = f"{jd_id}_{idx}"
+                obj = f"jd_{jd_id}_chunk_{idx}.txt"
+                data = chunk.encode("utf-8")
+                try:
+                    minio_client.put_object(
+                        MINIO_BUCKET, 
+                        obj, 
+                        io.BytesIO(data), 
+                        len(data),
+                        content_type="text/plain"
+                    )
+                    url = f"http://{MINIO_ENDPOINT}/{MINIO_BUCKET}/{obj}"
+                    # chunk_id is deterministic, so upsert replaces the previous version in place
+                    if buffer is not None:
+                        buffer.add(cid, vec, jd_id, idx, url, metas[jd_id])
+                    if local_index is not None:
+                        local_index.add(cid, vec, jd_id, idx, url, metas[jd_id])
+                except Exception as minio_err:
+                    print(f"❌ Failed to upload chunk {cid} to MinIO: {minio_err}")
+
+            # The JD shrank: drop the trailing chunks of the previous version
+            remove_chunks(collection, minio_client, chunk_store, jd_id, len(chunks), old_counts[jd_id])
+
+        # Rows must reach Milvus before the state says they are indexed
+        if buffer is not None:
+            buffer.write()
+        execute_values(state_cur, """
+            INSERT INTO jd_index_state (jd_id, version, source_updated_at, content_hash, chunk_count, meta_hash)
+            VALUES %s
+            ON CONFLICT (jd_id) DO UPDATE
+              SET version           = EXCLUDED.version,
+                  source_updated_at = EXCLUDED.source_updated_at,
+                  content_hash      = EXCLUDED.content_hash,
+                  chunk_count       = EXCLUDED.chunk_count,
+                  meta_hash         = EXCLUDED.meta_hash,
+                  indexed_at        = NOW();
+        """, state_rows)
+        psql_conn.commit()
+        progress.update(len(rows))
+    progress.close()
+    if buffer is not None:
+        buffer.close(compact=MILVUS_COMPACT)  # single end-of-run flush
+    rebuilt = collection is not None and ensure_index(collection)
+    segments_after = segment_count(collection)
+    if local_index is not None:
+        print(f"INFO: Local vector index published at {local_index.save()}")
+    if LEXICAL_INDEX and (created or changed_count or removed
+                          or BM25Index.current_path(LEXICAL_INDEX_DIR) is None):
+        print(f"INFO: Lexical (BM25) index published at {build_lexical_index(psql_conn)}")
+    if created or changed_count or removed or rebuilt:
+        # Tells the retriever to reload its indexes and drop cached results
+        print(f"INFO: Index generation bumped to {bump_generation()}")
+
+    psql_cur.close()
+    state_cur.close()
+    psql_conn.close()
+    elapsed = time.perf_counter() - started
+    print(f"✅ Completed chunking & embedding ({EMBED_MODE} mode, backend={VECTOR_BACKEND}).")
+    print(f"INFO: JDs re-indexed: {changed_count}, unchanged (skipped): {unchanged_count}, removed: {len(removed)}")
+    print(f"INFO: Embedding stage took {elapsed:.1f}s")
+    if buffer is not None:
+        print(f"INFO: Milvus writes: {buffer.stats()}, sealed segments: {segments_before} -> {segments_after}")
+    print(f"INFO: Embedding cache stats: {embed_cache_stats()}")
+
 
+if __name__ == "__main__":
+    main()
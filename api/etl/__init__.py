@@ -3,8 +3,18 @@
 ETL package: scripts to ingest JD Markdown and candidate data into PostgreSQL.
 """
 
-from .jd_etl import main as run_jd_etl
-from .profiles_etl import main as run_profiles_etl
+
+# The ETL modules read their DB settings at import time; import them lazily so
+# that `import api.etl` stays cheap.
+def run_jd_etl():
+    from .jd_etl import main
+    return main()
+
+
+def run_profiles_etl():
+    from .profiles_etl import main
+    return main()
+
 
 __all__ = [
     "run_jd_etl",
@@ -0,0 +1,286 @@
+"""
+etl/jd_bulk.py
+
+Set-based loader shared by jd_etl.py and jd_taxonomy_etl.py.
+
+1. Change detection: every file is hashed (sha256 of its bytes) and compared
+   with what this loader recorded in jd_source_files; only new/modified
+   files, and files whose JD is no longer in job_descriptions, go further.
+   Each loader (jd_etl, jd_taxonomy_etl) keeps its own records, so one
+   loader's run never makes the other skip files.
+2. Parsing: front matter is parsed in a process pool for large file sets.
+3. Loading: each batch is loaded in a single transaction with a fixed number
+   of statements, whatever the batch size: COPY into temp staging tables,
+   then one upsert per target table (job_families, job_descriptions +
+   jd_versions via RETURNING, jd_taxonomy_tags, jd_tag_map). A JD whose
+   content_md hash is unchanged is not updated, so its version is not bumped
+   and no jd_versions row is created.
+"""
+
+import csv
+import hashlib
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Iterable, Optional
+
+import frontmatter
+from psycopg2.extras import execute_values
+
+ETL_WORKERS      = int(os.getenv("ETL_WORKERS", str(os.cpu_count() or 4)))
+# Below this many files a process pool costs more to start than it saves
+PARSE_POOL_MIN   = int(os.getenv("ETL_PARSE_POOL_MIN", "256"))
+
+SOURCE_DDL = """
+ALTER TABLE job_descriptions ADD COLUMN IF NOT EXISTS content_hash CHAR(64);
+ALTER TABLE job_descriptions ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;
+
+CREATE TABLE IF NOT EXISTS jd_source_files (
+  loader    VARCHAR(50) NOT NULL,
+  path      TEXT NOT NULL,
+  file_hash CHAR(64) NOT NULL,
+  job_code  VARCHAR(50),
+  loaded_at TIMESTAMP NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (loader, path)
+);
+
+-- tables created keyed by path only: rows without a loader are dropped
+-- (both loaders then reload those files once)
+ALTER TABLE jd_source_files ADD COLUMN IF NOT EXISTS loader VARCHAR(50);
+DELETE FROM jd_source_files WHERE loader IS NULL;
+DO $$
+BEGIN
+  IF NOT EXISTS (
+    SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indrelid
+    WHERE c.relname = 'jd_source_files' AND i.indisprimary AND i.indnatts = 2
+  ) THEN
+    ALTER TABLE jd_source_files DROP CONSTRAINT IF EXISTS jd_source_files_pkey;
+    ALTER TABLE jd_source_files ADD PRIMARY KEY (loader, path);
+  END IF;
+END $$;
+"""
+
+JD_FIELDS = ["job_code", "title", "department", "family", "level",
+             "employment_type", "location", "content_md", "created_by"]
+NULLABLE_FIELDS = ["department", "family", "level", "employment_type", "location"]
+
+
+def sha256_hex(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_digest(md_file: str) -> tuple[str, str]:
+    with open(md_file, "rb") as f:
+        return md_file, sha256_hex(f.read())
+
+
+def parse_jd(md_file: str, strip_content: bool = False) -> Optional[dict]:
+    """
+    Parse one JD Markdown file into a record (JD_FIELDS + "tags" +
+    "content_hash"), or None when required metadata (job_code, title) is
+    missing.
+    """
+    post = frontmatter.load(md_file)
+    meta = post.metadata
+    content_md = post.content.strip() if strip_content else post.content
+    if not meta.get("job_code") or not meta.get("title"):
+        print(f"⚠️  Skipping {md_file}: missing job_code/title")
+        return None
+    return {
+        "job_code": meta["job_code"],
+        "title": meta["title"],
+        "department": meta.get("department"),
+        "family": meta.get("family"),
+        "level": meta.get("level"),
+        "employment_type": meta.get("employment_type"),
+        "location": meta.get("location"),
+        "content_md": content_md,
+        "created_by": meta.get("created_by", "etl_script"),
+        "tags": list(meta.get("tags") or []),
+        "content_hash": sha256_hex(content_md.encode("utf-8")),
+    }
+
+
+def _parse_for_pool(args: tuple[str, bool]) -> Optional[dict]:
+    return parse_jd(*args)
+
+
+def changed_files(conn, loader: str, md_files: list[str],
+                  workers: int = ETL_WORKERS) -> tuple[list[str], dict[str, str]]:
+    """
+    Hash `md_files` concurrently and compare with what `loader` recorded in
+    jd_source_files. A record whose job_code is gone from job_descriptions
+    does not count, so deleted JDs are reloaded.
+
+    Returns:
+        (changed, digests): the files that are new or whose bytes changed, and
+        the digest of every file.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        digests = dict(pool.map(file_digest, md_files))
+    with conn.cursor() as cur:
+        cur.execute(SOURCE_DDL)
+        cur.execute("""
+            SELECT s.path, s.file_hash FROM jd_source_files s
+            JOIN job_descriptions jd ON jd.job_code = s.job_code
+            WHERE s.loader = %s AND s.path = ANY(%s);
+        """, (loader, md_files))
+        known = dict(cur.fetchall())
+    conn.commit()
+    return [f for f in md_files if known.get(f) != digests[f]], digests
+
+
+def parse_files(md_files: list[str], strip_content: bool = False, workers: int = ETL_WORKERS) -> list[dict]:
+    """
+    Parse `md_files` (in a process pool when there are many of them).
+    Each record also carries its "source_path". Unparseable files are skipped.
+    """
+    args = [(f, strip_content) for f in md_files]
+    if len(md_files) < PARSE_POOL_MIN or workers <= 1:
+        parsed = list(map(_parse_for_pool, args))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed = list(pool.map(_parse_for_pool, args, chunksize=max(1, len(args) // (workers * 4))))
+    records = []
+    for md_file, record in zip(md_files, parsed):
+        if record is not None:
+            record["source_path"] = md_file
+            records.append(record)
+    return records
+
+
+def collect_records(conn, loader: str, md_files: list[str], strip_content: bool = False,
+                    force: bool = False) -> list[dict]:
+    """
+    Records for the files that changed since `loader` last loaded them (all
+    files when `force`), each tagged with its "file_hash" for jd_source_files.
+    """
+    changed, digests = changed_files(conn, loader, md_files)
+    if force:
+        changed = md_files
+    print(f"INFO: {len(changed)} of {len(md_files)} JD files new or modified")
+    records = parse_files(changed, strip_content=strip_content)
+    for record in records:
+        record["file_hash"] = digests[record["source_path"]]
+    return records
+
+
+def copy_rows(cur, table: str, columns: list[str], rows: Iterable[tuple], force_null: Iterable[str] = ()) -> None:
+    """COPY `rows` into `table` using CSV format (handles newlines/quotes in Markdown)."""
+    buf = io.StringIO()
+    csv.writer(buf, quoting=csv.QUOTE_NONNUMERIC).writerows(rows)
+    buf.seek(0)
+    options = "FORMAT csv"
+    force_null = list(force_null)
+    if force_null:
+        options += f", FORCE_NULL ({', '.join(force_null)})"
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH ({options})", buf)
+
+
+def _load_batch(cur, loader: str, records: list[dict], with_versions: bool) -> int:
+    cur.execute("""
+        CREATE TEMP TABLE _stage_jd (
+          ord INT, job_code TEXT, title TEXT, department TEXT, family TEXT, level TEXT,
+          employment_type TEXT, location TEXT, content_md TEXT, created_by TEXT,
+          content_hash TEXT
+        ) ON COMMIT DROP;
+        CREATE TEMP TABLE _stage_jd_tags (job_code TEXT, tag_name TEXT) ON COMMIT DROP;
+    """)
+    copy_rows(
+        cur, "_stage_jd", ["ord"] + JD_FIELDS + ["content_hash"],
+        ((i, *(r[f] for f in JD_FIELDS), r["content_hash"]) for i, r in enumerate(records)),
+        force_null=NULLABLE_FIELDS,
+    )
+    copy_rows(
+        cur, "_stage_jd_tags", ["job_code", "tag_name"],
+        ((r["job_code"], str(tag)) for r in records for tag in r["tags"]),
+    )
+
+    # Families and tags: insert the new names in one statement each
+    cur.execute("""
+        INSERT INTO job_families (name)
+        SELECT DISTINCT family FROM _stage_jd WHERE family IS NOT NULL
+        ON CONFLICT (name) DO NOTHING;
+
+        INSERT INTO jd_taxonomy_tags (tag_name)
+        SELECT DISTINCT tag_name FROM _stage_jd_tags
+        ON CONFLICT (tag_name) DO NOTHING;
+    """)
+
+    # JDs (last occurrence of a job_code in the batch wins), with the version
+    # history row written from the RETURNING set of the same statement
+    versions_cte = """
+        , versions AS (
+          INSERT INTO jd_versions (jd_id, version_number, content_md, edited_by, change_summary)
+          SELECT jd_id, version, content_md, created_by, 'ETL import, version ' || version
+          FROM upserted
+          ON CONFLICT (jd_id, version_number) DO NOTHING
+        )
+    """ if with_versions else ""
+    cur.execute(f"""
+        WITH src AS (
+          SELECT DISTINCT ON (s.job_code) s.*, f.family_id
+          FROM _stage_jd s
+          LEFT JOIN job_families f ON f.name = s.family
+          ORDER BY s.job_code, s.ord DESC
+        ), upserted AS (
+          INSERT INTO job_descriptions
+            (job_code, title, department, family_id, level,
+             employment_type, location, content_md, content_hash, version, created_by)
+          SELECT job_code, title, department, family_id, level,
+                 employment_type, location, content_md, content_hash, 1, created_by
+          FROM src
+          ON CONFLICT (job_code) DO UPDATE
+            SET content_md   = EXCLUDED.content_md,
+                content_hash = EXCLUDED.content_hash,
+                version      = job_descriptions.version + 1,
+                updated_at   = NOW()
+            WHERE job_descriptions.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+          RETURNING jd_id, version, content_md, created_by
+        ){versions_cte}
+        SELECT COUNT(*) FROM upserted;
+    """)
+    loaded = cur.fetchone()[0]
+
+    cur.execute("""
+        INSERT INTO jd_tag_map (jd_id, tag_id)
+        SELECT DISTINCT jd.jd_id, t.tag_id
+        FROM _stage_jd_tags st
+        JOIN job_descriptions jd ON jd.job_code = st.job_code
+        JOIN jd_taxonomy_tags t ON t.tag_name = st.tag_name
+        ON CONFLICT DO NOTHING;
+    """)
+
+    # Remember which file bytes are now loaded
+    sources = [(loader, r["source_path"], r["file_hash"], r["job_code"]) for r in records if r.get("file_hash")]
+    if sources:
+        execute_values(cur, """
+            INSERT INTO jd_source_files (loader, path, file_hash, job_code) VALUES %s
+            ON CONFLICT (loader, path) DO UPDATE
+              SET file_hash = EXCLUDED.file_hash,
+                  job_code  = EXCLUDED.job_code,
+                  loaded_at = NOW();
+        """, sources)
+    return loaded
+
+
+def bulk_load_jds(conn, loader: str, records: list[dict], batch_size: int = 1000,
+                  with_versions: bool = True) -> int:
+    """
+    Load parsed JD records, one transaction per `batch_size` records, and
+    record their files in jd_source_files under `loader`.
+    Returns the number of job_descriptions rows inserted/updated (JDs whose
+    content is unchanged are not counted).
+    """
+    total = 0
+    with conn.cursor() as cur:
+        cur.execute(SOURCE_DDL)
+        for start in range(0, len(records), batch_size):
+            batch = records[start:start + batch_size]
+            try:
+                total += _load_batch(cur, loader, batch, with_versions)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    return total
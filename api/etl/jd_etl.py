@@ -4,14 +4,24 @@ etl/jd_etl.py
 
 ETL script to load Job Description Markdown files into PostgreSQL,
 and maintain version history in jd_versions.
+
+ETL_MODE=bulk (default) hashes every file, parses only new/modified ones (in
+parallel) and loads them set-based in batches of ETL_BATCH_SIZE (see
+jd_bulk.py); ETL_MODE=row keeps the original row-by-row loop for comparison.
+In both modes a JD whose content is unchanged keeps its version.
 """
 
 import glob
 import os
+import sys
+import time
 import frontmatter
 import psycopg2
 from dotenv import load_dotenv
 
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from api.etl.jd_bulk import bulk_load_jds, collect_records, sha256_hex
+
 # 1. Load environment variables
 load_dotenv()  # expects .env in project root
 
@@ -21,101 +31,127 @@ DB_NAME = os.getenv("DB_NAME", "jd_library")
 DB_USER = os.getenv("DB_USER")
 DB_PASS = os.getenv("DB_PASS")
 
-# 2. Connect to PostgreSQL
-conn = psycopg2.connect(
-    host=DB_HOST, port=DB_PORT,
-    database=DB_NAME, user=DB_USER, password=DB_PASS
-)
-cur = conn.cursor()
-
-# 3. Ensure job_families, job_descriptions, jd_versions, jd_taxonomy_tags, jd_tag_map exist
-#    Assumes migrations have been run. If not, you could execute DDL here.
-
-# 4. Process Markdown files
-md_files = glob.glob('jd_markdown/*.md')
-for md_file in md_files:
-    post = frontmatter.load(md_file)
-    meta, content_md = post.metadata, post.content
-
-    job_code = meta['job_code']
-    title = meta['title']
-    department = meta.get('department')
-    family = meta.get('family')
-    level = meta.get('level')
-    employment_type = meta.get('employment_type')
-    location = meta.get('location')
-    created_by = meta.get('created_by', 'etl_script')
-
-    # 4.1 Upsert job family
-    cur.execute(
-        "INSERT INTO job_families(name) VALUES (%s) ON CONFLICT(name) DO NOTHING;",
-        (family,)
-    )
-    conn.commit()
-    cur.execute("SELECT family_id FROM job_families WHERE name=%s;", (family,))
-    family_id = cur.fetchone()[0]
-
-    # 4.2 Upsert main job_description
-    cur.execute("""
-        INSERT INTO job_descriptions
-          (job_code, title, department, family_id, level,
-           employment_type, location, content_md, version, created_by)
-        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,1,%s)
-        ON CONFLICT(job_code) DO UPDATE
-          SET content_md = EXCLUDED.content_md,
-              version = job_descriptions.version + 1,
-              updated_at = NOW();
-    """, (
-        job_code, title, department, family_id, level,
-        employment_type, location, content_md, created_by
-    ))
-    conn.commit()
-
-    # 4.3 Retrieve jd_id and current version
-    cur.execute(
-        "SELECT jd_id, version FROM job_descriptions WHERE job_code=%s;",
-        (job_code,)
-    )
-    jd_id, version = cur.fetchone()
-
-    # 4.4 Insert into jd_versions for history
-    cur.execute("""
-        INSERT INTO jd_versions
-          (jd_id, version_number, content_md, edited_by, change_summary)
-        VALUES (%s, %s, %s, %s, %s)
-        ON CONFLICT (jd_id, version_number) DO NOTHING;
-    """, (
-        jd_id,
-        version,
-        content_md,
-        created_by,
-        f"ETL import, version {version}"
-    ))
-    conn.commit()
-
-    # 4.5 Upsert taxonomy tags and mapping
-    tags = meta.get('tags', [])
-    for tag in tags:
+ETL_MODE       = os.getenv("ETL_MODE", "bulk")   # "bulk" | "row"
+ETL_BATCH_SIZE = int(os.getenv("ETL_BATCH_SIZE", "1000"))
+ETL_FORCE      = os.getenv("ETL_FORCE", "0").lower() in ("1", "true", "yes")  # ignore file hashes
+
+
+def load_row_by_row(conn, md_files: list[str]) -> int:
+    cur = conn.cursor()
+    for md_file in md_files:
+        post = frontmatter.load(md_file)
+        meta, content_md = post.metadata, post.content
+
+        job_code = meta['job_code']
+        title = meta['title']
+        department = meta.get('department')
+        family = meta.get('family')
+        level = meta.get('level')
+        employment_type = meta.get('employment_type')
+        location = meta.get('location')
+        created_by = meta.get('created_by', 'etl_script')
+
+        # 4.1 Upsert job family
         cur.execute(
-            "INSERT INTO jd_taxonomy_tags(tag_name) VALUES (%s) ON CONFLICT(tag_name) DO NOTHING;",
-            (tag,)
+            "INSERT INTO job_families(name) VALUES (%s) ON CONFLICT(name) DO NOTHING;",
+            (family,)
         )
-    conn.commit()
+        conn.commit()
+        cur.execute("SELECT family_id FROM job_families WHERE name=%s;", (family,))
+        family_id = cur.fetchone()[0]
 
-    # Map tags to this JD
-    for tag in tags:
+        # 4.2 Upsert main job_description (version only moves when content changed)
+        cur.execute("""
+            INSERT INTO job_descriptions
+              (job_code, title, department, family_id, level,
+               employment_type, location, content_md, content_hash, version, created_by)
+            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,1,%s)
+            ON CONFLICT(job_code) DO UPDATE
+              SET content_md = EXCLUDED.content_md,
+                  content_hash = EXCLUDED.content_hash,
+                  version = job_descriptions.version + 1,
+                  updated_at = NOW()
+              WHERE job_descriptions.content_hash IS DISTINCT FROM EXCLUDED.content_hash;
+        """, (
+            job_code, title, department, family_id, level,
+            employment_type, location, content_md, sha256_hex(content_md.encode("utf-8")), created_by
+        ))
+        conn.commit()
+
+        # 4.3 Retrieve jd_id and current version
         cur.execute(
-            "SELECT tag_id FROM jd_taxonomy_tags WHERE tag_name=%s;",
-            (tag,)
+            "SELECT jd_id, version FROM job_descriptions WHERE job_code=%s;",
+            (job_code,)
         )
-        tag_id = cur.fetchone()[0]
+        jd_id, version = cur.fetchone()
+
+        # 4.4 Insert into jd_versions for history
         cur.execute("""
-            INSERT INTO jd_tag_map(jd_id, tag_id)
-            VALUES (%s, %s)
-            ON CONFLICT DO NOTHING;
-        """, (jd_id, tag_id))
-    conn.commit()
-
-print(f"✅ ETL completed: imported {len(md_files)} JD files with versioning.")
-cur.close()
-conn.close()
+            INSERT INTO jd_versions
+              (jd_id, version_number, content_md, edited_by, change_summary)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (jd_id, version_number) DO NOTHING;
+        """, (
+            jd_id,
+            version,
+            content_md,
+            created_by,
+            f"ETL import, version {version}"
+        ))
+        conn.commit()
+
+        # 4.5 Upsert taxonomy tags and mapping
+        tags = meta.get('tags', [])
+        for tag in tags:
+            cur.execute(
+                "INSERT INTO jd_taxonomy_tags(tag_name) VALUES (%s) ON CONFLICT(tag_name) DO NOTHING;",
+                (tag,)
+            )
+        conn.commit()
+
+        # Map tags to this JD
+        for tag in tags:
+            cur.execute(
+                "SELECT tag_id FROM jd_taxonomy_tags WHERE tag_name=%s;",
+                (tag,)
+            )
+            tag_id = cur.fetchone()[0]
+            cur.execute("""
+                INSERT INTO jd_tag_map(jd_id, tag_id)
+                VALUES (%s, %s)
+                ON CONFLICT DO NOTHING;
+            """, (jd_id, tag_id))
+        conn.commit()
+    cur.close()
+    return len(md_files)
+
+
+def main():
+    # 2. Connect to PostgreSQL
+    conn = psycopg2.connect(
+        host=DB_HOST, port=DB_PORT,
+        database=DB_NAME, user=DB_USER, password=DB_PASS
+    )
+
+    # 3. Ensure job_families, job_descriptions, jd_versions, jd_taxonomy_tags, jd_tag_map exist
+    #    Assumes migrations have been run. If not, you could execute DDL here.
+
+    # 4. Process Markdown files
+    md_files = sorted(glob.glob('jd_markdown/*.md'))
+    started = time.perf_counter()
+    if ETL_MODE == "row":
+        loaded = load_row_by_row(conn, md_files)
+    else:
+        records = collect_records(conn, "jd_etl", md_files, force=ETL_FORCE)
+        parsed = time.perf_counter()
+        print(f"INFO: Scanned and parsed JD files in {parsed - started:.2f}s")
+        loaded = bulk_load_jds(conn, "jd_etl", records, batch_size=ETL_BATCH_SIZE, with_versions=True)
+    elapsed = time.perf_counter() - started
+
+    print(f"✅ ETL completed: imported {loaded} new/changed JD files with versioning.")
+    print(f"INFO: {ETL_MODE} mode: {elapsed:.2f}s, {loaded / elapsed if elapsed else 0:.1f} JDs/sec")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
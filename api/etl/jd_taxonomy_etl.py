@@ -8,14 +8,23 @@ into PostgreSQL tables:
   - jd_taxonomy_tags
   - job_descriptions
   - jd_tag_map
+
+ETL_MODE=bulk (default) only parses new/modified files and loads them
+set-based in batches of ETL_BATCH_SIZE (see jd_bulk.py); ETL_MODE=row keeps
+the original row-by-row loop. Unchanged content never bumps the version.
 """
 
 import os
+import sys
+import time
 import glob
 import frontmatter
 import psycopg2
 from dotenv import load_dotenv
 
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from api.etl.jd_bulk import bulk_load_jds, collect_records, sha256_hex
+
 # 1. Load .env
 load_dotenv()
 DB_HOST = os.getenv("DB_HOST", "localhost")
@@ -24,12 +33,9 @@ DB_NAME = os.getenv("DB_NAME", "jd_library")
 DB_USER = os.getenv("DB_USER")
 DB_PASS = os.getenv("DB_PASS")
 
-# 2. Connect to PostgreSQL
-conn = psycopg2.connect(
-    host=DB_HOST, port=DB_PORT,
-    database=DB_NAME, user=DB_USER, password=DB_PASS
-)
-cur = conn.cursor()
+ETL_MODE       = os.getenv("ETL_MODE", "bulk")   # "bulk" | "row"
+ETL_BATCH_SIZE = int(os.getenv("ETL_BATCH_SIZE", "1000"))
+ETL_FORCE      = os.getenv("ETL_FORCE", "0").lower() in ("1", "true", "yes")  # ignore file hashes
 
 # 3. Create tables if not exist
 ddl = """
@@ -59,6 +65,7 @@ CREATE TABLE IF NOT EXISTS job_descriptions (
   employment_type VARCHAR(20),
   location        TEXT,
   content_md      TEXT NOT NULL,
+  content_hash    CHAR(64),      -- sha256(content_md), skips no-op updates
   version         INT NOT NULL DEFAULT 1,
   created_by      VARCHAR(50),
   created_at      TIMESTAMP NOT NULL DEFAULT NOW(),
@@ -72,89 +79,124 @@ CREATE TABLE IF NOT EXISTS jd_tag_map (
   PRIMARY KEY (jd_id, tag_id)
 );
 """
-cur.execute(ddl)
-conn.commit()
-
-# 4. ETL: parse each Markdown in jd_markdown/
-md_dir = "jd_markdown"
-md_files = glob.glob(os.path.join(md_dir, "*.md"))
-
-for md_file in md_files:
-    post = frontmatter.load(md_file)
-    meta = post.metadata
-    content = post.content.strip()
-
-    # Required metadata keys: job_code, title, family, tags (list)
-    job_code   = meta.get("job_code")
-    title      = meta.get("title")
-    department = meta.get("department")
-    family     = meta.get("family")
-    level      = meta.get("level")
-    emp_type   = meta.get("employment_type")
-    location   = meta.get("location")
-    created_by = meta.get("created_by", "etl_script")
-    tags       = meta.get("tags", [])
-
-    if not job_code or not title or not family:
-        print(f"⚠️  Skipping {md_file}: missing job_code/title/family")
-        continue
-
-    # Upsert family
-    cur.execute(
-        "INSERT INTO job_families (name) VALUES (%s) ON CONFLICT (name) DO NOTHING;",
-        (family,)
-    )
-    conn.commit()
-    cur.execute("SELECT family_id FROM job_families WHERE name = %s;", (family,))
-    family_id = cur.fetchone()[0]
-
-    # Upsert tags
-    for tag in tags:
-        cur.execute(
-            "INSERT INTO jd_taxonomy_tags (tag_name) VALUES (%s) ON CONFLICT (tag_name) DO NOTHING;",
-            (tag,)
-        )
-    conn.commit()
-
-    # Upsert JD
-    cur.execute(
-        """
-        INSERT INTO job_descriptions
-          (job_code, title, department, family_id, level, employment_type, location,
-           content_md, version, created_by, created_at)
-        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,1,%s,NOW())
-        ON CONFLICT (job_code) DO UPDATE
-          SET content_md = EXCLUDED.content_md,
-              version    = job_descriptions.version + 1,
-              updated_at = NOW();
-        """,
-        (
-            job_code, title, department, family_id, level,
-            emp_type, location, content, created_by
-        )
-    )
-    conn.commit()
-
-    # Retrieve jd_id
-    cur.execute("SELECT jd_id FROM job_descriptions WHERE job_code = %s;", (job_code,))
-    jd_id = cur.fetchone()[0]
-
-    # Map tags
-    for tag in tags:
+def load_row_by_row(conn, md_files: list[str]) -> int:
+    cur = conn.cursor()
+    loaded = 0
+    for md_file in md_files:
+        post = frontmatter.load(md_file)
+        meta = post.metadata
+        content = post.content.strip()
+
+        # Required metadata keys: job_code, title, family, tags (list)
+        job_code   = meta.get("job_code")
+        title      = meta.get("title")
+        department = meta.get("department")
+        family     = meta.get("family")
+        level      = meta.get("level")
+        emp_type   = meta.get("employment_type")
+        location   = meta.get("location")
+        created_by = meta.get("created_by", "etl_script")
+        tags       = meta.get("tags", [])
+
+        if not job_code or not title or not family:
+            print(f"⚠️  Skipping {md_file}: missing job_code/title/family")
+            continue
+
+        # Upsert family
         cur.execute(
-            "SELECT tag_id FROM jd_taxonomy_tags WHERE tag_name = %s;",
-            (tag,)
+            "INSERT INTO job_families (name) VALUES (%s) ON CONFLICT (name) DO NOTHING;",
+            (family,)
         )
-        tag_id = cur.fetchone()[0]
+        conn.commit()
+        cur.execute("SELECT family_id FROM job_families WHERE name = %s;", (family,))
+        family_id = cur.fetchone()[0]
+
+        # Upsert tags
+        for tag in tags:
+            cur.execute(
+                "INSERT INTO jd_taxonomy_tags (tag_name) VALUES (%s) ON CONFLICT (tag_name) DO NOTHING;",
+                (tag,)
+            )
+        conn.commit()
+
+        # Upsert JD
         cur.execute(
-            "INSERT INTO jd_tag_map (jd_id, tag_id) VALUES (%s, %s) ON CONFLICT DO NOTHING;",
-            (jd_id, tag_id)
+            """
+            INSERT INTO job_descriptions
+              (job_code, title, department, family_id, level, employment_type, location,
+               content_md, content_hash, version, created_by, created_at)
+            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,1,%s,NOW())
+            ON CONFLICT (job_code) DO UPDATE
+              SET content_md   = EXCLUDED.content_md,
+                  content_hash = EXCLUDED.content_hash,
+                  version      = job_descriptions.version + 1,
+                  updated_at   = NOW()
+              WHERE job_descriptions.content_hash IS DISTINCT FROM EXCLUDED.content_hash;
+            """,
+            (
+                job_code, title, department, family_id, level,
+                emp_type, location, content, sha256_hex(content.encode("utf-8")), created_by
+            )
         )
+        conn.commit()
+
+        # Retrieve jd_id
+        cur.execute("SELECT jd_id FROM job_descriptions WHERE job_code = %s;", (job_code,))
+        jd_id = cur.fetchone()[0]
+
+        # Map tags
+        for tag in tags:
+            cur.execute(
+                "SELECT tag_id FROM jd_taxonomy_tags WHERE tag_name = %s;",
+                (tag,)
+            )
+            tag_id = cur.fetchone()[0]
+            cur.execute(
+                "INSERT INTO jd_tag_map (jd_id, tag_id) VALUES (%s, %s) ON CONFLICT DO NOTHING;",
+                (jd_id, tag_id)
+            )
+        conn.commit()
+
+        print(f"✅ Processed JD: {job_code} (ID {jd_id})")
+        loaded += 1
+    cur.close()
+    return loaded
+
+
+def main():
+    # 2. Connect to PostgreSQL
+    conn = psycopg2.connect(
+        host=DB_HOST, port=DB_PORT,
+        database=DB_NAME, user=DB_USER, password=DB_PASS
+    )
+    cur = conn.cursor()
+    cur.execute(ddl)
     conn.commit()
 
-    print(f"✅ Processed JD: {job_code} (ID {jd_id})")
-
-# 5. Cleanup
-cur.close()
-conn.close()
-print(f"🎉 ETL complete: processed {len(md_files)} JD files.")
+    # 4. ETL: parse each Markdown in jd_markdown/
+    md_dir = "jd_markdown"
+    md_files = sorted(glob.glob(os.path.join(md_dir, "*.md")))
+
+    started = time.perf_counter()
+    if ETL_MODE == "row":
+        loaded = load_row_by_row(conn, md_files)
+    else:
+        records = []
+        for record in collect_records(conn, "jd_taxonomy_etl", md_files, strip_content=True, force=ETL_FORCE):
+            # Required metadata keys: job_code, title, family, tags (list)
+            if not record["family"]:
+                print(f"⚠️  Skipping {record['source_path']}: missing family")
+                continue
+            records.append(record)
+        loaded = bulk_load_jds(conn, "jd_taxonomy_etl", records, batch_size=ETL_BATCH_SIZE, with_versions=False)
+    elapsed = time.perf_counter() - started
+
+    # 5. Cleanup
+    cur.close()
+    conn.close()
+    print(f"🎉 ETL complete: processed {len(md_files)} JD files ({loaded} loaded).")
+    print(f"INFO: {ETL_MODE} mode: {elapsed:.2f}s, {loaded / elapsed if elapsed else 0:.1f} JDs/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,13 +6,42 @@ ETL script to load candidate profiles from CSV files into PostgreSQL:
 - candidate_profiles
 - skills_master
 - candidate_skills
+
+Understands the candidate export format (DB/Sample_Candidate_Profiles.csv):
+full_name, email, phone, location, resume_raw and a JSON resume_parsed
+({"skills": [...], "education": [...], "experience": [...]}). Older files with
+resume_text/bio and a comma-separated `skills` column are still accepted.
+
+CSVs are streamed in batches of PROFILES_BATCH_SIZE rows, so memory stays
+bounded whatever the export size. Per batch: new skills are inserted in one
+statement (skill IDs are resolved through an in-memory dict preloaded from
+skills_master), profiles are COPYed into a staging table and upserted in one
+statement, and candidate_skills is replaced set-based (for upserted
+candidates and for those whose skill set alone changed). Those candidates
+are logged in candidate_skill_changes so the in-memory skill index
+(utils/skill_index.py) can refresh incrementally. One commit per batch.
+Unparseable timestamps are reported and loaded as NULL, never failing the
+batch's COPY.
+
+    python api/etl/profiles_etl.py [file.csv ...]   # default: PROFILES_CSV_GLOB
 """
 
-import os
-import glob
 import csv
+import glob
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from itertools import islice
+from typing import Iterator, Optional
+
 import psycopg2
 from dotenv import load_dotenv
+from psycopg2.extras import execute_values
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from api.etl.jd_bulk import copy_rows
 
 # 1. Load environment variables
 load_dotenv()
@@ -23,15 +52,13 @@ DB_NAME = os.getenv("DB_NAME", "jd_library")
 DB_USER = os.getenv("DB_USER")
 DB_PASS = os.getenv("DB_PASS")
 
-# 2. Connect to PostgreSQL
-conn = psycopg2.connect(
-    host=DB_HOST, port=DB_PORT,
-    database=DB_NAME, user=DB_USER, password=DB_PASS
-)
-cur = conn.cursor()
+PROFILES_CSV_GLOB   = os.getenv("PROFILES_CSV_GLOB", "candidate_data/*.csv")
+PROFILES_BATCH_SIZE = int(os.getenv("PROFILES_BATCH_SIZE", "5000"))
 
-# 3. Create tables if they don't exist
-ddl = """
+# Resumes can be long; the csv module's default 128 KB field limit is not enough
+csv.field_size_limit(2 ** 31 - 1)
+
+DDL = """
 CREATE TABLE IF NOT EXISTS candidate_profiles (
   candidate_id     SERIAL PRIMARY KEY,
   full_name        TEXT NOT NULL,
@@ -40,6 +67,10 @@ CREATE TABLE IF NOT EXISTS candidate_profiles (
   resume_text      TEXT NOT NULL,
   created_at       TIMESTAMP NOT NULL DEFAULT NOW()
 );
+ALTER TABLE candidate_profiles ADD COLUMN IF NOT EXISTS location      TEXT;
+ALTER TABLE candidate_profiles ADD COLUMN IF NOT EXISTS resume_parsed JSONB;
+ALTER TABLE candidate_profiles ADD COLUMN IF NOT EXISTS parsed_at     TIMESTAMP;
+ALTER TABLE candidate_profiles ADD COLUMN IF NOT EXISTS updated_at    TIMESTAMP;
 
 CREATE TABLE IF NOT EXISTS skills_master (
   skill_id   SERIAL PRIMARY KEY,
@@ -51,79 +82,253 @@ CREATE TABLE IF NOT EXISTS candidate_skills (
   skill_id     INT NOT NULL REFERENCES skills_master(skill_id) ON DELETE CASCADE,
   PRIMARY KEY (candidate_id, skill_id)
 );
+
+-- Candidates whose skills changed, consumed by utils/skill_index.py refresh()
+CREATE TABLE IF NOT EXISTS candidate_skill_changes (
+  seq          BIGSERIAL PRIMARY KEY,
+  candidate_id INT NOT NULL,
+  changed_at   TIMESTAMP NOT NULL DEFAULT NOW()
+);
 """
-cur.execute(ddl)
-conn.commit()
 
-# 4. Helper to parse skills string into list
+PROFILE_FIELDS = ["email", "full_name", "phone", "location", "resume_text",
+                  "resume_parsed", "parsed_at", "created_at", "updated_at"]
+NULLABLE_FIELDS = ["phone", "location", "resume_parsed", "parsed_at", "created_at", "updated_at"]
+TIMESTAMP_FIELDS = ["parsed_at", "created_at", "updated_at"]
+TIMESTAMP_FORMATS = ["%Y/%m/%d %H:%M:%S", "%Y/%m/%d"]   # besides ISO 8601
+
+
+# 2. Helpers to parse one CSV row
 def parse_skills(raw_skills: str) -> list[str]:
     # Expecting comma-separated skills
     if not raw_skills:
         return []
     return [s.strip() for s in raw_skills.split(",") if s.strip()]
 
-# 5. Process all CSV files in candidate_data/
-csv_files = glob.glob("candidate_data/*.csv")
-total = 0
-
-for csv_file in csv_files:
-    with open(csv_file, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            full_name   = row.get("full_name") or row.get("name") or ""
-            email       = row.get("email") or ""
-            phone       = row.get("phone") or ""
-            resume_text = row.get("resume_text") or row.get("bio") or ""
-            skills_raw  = row.get("skills") or ""
-
-            # Insert candidate_profile
-            cur.execute(
-                """
-                INSERT INTO candidate_profiles (full_name, email, phone, resume_text)
-                VALUES (%s, %s, %s, %s)
-                ON CONFLICT (email) DO UPDATE
-                  SET full_name = EXCLUDED.full_name,
-                      phone      = EXCLUDED.phone,
-                      resume_text= EXCLUDED.resume_text;
-                """,
-                (full_name, email, phone, resume_text)
-            )
-            conn.commit()
-
-            # Retrieve candidate_id
-            cur.execute("SELECT candidate_id FROM candidate_profiles WHERE email = %s", (email,))
-            candidate_id = cur.fetchone()[0]
-
-            # Upsert skills and mapping
-            skills = parse_skills(skills_raw)
-            for skill in skills:
-                # upsert into skills_master
-                cur.execute(
-                    "INSERT INTO skills_master (skill_name) VALUES (%s) ON CONFLICT (skill_name) DO NOTHING;",
-                    (skill,)
-                )
-            conn.commit()
-
-            # Map skills to candidate
-            for skill in skills:
-                cur.execute(
-                    "SELECT skill_id FROM skills_master WHERE skill_name = %s;",
-                    (skill,)
-                )
-                skill_id = cur.fetchone()[0]
-                cur.execute(
-                    """
-                    INSERT INTO candidate_skills (candidate_id, skill_id)
-                    VALUES (%s, %s)
-                    ON CONFLICT DO NOTHING;
-                    """,
-                    (candidate_id, skill_id)
-                )
-            conn.commit()
-
-            total += 1
-
-print(f"✅ ETL completed: Imported/Updated {total} candidate profiles.")
-
-cur.close()
-conn.close()
+
+def parse_timestamp(value: str) -> Optional[str]:
+    """ISO form of a CSV timestamp (None if empty); ValueError if unparseable."""
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).isoformat(sep=" ")
+    except ValueError:
+        pass
+    for fmt in TIMESTAMP_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).isoformat(sep=" ")
+        except ValueError:
+            continue
+    raise ValueError(value)
+
+
+def parse_row(row: dict) -> Optional[dict]:
+    """
+    Normalize one CSV row into a profile record (PROFILE_FIELDS + "skills"),
+    or None when it has no email.
+    """
+    email = (row.get("email") or "").strip()
+    if not email:
+        return None
+
+    parsed = None
+    raw_parsed = row.get("resume_parsed")
+    if raw_parsed:
+        try:
+            parsed = json.loads(raw_parsed)
+        except json.JSONDecodeError:
+            print(f"⚠️  {email}: resume_parsed is not valid JSON, ignoring it")
+    if not isinstance(parsed, dict):
+        parsed = None
+
+    if parsed is not None:
+        skills = [str(s).strip() for s in parsed.get("skills") or [] if str(s).strip()]
+    else:
+        skills = parse_skills(row.get("skills") or "")
+
+    timestamps = {}
+    for field in TIMESTAMP_FIELDS:
+        try:
+            timestamps[field] = parse_timestamp(row.get(field))
+        except ValueError:
+            print(f"⚠️  {email}: {field} {row.get(field)!r} is not a valid timestamp, loading it as NULL")
+            timestamps[field] = None
+
+    return {
+        "email": email,
+        "full_name": row.get("full_name") or row.get("name") or "",
+        "phone": row.get("phone") or None,
+        "location": row.get("location") or None,
+        "resume_text": row.get("resume_raw") or row.get("resume_text") or row.get("bio") or "",
+        "resume_parsed": json.dumps(parsed) if parsed is not None else None,
+        **timestamps,
+        "skills": list(dict.fromkeys(skills)),
+    }
+
+
+def iter_batches(csv_files: list[str], batch_size: int) -> Iterator[list[dict]]:
+    """Stream profile records from `csv_files`, `batch_size` rows at a time."""
+    for csv_file in csv_files:
+        with open(csv_file, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            while True:
+                rows = list(islice(reader, batch_size))
+                if not rows:
+                    break
+                batch = [r for r in map(parse_row, rows) if r is not None]
+                if batch:
+                    yield batch
+
+
+# 3. Set-based loading
+def load_skill_ids(cur) -> dict[str, int]:
+    cur.execute("SELECT skill_name, skill_id FROM skills_master;")
+    return dict(cur.fetchall())
+
+
+def resolve_skills(cur, skill_ids: dict[str, int], names: set[str]) -> None:
+    """Insert the skills not yet in `skill_ids` and add their IDs to it."""
+    new = sorted(n for n in names if n not in skill_ids)
+    if not new:
+        return
+    execute_values(
+        cur,
+        "INSERT INTO skills_master (skill_name) VALUES %s ON CONFLICT (skill_name) DO NOTHING;",
+        [(n,) for n in new],
+    )
+    # Also picks up names inserted concurrently by another loader
+    cur.execute("SELECT skill_name, skill_id FROM skills_master WHERE skill_name = ANY(%s);", (new,))
+    skill_ids.update(cur.fetchall())
+
+
+def load_batch(cur, records: list[dict], skill_ids: dict[str, int]) -> int:
+    """
+    Upsert one batch of profiles and their skills. Profiles whose data and
+    skills are unchanged are left alone. Returns the number of profiles
+    inserted/updated (including skill-only changes).
+    """
+    # Last occurrence of an email in the batch wins
+    records = list({r["email"]: r for r in records}.values())
+    resolve_skills(cur, skill_ids, {s for r in records for s in r["skills"]})
+
+    cur.execute("""
+        CREATE TEMP TABLE _stage_profiles (
+          email TEXT, full_name TEXT, phone TEXT, location TEXT, resume_text TEXT,
+          resume_parsed JSONB, parsed_at TIMESTAMP, created_at TIMESTAMP, updated_at TIMESTAMP
+        ) ON COMMIT DROP;
+        CREATE TEMP TABLE _stage_skills (email TEXT, skill_id INT) ON COMMIT DROP;
+    """)
+    copy_rows(
+        cur, "_stage_profiles", PROFILE_FIELDS,
+        (tuple(r[f] for f in PROFILE_FIELDS) for r in records),
+        force_null=NULLABLE_FIELDS,
+    )
+    copy_rows(
+        cur, "_stage_skills", ["email", "skill_id"],
+        ((r["email"], skill_ids[s]) for r in records for s in r["skills"]),
+    )
+
+    cur.execute("""
+        INSERT INTO candidate_profiles
+          (email, full_name, phone, location, resume_text, resume_parsed,
+           parsed_at, created_at, updated_at)
+        SELECT email, full_name, phone, location, resume_text, resume_parsed,
+               parsed_at, COALESCE(created_at, NOW()), COALESCE(updated_at, NOW())
+        FROM _stage_profiles
+        ON CONFLICT (email) DO UPDATE
+          SET full_name     = EXCLUDED.full_name,
+              phone         = EXCLUDED.phone,
+              location      = EXCLUDED.location,
+              resume_text   = EXCLUDED.resume_text,
+              resume_parsed = EXCLUDED.resume_parsed,
+              parsed_at     = EXCLUDED.parsed_at,
+              updated_at    = EXCLUDED.updated_at
+          WHERE (candidate_profiles.full_name, candidate_profiles.phone, candidate_profiles.location,
+                 candidate_profiles.resume_text, candidate_profiles.resume_parsed)
+                IS DISTINCT FROM
+                (EXCLUDED.full_name, EXCLUDED.phone, EXCLUDED.location,
+                 EXCLUDED.resume_text, EXCLUDED.resume_parsed)
+        RETURNING candidate_id, email;
+    """)
+    upserted = cur.fetchall()
+
+    cur.execute("""
+        CREATE TEMP TABLE _upserted (candidate_id INT PRIMARY KEY, email TEXT) ON COMMIT DROP;
+    """)
+    if upserted:
+        execute_values(cur, "INSERT INTO _upserted (candidate_id, email) VALUES %s;", upserted, page_size=10000)
+
+    # Unchanged profiles whose skills changed (e.g. only the legacy `skills` column differs)
+    cur.execute("""
+        INSERT INTO _upserted (candidate_id, email)
+        SELECT cp.candidate_id, cp.email
+        FROM candidate_profiles cp
+        JOIN _stage_profiles sp ON sp.email = cp.email
+        WHERE NOT EXISTS (SELECT 1 FROM _upserted u WHERE u.candidate_id = cp.candidate_id)
+          AND ARRAY(SELECT DISTINCT s.skill_id FROM _stage_skills s WHERE s.email = cp.email ORDER BY 1)
+              IS DISTINCT FROM
+              ARRAY(SELECT cs.skill_id FROM candidate_skills cs WHERE cs.candidate_id = cp.candidate_id ORDER BY 1);
+    """)
+    changed = len(upserted) + cur.rowcount
+    if not changed:
+        return 0
+
+    # Replace the skill set of every inserted/updated candidate
+    cur.execute("""
+        DELETE FROM candidate_skills cs
+        USING _upserted u
+        WHERE cs.candidate_id = u.candidate_id
+          AND NOT EXISTS (
+            SELECT 1 FROM _stage_skills s
+            WHERE s.email = u.email AND s.skill_id = cs.skill_id
+          );
+
+        INSERT INTO candidate_skills (candidate_id, skill_id)
+        SELECT DISTINCT u.candidate_id, s.skill_id
+        FROM _stage_skills s
+        JOIN _upserted u ON u.email = s.email
+        ON CONFLICT DO NOTHING;
+
+        INSERT INTO candidate_skill_changes (candidate_id)
+        SELECT candidate_id FROM _upserted;
+    """)
+    return changed
+
+
+def main():
+    # 4. Connect to PostgreSQL and make sure the tables exist
+    conn = psycopg2.connect(
+        host=DB_HOST, port=DB_PORT,
+        database=DB_NAME, user=DB_USER, password=DB_PASS
+    )
+    with conn.cursor() as cur:
+        cur.execute(DDL)
+        skill_ids = load_skill_ids(cur)
+    conn.commit()
+
+    # 5. Stream every CSV file in fixed-size batches, one transaction each
+    csv_files = sys.argv[1:] or sorted(glob.glob(PROFILES_CSV_GLOB))
+    started = time.perf_counter()
+    seen = loaded = 0
+    with conn.cursor() as cur:
+        for batch in iter_batches(csv_files, PROFILES_BATCH_SIZE):
+            try:
+                loaded += load_batch(cur, batch, skill_ids)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            seen += len(batch)
+            print(f"INFO: {seen} rows processed, {loaded} profiles inserted/updated")
+    elapsed = time.perf_counter() - started
+
+    print(f"✅ ETL completed: Imported/Updated {loaded} of {seen} candidate profiles "
+          f"from {len(csv_files)} file(s).")
+    print(f"INFO: {elapsed:.2f}s, {seen / elapsed if elapsed else 0:.1f} rows/sec, "
+          f"{len(skill_ids)} skills known")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+# matching/__init__.py
+"""
+Matching package: vectorized candidate x JD scoring and the batch job that
+stores top-N matches in both directions.
+"""
+
+from .engine import ChunkMatrix, MatchResult, match_all
+
+
+def run_matching():
+    # Imported lazily: the job pulls in psycopg2 and the Gemini client.
+    from .match_job import main
+    return main()
+
+
+__all__ = [
+    "ChunkMatrix",
+    "MatchResult",
+    "match_all",
+    "run_matching",
+]
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+"""
+matching/app.py
+
+FastAPI matching service: skill-based candidate search over the in-memory
+skill inverted index (utils/skill_index.py).
+
+The index is built from PostgreSQL at startup and refreshed in the
+background every SKILL_INDEX_REFRESH_SECONDS from candidate_skill_changes.
+"""
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+from dotenv import load_dotenv
+import asyncio
+import os
+import sys
+import threading
+import psycopg2
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from utils.skill_index import SkillIndex
+
+load_dotenv()
+
+DB_HOST = os.getenv("DB_HOST", "localhost")
+DB_PORT = int(os.getenv("DB_PORT", "5432"))
+DB_NAME = os.getenv("DB_NAME", "jd_library")
+DB_USER = os.getenv("DB_USER")
+DB_PASS = os.getenv("DB_PASS")
+
+SKILL_INDEX_REFRESH_SECONDS = float(os.getenv("SKILL_INDEX_REFRESH_SECONDS", "30"))
+SKILL_SEARCH_MAX_IDS        = int(os.getenv("SKILL_SEARCH_MAX_IDS", "10000"))
+
+
+def connect():
+    return psycopg2.connect(
+        host=DB_HOST, port=DB_PORT,
+        database=DB_NAME, user=DB_USER, password=DB_PASS
+    )
+
+
+# One connection for index maintenance; refreshes are serialized on refresh_lock
+index_conn = connect()
+refresh_lock = threading.Lock()
+skill_index = SkillIndex.load(index_conn)
+print(f"INFO: Skill index loaded: {skill_index.stats()}")
+
+
+def refresh_index_now() -> int:
+    with refresh_lock:
+        try:
+            return skill_index.refresh(index_conn)
+        except Exception:
+            index_conn.rollback()
+            raise
+
+
+app = FastAPI(title="Candidate Matching")
+
+
+async def refresh_loop():
+    while True:
+        await asyncio.sleep(SKILL_INDEX_REFRESH_SECONDS)
+        try:
+            updated = await asyncio.to_thread(refresh_index_now)
+            if updated:
+                print(f"INFO: Skill index refreshed: {updated} candidates updated")
+        except Exception as e:
+            print(f"❌ Skill index refresh failed: {e}")
+
+
+@app.on_event("startup")
+async def startup():
+    app.state.refresher = asyncio.create_task(refresh_loop())
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    app.state.refresher.cancel()
+    index_conn.close()
+
+
+class SkillQuery(BaseModel):
+    all_of: list[str] = []    # skill names (case-insensitive) or numeric skill ids
+    any_of: list[str] = []
+    none_of: list[str] = []
+    limit: int = 100
+
+
+class SkillSearchResult(BaseModel):
+    count: int
+    candidate_ids: list[int]
+
+
+def _skills(values: list[str]) -> list:
+    return [int(v) if v.isdigit() else v for v in values]
+
+
+@app.post("/candidates/search", response_model=SkillSearchResult)
+def search_candidates(q: SkillQuery):
+    """Candidates matching the AND / OR / NOT skill query (ascending ids, first `limit`)."""
+    if q.limit > SKILL_SEARCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"limit must be <= {SKILL_SEARCH_MAX_IDS}")
+    ids = skill_index.query(_skills(q.all_of), _skills(q.any_of), _skills(q.none_of))
+    return SkillSearchResult(count=len(ids), candidate_ids=ids[:q.limit].tolist())
+
+
+@app.post("/skill_index/refresh")
+def refresh_index():
+    """Apply pending candidate_skill_changes now (e.g. right after profiles_etl.py)."""
+    try:
+        return {"updated_candidates": refresh_index_now(), **skill_index.stats()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Refresh failed: {str(e)}")
+
+
+@app.get("/health")
+def health():
+    return {"status": "healthy", "skill_index": skill_index.stats()}
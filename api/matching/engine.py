@@ -0,0 +1,187 @@
+"""
+matching/engine.py
+
+Vectorized candidate x JD scoring.
+
+Every document (resume or JD) is a group of L2-normalized chunk embeddings.
+Semantic similarity of a (candidate, JD) pair is pooled over their chunks:
+
+  - "max":  best cosine between any candidate chunk and any JD chunk
+            (one matmul over chunk rows, then segment max on both axes)
+  - "mean": cosine of the normalized mean chunk vectors
+
+Skill overlap is the fraction of a JD's tags the candidate lists as skills
+(names compared case-insensitively). The final score is
+
+    (1 - skill_weight) * semantic + skill_weight * skill_overlap
+
+match_all() scores the whole corpus block by block (MATCH_BLOCK_ROWS candidate
+chunk rows at a time) and keeps top-N JDs per candidate and a running top-N
+candidates per JD, so both directions come out of a single pass and memory
+is bounded by one (block x JD chunks) score matrix.
+"""
+
+import os
+import sys
+from typing import Iterable, Optional
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from utils.vector_index import normalize, top_k_rows
+
+MATCH_POOLING      = os.getenv("MATCH_POOLING", "max")          # "max" | "mean"
+MATCH_SKILL_WEIGHT = float(os.getenv("MATCH_SKILL_WEIGHT", "0.3"))
+MATCH_TOP_N        = int(os.getenv("MATCH_TOP_N", "20"))
+MATCH_BLOCK_ROWS   = int(os.getenv("MATCH_BLOCK_ROWS", "4096"))  # candidate chunk rows per block
+
+
+class ChunkMatrix:
+    """
+    Chunk embeddings of many documents, rows grouped by document:
+    rows offsets[i]:offsets[i + 1] belong to doc_ids[i]. Documents without
+    chunks are dropped.
+    """
+
+    def __init__(self, doc_ids: np.ndarray, vectors: np.ndarray, offsets: np.ndarray):
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        self.vectors = vectors
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+
+    @classmethod
+    def from_docs(cls, docs: Iterable[tuple[int, list]]) -> "ChunkMatrix":
+        """Build from (doc_id, [chunk vector, ...]) pairs."""
+        doc_ids, blocks, offsets = [], [], [0]
+        for doc_id, vectors in docs:
+            if len(vectors) == 0:
+                continue
+            block = normalize(vectors)
+            doc_ids.append(doc_id)
+            blocks.append(block)
+            offsets.append(offsets[-1] + len(block))
+        vectors = np.concatenate(blocks) if blocks else np.zeros((0, 0), dtype=np.float32)
+        return cls(np.array(doc_ids, dtype=np.int64), vectors, np.array(offsets, dtype=np.int64))
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def pooled(self) -> np.ndarray:
+        """Normalized mean chunk vector per document (n_docs x dim)."""
+        sums = np.add.reduceat(self.vectors, self.offsets[:-1], axis=0)
+        return normalize(sums)
+
+    def doc_blocks(self, max_rows: int) -> Iterable[tuple[int, int]]:
+        """(first_doc, stop_doc) ranges holding about `max_rows` chunk rows each."""
+        start, n = 0, len(self)
+        while start < n:
+            limit = self.offsets[start] + max_rows
+            stop = int(np.searchsorted(self.offsets, limit, side="right")) - 1
+            stop = min(max(stop, start + 1), n)
+            yield start, stop
+            start = stop
+
+
+def skill_matrix(doc_skills: list[Iterable[str]], vocab: dict[str, int]) -> np.ndarray:
+    """Dense 0/1 float32 (n_docs x len(vocab)); names outside `vocab` are ignored."""
+    mat = np.zeros((len(doc_skills), len(vocab)), dtype=np.float32)
+    for i, skills in enumerate(doc_skills):
+        cols = [vocab[s] for s in {s.lower() for s in skills} if s.lower() in vocab]
+        mat[i, cols] = 1.0
+    return mat
+
+
+def semantic_scores(cand: ChunkMatrix, start: int, stop: int, jds: ChunkMatrix, pooling: str,
+                    jd_pooled: Optional[np.ndarray] = None) -> np.ndarray:
+    """Semantic similarity of candidates [start, stop) against every JD."""
+    if pooling == "mean":
+        rows = slice(cand.offsets[start], cand.offsets[stop])
+        sub = ChunkMatrix(cand.doc_ids[start:stop], cand.vectors[rows], cand.offsets[start:stop + 1] - cand.offsets[start])
+        return sub.pooled() @ (jd_pooled if jd_pooled is not None else jds.pooled()).T
+    if pooling != "max":
+        raise ValueError(f"Unknown pooling {pooling!r}")
+    base = cand.offsets[start]
+    chunk_scores = cand.vectors[base:cand.offsets[stop]] @ jds.vectors.T
+    per_jd = np.maximum.reduceat(chunk_scores, jds.offsets[:-1], axis=1)
+    return np.maximum.reduceat(per_jd, cand.offsets[start:stop] - base, axis=0)
+
+
+class MatchResult:
+    """
+    top_jds[i] / top_jd_scores[i]: best JD indexes (into jds.doc_ids) for
+    candidate i; top_candidates[j] / top_candidate_scores[j]: best candidate
+    indexes (into candidates.doc_ids) for JD j. Best first.
+    """
+
+    def __init__(self, candidates: ChunkMatrix, jds: ChunkMatrix,
+                 top_jds: np.ndarray, top_jd_scores: np.ndarray,
+                 top_candidates: np.ndarray, top_candidate_scores: np.ndarray):
+        self.candidates = candidates
+        self.jds = jds
+        self.top_jds = top_jds
+        self.top_jd_scores = top_jd_scores
+        self.top_candidates = top_candidates
+        self.top_candidate_scores = top_candidate_scores
+
+    def candidate_rows(self) -> Iterable[tuple[int, int, int, float]]:
+        """(candidate_id, rank, jd_id, score) for every kept pair."""
+        for i, cid in enumerate(self.candidates.doc_ids):
+            for rank, (j, s) in enumerate(zip(self.top_jds[i], self.top_jd_scores[i]), start=1):
+                yield int(cid), rank, int(self.jds.doc_ids[j]), float(s)
+
+    def jd_rows(self) -> Iterable[tuple[int, int, int, float]]:
+        """(jd_id, rank, candidate_id, score) for every kept pair."""
+        for j, jid in enumerate(self.jds.doc_ids):
+            for rank, (i, s) in enumerate(zip(self.top_candidates[j], self.top_candidate_scores[j]), start=1):
+                yield int(jid), rank, int(self.candidates.doc_ids[i]), float(s)
+
+
+def match_all(
+    candidates: ChunkMatrix,
+    jds: ChunkMatrix,
+    candidate_skills: Optional[list[Iterable[str]]] = None,
+    jd_skills: Optional[list[Iterable[str]]] = None,
+    top_n: int = MATCH_TOP_N,
+    pooling: str = MATCH_POOLING,
+    skill_weight: float = MATCH_SKILL_WEIGHT,
+    block_rows: int = MATCH_BLOCK_ROWS,
+) -> MatchResult:
+    """
+    Score every candidate against every JD in one blocked pass.
+    `candidate_skills` / `jd_skills` are aligned with candidates.doc_ids /
+    jds.doc_ids; without them the score is purely semantic.
+    """
+    n_jd = len(jds)
+    use_skills = skill_weight > 0 and candidate_skills is not None and jd_skills is not None
+    if use_skills:
+        vocab = {s: i for i, s in enumerate(sorted({s.lower() for tags in jd_skills for s in tags}))}
+        jd_mat = skill_matrix(jd_skills, vocab)
+        counts = jd_mat.sum(axis=1)
+        counts[counts == 0] = 1.0
+        # column j sums to 1 over JD j's tags -> dot product = fraction covered
+        jd_skill_cols = (jd_mat / counts[:, None]).T
+    jd_pooled = jds.pooled() if pooling == "mean" else None
+
+    n_keep_jd = min(top_n, n_jd)
+    n_keep_cand = min(top_n, len(candidates))
+    top_jds = np.empty((len(candidates), n_keep_jd), dtype=np.int64)
+    top_jd_scores = np.empty((len(candidates), n_keep_jd), dtype=np.float32)
+    best_cand = np.empty((n_jd, 0), dtype=np.int64)
+    best_cand_scores = np.empty((n_jd, 0), dtype=np.float32)
+
+    for start, stop in candidates.doc_blocks(block_rows):
+        scores = semantic_scores(candidates, start, stop, jds, pooling, jd_pooled)
+        if use_skills:
+            block_skills = skill_matrix(candidate_skills[start:stop], vocab)
+            scores = (1.0 - skill_weight) * scores + skill_weight * (block_skills @ jd_skill_cols)
+
+        idx, s = top_k_rows(scores, n_keep_jd)
+        top_jds[start:stop], top_jd_scores[start:stop] = idx, s
+
+        # Merge this block's best candidates per JD into the running top-N
+        idx, s = top_k_rows(scores.T, n_keep_cand)
+        merged_idx = np.concatenate([best_cand, idx + start], axis=1)
+        merged_scores = np.concatenate([best_cand_scores, s], axis=1)
+        keep, best_cand_scores = top_k_rows(merged_scores, n_keep_cand)
+        best_cand = np.take_along_axis(merged_idx, keep, axis=1)
+
+    return MatchResult(candidates, jds, top_jds, top_jd_scores, best_cand, best_cand_scores)
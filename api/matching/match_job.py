@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+"""
+matching/match_job.py
+
+Batch job that matches every candidate against every JD:
+
+1. Chunk and embed JD content and resumes (chunk_text + embed_text, batched
+   across documents; the embedding cache makes re-runs cheap).
+2. Score candidate x JD with matching/engine.py (chunk-level semantic
+   similarity pooled per document + skill overlap of candidate_skills vs
+   jd_tag_map).
+   With MATCH_SKILLS_ALL / MATCH_SKILLS_ANY / MATCH_SKILLS_NONE set
+   (comma-separated skill names), candidates are first pre-filtered through
+   the skill inverted index, so only matching resumes are embedded and scored.
+3. Replace jd_candidate_matches (top-N candidates per JD) and
+   candidate_jd_matches (top-N JDs per candidate) in one transaction.
+"""
+
+import os
+import sys
+import time
+from typing import Iterable, Iterator
+
+import numpy as np
+import psycopg2
+from dotenv import load_dotenv
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from api.embeddings.batching import embed_batched
+from api.embeddings.chunk_utils import chunk_text
+from api.etl.jd_bulk import copy_rows
+from api.matching.engine import ChunkMatrix, MATCH_POOLING, MATCH_TOP_N, match_all
+from utils.gemini_embed import embed_text
+from utils.skill_index import SkillIndex
+
+load_dotenv()
+
+DB_HOST = os.getenv("DB_HOST", "localhost")
+DB_PORT = int(os.getenv("DB_PORT", "5432"))
+DB_NAME = os.getenv("DB_NAME", "jd_library")
+DB_USER = os.getenv("DB_USER")
+DB_PASS = os.getenv("DB_PASS")
+
+MATCH_EMBED_WINDOW = int(os.getenv("MATCH_EMBED_WINDOW", "2000"))  # documents embedded per window
+MATCH_SKILLS_ALL   = os.getenv("MATCH_SKILLS_ALL", "")
+MATCH_SKILLS_ANY   = os.getenv("MATCH_SKILLS_ANY", "")
+MATCH_SKILLS_NONE  = os.getenv("MATCH_SKILLS_NONE", "")
+
+MATCH_DDL = """
+CREATE TABLE IF NOT EXISTS jd_candidate_matches (
+  jd_id        INT NOT NULL REFERENCES job_descriptions(jd_id) ON DELETE CASCADE,
+  rank         INT NOT NULL,
+  candidate_id INT NOT NULL REFERENCES candidate_profiles(candidate_id) ON DELETE CASCADE,
+  score        REAL NOT NULL,
+  PRIMARY KEY (jd_id, rank)
+);
+
+CREATE TABLE IF NOT EXISTS candidate_jd_matches (
+  candidate_id INT NOT NULL REFERENCES candidate_profiles(candidate_id) ON DELETE CASCADE,
+  rank         INT NOT NULL,
+  jd_id        INT NOT NULL REFERENCES job_descriptions(jd_id) ON DELETE CASCADE,
+  score        REAL NOT NULL,
+  PRIMARY KEY (candidate_id, rank)
+);
+"""
+
+
+def embed_documents(docs: Iterable[tuple[int, str]], window: int = MATCH_EMBED_WINDOW) -> Iterator[tuple[int, np.ndarray]]:
+    """
+    Yield (doc_id, float32 chunk matrix) for each document, embedding
+    `window` documents at a time so only one window of vectors is held as
+    Python lists.
+    """
+    docs = iter(docs)
+    while True:
+        batch = [d for _, d in zip(range(window), docs)]
+        if not batch:
+            return
+        chunks = {doc_id: chunk_text(text or "") for doc_id, text in batch}
+        vectors = embed_batched(
+            (((doc_id, idx), chunk) for doc_id, parts in chunks.items() for idx, chunk in enumerate(parts)),
+            embed_text,
+        )
+        for doc_id, parts in chunks.items():
+            yield doc_id, np.asarray([vectors[(doc_id, idx)] for idx in range(len(parts))], dtype=np.float32)
+
+
+def skill_list(value: str) -> list[str]:
+    return [s.strip() for s in value.split(",") if s.strip()]
+
+
+def load_skills(cur, sql: str) -> dict[int, list[str]]:
+    cur.execute(sql)
+    out: dict[int, list[str]] = {}
+    for doc_id, name in cur:
+        out.setdefault(doc_id, []).append(name)
+    return out
+
+
+def main():
+    conn = psycopg2.connect(
+        host=DB_HOST, port=DB_PORT,
+        database=DB_NAME, user=DB_USER, password=DB_PASS
+    )
+    with conn.cursor() as cur:
+        cur.execute(MATCH_DDL)
+        conn.commit()
+
+        jd_tags = load_skills(cur, """
+            SELECT m.jd_id, t.tag_name FROM jd_tag_map m JOIN jd_taxonomy_tags t ON t.tag_id = m.tag_id;
+        """)
+        candidate_skills = load_skills(cur, """
+            SELECT cs.candidate_id, s.skill_name FROM candidate_skills cs JOIN skills_master s ON s.skill_id = cs.skill_id;
+        """)
+        cur.execute("SELECT jd_id, content_md FROM job_descriptions ORDER BY jd_id;")
+        jd_rows = cur.fetchall()
+
+    candidate_filter = None
+    if MATCH_SKILLS_ALL or MATCH_SKILLS_ANY or MATCH_SKILLS_NONE:
+        candidate_filter = SkillIndex.load(conn).query(
+            skill_list(MATCH_SKILLS_ALL), skill_list(MATCH_SKILLS_ANY), skill_list(MATCH_SKILLS_NONE)
+        ).tolist()
+        print(f"INFO: Skill pre-filter kept {len(candidate_filter)} candidates")
+
+    started = time.perf_counter()
+    jds = ChunkMatrix.from_docs(embed_documents(jd_rows))
+    print(f"INFO: Embedded {len(jds)} JDs ({len(jds.vectors)} chunks)")
+
+    # Resumes are streamed from a server-side cursor
+    with conn.cursor(name="match_candidates") as cur:
+        cur.itersize = MATCH_EMBED_WINDOW
+        if candidate_filter is None:
+            cur.execute("SELECT candidate_id, resume_text FROM candidate_profiles ORDER BY candidate_id;")
+        else:
+            cur.execute("""
+                SELECT candidate_id, resume_text FROM candidate_profiles
+                WHERE candidate_id = ANY(%s) ORDER BY candidate_id;
+            """, (candidate_filter,))
+        candidates = ChunkMatrix.from_docs(embed_documents(cur))
+    conn.commit()
+    embedded = time.perf_counter()
+    print(f"INFO: Embedded {len(candidates)} candidates ({len(candidates.vectors)} chunks) "
+          f"in {embedded - started:.2f}s")
+    if not len(jds) or not len(candidates):
+        print("⚠️ Nothing to match.")
+        conn.close()
+        return
+
+    result = match_all(
+        candidates, jds,
+        candidate_skills=[candidate_skills.get(int(i), []) for i in candidates.doc_ids],
+        jd_skills=[jd_tags.get(int(i), []) for i in jds.doc_ids],
+    )
+    scored = time.perf_counter()
+    print(f"INFO: Scored {len(candidates)} x {len(jds)} pairs ({MATCH_POOLING} pooling) "
+          f"in {scored - embedded:.2f}s")
+
+    with conn.cursor() as cur:
+        cur.execute("TRUNCATE jd_candidate_matches, candidate_jd_matches;")
+        copy_rows(cur, "jd_candidate_matches", ["jd_id", "rank", "candidate_id", "score"], result.jd_rows())
+        copy_rows(cur, "candidate_jd_matches", ["candidate_id", "rank", "jd_id", "score"], result.candidate_rows())
+    conn.commit()
+    conn.close()
+    print(f"✅ Matching completed: top-{MATCH_TOP_N} stored for {len(jds)} JDs and {len(candidates)} candidates.")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,40 +7,83 @@ FastAPI service for:
  - Generating Interview Questions (/generate_questions)
  - Improving an existing JD file  (/improve_jd)
 
-All AI calls use Gemini REST API with API key.
+All AI calls use Gemini REST API with API key, through one shared pooled
+async HTTP client (utils/gemini_chat.py).
+
+/generate_jd/stream and /generate_questions/stream return the same text as
+server-sent events while it is generated:
+
+    data: {"text": "..."}          one per generated piece
+    event: done                    end of the answer ({"cached": true} if served from cache)
+    event: error                   upstream failure after the stream started
+
+Requests may leave out `chunks`: the context is then retrieved in-process
+(the retriever's search, filters and caches, api/retriever/app.py) for the
+title among JDs of the same level and department, hydrated, stripped of
+near-duplicate chunks and fitted to GROUNDING_MAX_TOKENS (see
+utils/prompt_context.py). No retriever or MinIO round trips for clients.
+
+Answers are cached (utils/response_cache.py): a request whose rendered
+prompt, model and temperature were seen within RESPONSE_CACHE_TTL is served
+without calling Gemini. With RESPONSE_CACHE_SEMANTIC=1, /generate_jd and
+/generate_questions also reuse the answer of a near-identical prompt
+(embedding cosine >= RESPONSE_CACHE_THRESHOLD) for the same title, level
+and department. `no_cache: true` in the
+request (a query parameter for /improve_jd) forces a fresh answer, which
+then replaces the cached one. Hit rates are reported by /health.
+
+/improve_jd extracts the upload's text on a process pool, never on the event
+loop (utils/extract.py); the text of a re-uploaded file comes from the
+extraction cache shared by all workers (utils/extract_cache.py).
 """
 
 import os
-import io
 import glob
+import asyncio
+import importlib
+import json
+import sys
+from typing import AsyncIterator, Optional
 from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
 from jinja2 import Environment, FileSystemLoader
-import requests
-from pdfminer.high_level import extract_text as extract_pdf
-from docx import Document
-from PIL import Image
-import pytesseract
+import httpx
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from utils.extract import ExtractionError, close_extract_pool, extract_upload
+from utils.extract_cache import get_extract_cache
+from utils.gemini_chat import CHAT_MODEL, ChatError, achat, astream_chat, close_chat_client
+from utils.prompt_context import pack_context
+from utils.response_cache import ResponseCache, response_key, semantic_bucket
+from api.embeddings.chunk_utils import estimate_tokens
 
 # load .env
 load_dotenv()
 
 API_KEY        = os.getenv("GEMINI_API_KEY")
-CHAT_MODEL     = os.getenv("GEMINI_CHAT_MODEL", "gemini-2.5-flash")
 EMBED_MODEL    = os.getenv("GEMINI_EMBED_MODEL", "embed-gecko-001")
 
-CHAT_ENDPOINT  = f"https://gemini.api.cloud.google.com/v1/models/{CHAT_MODEL}:generateMessage"
 EMBED_ENDPOINT = f"https://gemini.api.cloud.google.com/v1/models/{EMBED_MODEL}:embedText"
 
+# Retrieval grounding for requests without chunks
+GROUNDING_MODE          = os.getenv("GROUNDING_MODE", "vector")         # retriever mode: vector | hybrid | lexical
+GROUNDING_TOP_K         = int(os.getenv("GROUNDING_TOP_K", "20"))       # chunks retrieved before dedup / budget
+GROUNDING_MIN_CHUNKS    = int(os.getenv("GROUNDING_MIN_CHUNKS", "3"))   # fewer matches: relax the filters
+GROUNDING_MAX_TOKENS    = int(os.getenv("GROUNDING_MAX_TOKENS", "1500"))  # token budget of the context chunks
+GROUNDING_DUP_THRESHOLD = float(os.getenv("GROUNDING_DUP_THRESHOLD", "0.8"))  # shingle containment = duplicate
+
+# LLM answer cache
+RESPONSE_CACHE_SIZE      = int(os.getenv("RESPONSE_CACHE_SIZE", "1000"))      # cached answers, 0 = off
+RESPONSE_CACHE_TTL       = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))     # seconds, 0 = never expire
+RESPONSE_CACHE_SEMANTIC  = os.getenv("RESPONSE_CACHE_SEMANTIC", "0") == "1"   # reuse near-identical prompts
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.97"))  # cosine of prompt embeddings
+
 if not API_KEY:
     raise RuntimeError("GEMINI_API_KEY must be set in .env")
 
-HEADERS = {
-    "Authorization": f"Bearer {API_KEY}",
-    "Content-Type": "application/json"
-}
-
 # Jinja2 setup
 HERE       = os.path.dirname(__file__)
 TEMPLATE_DIR = os.path.join(HERE, "templates")
@@ -48,11 +91,25 @@ env        = Environment(loader=FileSystemLoader(TEMPLATE_DIR), trim_blocks=True
 
 app = FastAPI(title="Prompt Generator (Gemini API)")
 
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_THRESHOLD)
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await close_chat_client()
+    close_extract_pool()
+    if _retriever is not None:
+        await _retriever.shutdown()
+    elif RESPONSE_CACHE_SEMANTIC:
+        from utils.gemini_embed import close_async_client
+        await close_async_client()
+
 class RequestModel(BaseModel):
     title: str
     level: str
     department: str
-    chunks: list[str]
+    chunks: Optional[list[str]] = None   # None: retrieved (see module docstring)
+    no_cache: bool = False               # skip the answer cache (see module docstring)
 
 class JDResponse(BaseModel):
     job_description: str
@@ -60,60 +117,226 @@ class JDResponse(BaseModel):
 class QuestionsResponse(BaseModel):
     interview_questions: str
 
-def call_gemini_chat(system: str, user: str, temperature: float):
-    payload = {
-        "model": CHAT_MODEL,
-        "temperature": temperature,
-        "candidateCount": 1,
-        "promptMessages": [
-            {"author": "system", "content": system},
-            {"author": "user",   "content": user}
-        ]
-    }
-    resp = requests.post(CHAT_ENDPOINT, json=payload, headers=HEADERS, timeout=60)
-    if not resp.ok:
-        raise HTTPException(status_code=resp.status_code, detail=resp.text)
-    data = resp.json()
-    return data["candidates"][0]["content"].strip()
-
-def extract_text_from_file(contents: bytes, filename: str) -> str:
-    ext = filename.lower().rsplit(".", 1)[-1]
-    if ext == "pdf":
-        return extract_pdf(io.BytesIO(contents))
-    if ext == "docx":
-        doc = Document(io.BytesIO(contents))
-        return "\n".join(p.text for p in doc.paragraphs)
-    if ext in ("jpg", "jpeg", "png"):
-        return pytesseract.image_to_string(Image.open(io.BytesIO(contents)))
-    raise HTTPException(status_code=400, detail="Unsupported file type")
+class CacheLookup:
+    """Where a prompt's answer is (or will be) cached, and the cached answer if any."""
 
-@app.post("/generate_jd", response_model=JDResponse)
-def generate_jd(req: RequestModel):
+    def __init__(self, system: str, user: str, temperature: float, scope: Optional[tuple]):
+        self.key = response_key(CHAT_MODEL, temperature, system, user)
+        self.bucket = semantic_bucket(CHAT_MODEL, temperature, system, *scope) if scope is not None else None
+        self.semantic = scope is not None and RESPONSE_CACHE_SEMANTIC and RESPONSE_CACHE_SIZE > 0
+        self.vector = None
+        self.answer = None
+
+    async def find(self, user: str) -> Optional[str]:
+        self.answer = response_cache.get(self.key)
+        if self.answer is None and self.semantic:
+            from utils.gemini_embed import aembed_text
+            try:
+                # prompts are one-off texts: kept out of the persistent embedding cache
+                self.vector = (await aembed_text([user], task_type="SEMANTIC_SIMILARITY", use_cache=False))[0]
+                self.answer = response_cache.get_similar(self.bucket, self.vector)
+            except Exception as e:
+                print(f"⚠️ WARNING: Prompt embedding failed, semantic cache skipped: {e}")
+        return self.answer
+
+    def store(self, answer: str) -> None:
+        if answer:
+            response_cache.put(self.key, answer, self.bucket, self.vector)
+
+
+async def cache_lookup(system: str, user: str, temperature: float,
+                       use_cache: bool, scope: Optional[tuple]) -> CacheLookup:
+    """`scope`: the fields a semantic match must agree on; None = exact tier only."""
+    lookup = CacheLookup(system, user, temperature, scope)
+    if not use_cache:
+        response_cache.bypass()
+    elif RESPONSE_CACHE_SIZE > 0:
+        await lookup.find(user)
+    return lookup
+
+
+async def call_gemini_chat(system: str, user: str, temperature: float,
+                           use_cache: bool = True, scope: Optional[tuple] = None) -> str:
+    lookup = await cache_lookup(system, user, temperature, use_cache, scope)
+    if lookup.answer is not None:
+        return lookup.answer
+    try:
+        answer = await achat(system, user, temperature)
+    except ChatError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Gemini request failed: {e}")
+    lookup.store(answer)
+    return answer
+
+
+def sse(data: dict, event: Optional[str] = None) -> str:
+    return (f"event: {event}\n" if event else "") + f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+# no-cache / no proxy buffering: every event reaches the client immediately
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+async def stream_gemini_chat(system: str, user: str, temperature: float,
+                             use_cache: bool = True, scope: Optional[tuple] = None) -> StreamingResponse:
+    """
+    Server-sent events of the answer as it is generated. The first piece is
+    awaited before responding, so failures up to then get a real HTTP status.
+    A cached answer is sent as a single piece; a complete generated answer
+    is cached.
+    """
+    lookup = await cache_lookup(system, user, temperature, use_cache, scope)
+    if lookup.answer is not None:
+        async def cached() -> AsyncIterator[str]:
+            yield sse({"text": lookup.answer})
+            yield sse({"cached": True}, event="done")
+        return StreamingResponse(cached(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+    stream = astream_chat(system, user, temperature)
+    try:
+        first = await stream.__anext__()
+    except StopAsyncIteration:
+        first = None
+    except ChatError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Gemini request failed: {e}")
+
+    async def events() -> AsyncIterator[str]:
+        pieces = []
+        try:
+            if first is not None:
+                pieces.append(first)
+                yield sse({"text": first})
+                async for text in stream:
+                    pieces.append(text)
+                    yield sse({"text": text})
+            lookup.store("".join(pieces).strip())
+            yield sse({}, event="done")
+        except ChatError as e:
+            yield sse({"status_code": e.status_code, "detail": e.detail}, event="error")
+        except httpx.HTTPError as e:
+            yield sse({"status_code": 502, "detail": f"Gemini request failed: {e}"}, event="error")
+        finally:
+            await stream.aclose()
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+async def extract_text_from_file(file: UploadFile) -> str:
+    try:
+        return await extract_upload(file.file, file.filename)
+    except ExtractionError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+_retriever = None
+_retriever_lock = asyncio.Lock()
+
+
+async def load_retriever():
+    """The retriever module, imported in-process on first use (it opens the vector / lexical indexes)."""
+    global _retriever
+    async with _retriever_lock:
+        if _retriever is None:
+            _retriever = await asyncio.to_thread(importlib.import_module, "api.retriever.app")
+    return _retriever
+
+
+async def grounding_chunks(req: RequestModel) -> list[str]:
+    """
+    Chunks for the title from JDs of the same level and department, relaxed
+    to the level, then to all JDs, while fewer than GROUNDING_MIN_CHUNKS
+    match (or the index rejects the filter); then deduplicated and fitted to
+    the token budget. Level and department match case-insensitively (see
+    utils/jd_metadata.py). Embedding failures are 502 / 503, search failures 503.
+    """
+    try:
+        retriever = await load_retriever()
+    except Exception as e:
+        print(f"❌ Retriever unavailable: {e}")
+        raise HTTPException(status_code=503, detail=f"Retrieval unavailable: {e}")
+    hits = []
+    for filters in ({"level": [req.level], "department": [req.department]}, {"level": [req.level]}, None):
+        try:
+            hits = await retriever.cached_hits(req.title, GROUNDING_TOP_K, GROUNDING_MODE, filters)
+        except HTTPException:
+            raise  # query embedding failed or index missing: relaxing the filters won't help
+        except Exception as e:
+            if filters is None:
+                print(f"❌ Grounding search failed: {e}")
+                raise HTTPException(status_code=503, detail=f"Retrieval failed: {e}")
+            # filter unknown to / unsupported by the index (ValueError, MilvusException, ...)
+            print(f"⚠️ WARNING: Grounding search with filters {filters} failed, relaxing them: {e}")
+            continue
+        if len(hits) >= GROUNDING_MIN_CHUNKS:
+            break
+    hits = (await retriever.hydrate_async([hits]))[0]
+    texts = [h["text"] for h in hits if h.get("text")]
+    chunks = pack_context(texts, GROUNDING_MAX_TOKENS, estimate_tokens, GROUNDING_DUP_THRESHOLD)
+    print(f"INFO: Grounding '{req.title}': {len(hits)} chunks retrieved, {len(chunks)} kept")
+    return chunks
+
+
+async def context_chunks(req: RequestModel) -> list[str]:
+    return req.chunks if req.chunks is not None else await grounding_chunks(req)
+
+def jd_prompt(req: RequestModel, chunks: list[str]) -> tuple[str, str, float]:
     tpl = env.get_template("jd_generation.j2")
-    user_prompt = tpl.render(metadata=req.dict(), chunks=req.chunks)
+    user_prompt = tpl.render(metadata=req.dict(), chunks=chunks)
     system_msg = "You are a helpful assistant that crafts clear, concise job descriptions."
-    jd = call_gemini_chat(system_msg, user_prompt, temperature=0.3)
-    return JDResponse(job_description=jd)
+    return system_msg, user_prompt, 0.3
 
-@app.post("/generate_questions", response_model=QuestionsResponse)
-def generate_questions(req: RequestModel):
+def questions_prompt(req: RequestModel, chunks: list[str]) -> tuple[str, str, float]:
     tpl = env.get_template("interview_questions.j2")
-    user_prompt = tpl.render(metadata=req.dict(), chunks=req.chunks)
+    user_prompt = tpl.render(metadata=req.dict(), chunks=chunks)
     system_msg = "You are an expert interviewer who produces behavioral and technical questions."
-    qs = call_gemini_chat(system_msg, user_prompt, temperature=0.4)
+    return system_msg, user_prompt, 0.4
+
+def request_scope(req: RequestModel) -> tuple:
+    """Only answers for the same title, level and department are reused semantically."""
+    return (req.title, req.level, req.department)
+
+@app.post("/generate_jd", response_model=JDResponse)
+async def generate_jd(req: RequestModel):
+    jd = await call_gemini_chat(*jd_prompt(req, await context_chunks(req)),
+                                use_cache=not req.no_cache, scope=request_scope(req))
+    return JDResponse(job_description=jd)
+
+@app.post("/generate_jd/stream")
+async def generate_jd_stream(req: RequestModel):
+    """/generate_jd as server-sent events (see module docstring)."""
+    return await stream_gemini_chat(*jd_prompt(req, await context_chunks(req)),
+                                    use_cache=not req.no_cache, scope=request_scope(req))
+
+@app.post("/generate_questions", response_model=QuestionsResponse)
+async def generate_questions(req: RequestModel):
+    qs = await call_gemini_chat(*questions_prompt(req, await context_chunks(req)),
+                                use_cache=not req.no_cache, scope=request_scope(req))
     return QuestionsResponse(interview_questions=qs)
 
+@app.post("/generate_questions/stream")
+async def generate_questions_stream(req: RequestModel):
+    """/generate_questions as server-sent events."""
+    return await stream_gemini_chat(*questions_prompt(req, await context_chunks(req)),
+                                    use_cache=not req.no_cache, scope=request_scope(req))
+
 @app.post("/improve_jd")
-async def improve_jd(file: UploadFile = File(...)):
-    contents = await file.read()
-    text = extract_text_from_file(contents, file.filename)
+async def improve_jd(file: UploadFile = File(...), no_cache: bool = False):
+    text = await extract_text_from_file(file)
     # simple chunk: pass full text as one prompt
     tpl = env.get_template("jd_improvement.j2")
     prompt = tpl.render(raw=text)
     system_msg = "You are an AI assistant that improves and enhances job descriptions."
-    improved = call_gemini_chat(system_msg, prompt, temperature=0.3)
+    # exact cache only: a near-identical JD still needs its own edits
+    improved = await call_gemini_chat(system_msg, prompt, temperature=0.3, use_cache=not no_cache)
     return {"improved_jd": improved}
 
 @app.get("/ping")
 def ping():
     return {"pong": True}
+
+@app.get("/health")
+def health():
+    extract_cache = get_extract_cache()
+    return {"status": "healthy", "response_cache": response_cache.stats(),
+            "extract_cache": extract_cache.stats() if extract_cache else {}}
@@ -2,39 +2,296 @@
 """
 retriever/app.py
 
-FastAPI semantic retriever using Milvus for vector search and Gemini for query embeddings.
+FastAPI semantic retriever using Milvus (or the in-process local index, with
+VECTOR_BACKEND=local) for vector search and Gemini for query embeddings.
+
+Retrieval modes (`mode` on /retrieve and /retrieve_batch):
+  - "vector":  cosine search over query embeddings (default)
+  - "lexical": BM25 over the same chunks, no embedding call at all
+  - "hybrid":  both, fused with reciprocal-rank fusion
+
+`filters` restricts results to JDs with the given family / level /
+department / location / employment_type (any of the listed values) and any
+of the given tags. Filters are applied inside the index search, so top_k
+hits are returned even for selective filters.
+
+/retrieve_jds and /retrieve_jds_batch return top_k distinct JDs instead of
+chunks: they search with a larger internal k (top_k * JD_COLLAPSE_FACTOR),
+group chunk hits by jd_id and score each JD by `aggregation` (max, sum or
+top_m_mean over its chunks), see utils/collapse.py.
+
+Caching (hit rates on /health):
+  - query vectors: queries are normalized (NFKC, case-folded, whitespace
+    collapsed) and embedded with the RETRIEVAL_QUERY task type; vectors are
+    kept in an in-memory LRU with a TTL in front of the embedding cache.
+    QUERY_WARMUP_FILE (one query per line) is embedded at startup.
+  - results: hits are cached per (index generation, query, top_k, mode,
+    filters). When jd_chunk_embed.py publishes new indexes (see
+    utils/index_generation.py) the indexes are reloaded and the cache starts
+    over, so results never outlive the index they came from.
 """
 
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import Literal, Optional
 from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import httpx
 import os
 import sys
+import unicodedata
 
 # Add the parent directory to the path to import utils
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
-from pymilvus import connections, Collection
-from utils.gemini_embed import embed_text  
+from utils.gemini_embed import aembed_text, close_async_client
+from utils.singleflight import SingleFlight
+from utils.chunk_store import ChunkTextStore, minio_fetcher
+from utils.embed_cache import embed_cache_stats
+from utils.vector_index import VectorIndex, MilvusVectorIndex, LocalVectorIndex, LOCAL_INDEX_DIR
+from utils.lexical_index import LEXICAL_INDEX_DIR, open_lexical_index, rrf_fuse
+from utils.jd_metadata import filters_key
+from utils.collapse import Aggregation, collapse_by_jd
+from utils.lru import TTLCache
+from utils.index_generation import INDEX_GENERATION_FILE, GenerationWatcher
 
 load_dotenv()
 
 MILVUS_HOST       = os.getenv("MILVUS_HOST", "localhost")
 MILVUS_PORT       = os.getenv("MILVUS_PORT", "19530")
 MILVUS_COLLECTION = os.getenv("MILVUS_COLLECTION", "jdchunks")
+MILVUS_NPROBE     = int(os.getenv("MILVUS_NPROBE", "0"))   # 0 = sized to the index's nlist
+VECTOR_BACKEND    = os.getenv("VECTOR_BACKEND", "milvus")  # "milvus" | "local"
+RETRIEVE_BATCH_MAX = int(os.getenv("RETRIEVE_BATCH_MAX", "1024"))  # queries per /retrieve_batch call
+SEARCH_CONCURRENCY = int(os.getenv("SEARCH_CONCURRENCY", "8"))     # concurrent vector searches
+HYBRID_DEPTH       = int(os.getenv("HYBRID_DEPTH", "50"))          # hits per side fused in hybrid mode
+JD_COLLAPSE_FACTOR = int(os.getenv("JD_COLLAPSE_FACTOR", "10"))    # chunk hits searched per requested JD
+JD_COLLAPSE_MAX_K  = int(os.getenv("JD_COLLAPSE_MAX_K", "1000"))   # cap on that internal k
+QUERY_CACHE_SIZE   = int(os.getenv("QUERY_CACHE_SIZE", "10000"))   # query vectors kept in memory, 0 = off
+QUERY_CACHE_TTL    = float(os.getenv("QUERY_CACHE_TTL", "86400"))  # seconds, 0 = no expiry
+RESULT_CACHE_SIZE  = int(os.getenv("RESULT_CACHE_SIZE", "5000"))   # cached hit lists, 0 = off
+RESULT_CACHE_TTL   = float(os.getenv("RESULT_CACHE_TTL", "600"))   # seconds, 0 = no expiry
+INDEX_CHECK_INTERVAL = float(os.getenv("INDEX_CHECK_INTERVAL", "2"))  # seconds between index generation checks
+QUERY_WARMUP_FILE  = os.getenv("QUERY_WARMUP_FILE", "")            # common queries embedded at startup
+QUERY_TASK_TYPE    = "RETRIEVAL_QUERY"
+
 
-# Connect to Milvus
-connections.connect("default", host=MILVUS_HOST, port=MILVUS_PORT)
-collection = Collection(MILVUS_COLLECTION)
+def open_vector_index() -> VectorIndex:
+    if VECTOR_BACKEND == "local":
+        print(f"INFO: Using local vector index under {LOCAL_INDEX_DIR}")
+        return LocalVectorIndex.open(LOCAL_INDEX_DIR)
+    return MilvusVectorIndex(MILVUS_COLLECTION, MILVUS_HOST, MILVUS_PORT, nprobe=MILVUS_NPROBE)
 
-# Load collection into memory for search operations
-collection.load()
+
+vector_index = open_vector_index()
+# BM25 index written by jd_chunk_embed.py; lexical/hybrid modes need it
+lexical_index = open_lexical_index(LEXICAL_INDEX_DIR)
+if lexical_index is None:
+    print(f"⚠️ WARNING: No lexical index under {LEXICAL_INDEX_DIR}; lexical/hybrid retrieval disabled")
+
+# Vector search is blocking (gRPC / NumPy); it runs on a dedicated bounded pool
+# so it neither blocks the event loop nor competes with FastAPI's threadpool.
+search_pool = ThreadPoolExecutor(max_workers=SEARCH_CONCURRENCY, thread_name_prefix="vector-search")
+# Identical in-flight queries share one embed + search
+coalescer = SingleFlight()
+# Chunk text for include_text=True; falls back to bulk MinIO reads
+chunk_store = ChunkTextStore(fetcher=minio_fetcher())
+
+query_cache = TTLCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+result_cache = TTLCache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL)
+# Markers that move when new indexes are published
+generation_watcher = GenerationWatcher(
+    [INDEX_GENERATION_FILE, os.path.join(LEXICAL_INDEX_DIR, "CURRENT")]
+    + ([os.path.join(LOCAL_INDEX_DIR, "CURRENT")] if VECTOR_BACKEND == "local" else []),
+    interval=INDEX_CHECK_INTERVAL,
+)
+loaded_generation = generation_watcher.current()
+reload_lock = asyncio.Lock()
 
 app = FastAPI(title="JD Retriever")
 
+
+@app.on_event("startup")
+async def startup():
+    if QUERY_WARMUP_FILE:
+        # In the background: the service is usable while the vectors are computed
+        app.state.warmup = asyncio.create_task(warm_query_cache(QUERY_WARMUP_FILE))
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await close_async_client()
+    search_pool.shutdown(wait=False)
+
+
+def normalize_query(query: str) -> str:
+    """Canonical form of a query, used for embedding and as cache key."""
+    return " ".join(unicodedata.normalize("NFKC", query).casefold().split())
+
+
+async def embed_queries(queries: list[str]) -> list[list[float]]:
+    """
+    Vectors of (normalized) `queries`, from the query cache where possible.
+    Embedding failures are raised as HTTPException (502 / 503).
+    """
+    vectors = [query_cache.get(q) for q in queries]
+    missing = list(dict.fromkeys(q for q, v in zip(queries, vectors) if v is None))
+    if missing:
+        try:
+            fresh = dict(zip(missing, await aembed_text(missing, task_type=QUERY_TASK_TYPE)))
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=502, detail=f"Query embedding failed: {e}")
+        except ValueError as e:  # API key not configured
+            raise HTTPException(status_code=503, detail=f"Query embedding unavailable: {e}")
+        for q in missing:
+            query_cache.put(q, fresh[q])
+        vectors = [fresh[q] if v is None else v for q, v in zip(queries, vectors)]
+    return vectors
+
+
+async def warm_query_cache(path: str) -> None:
+    """Precompute the vectors of common queries (one per line)."""
+    try:
+        with open(path) as f:
+            queries = list(dict.fromkeys(normalize_query(line) for line in f if line.strip()))
+        await embed_queries(queries)
+        print(f"✅ Query cache warmed with {len(queries)} queries from {path}")
+    except Exception as e:
+        print(f"⚠️ WARNING: Query cache warm-up failed: {e}")
+
+
+def reload_indexes() -> None:
+    global vector_index, lexical_index
+    print("INFO: New index generation published, reloading indexes")
+    try:
+        vector_index = open_vector_index()
+        lexical_index = open_lexical_index(LEXICAL_INDEX_DIR)
+    except Exception as e:
+        print(f"❌ Reloading indexes failed, keeping the previous ones: {e}")
+
+
+async def index_generation() -> tuple:
+    """Generation of the loaded indexes; reloads them first when a newer one was published."""
+    global loaded_generation
+    token = generation_watcher.current()
+    if token != loaded_generation:
+        async with reload_lock:
+            if token != loaded_generation:
+                await asyncio.to_thread(reload_indexes)
+                result_cache.clear()
+                chunk_store.clear_memory()   # chunk ids are reused when a JD is re-chunked
+                loaded_generation = token
+    return loaded_generation
+
+
+async def cached_hits(query: str, top_k: int, mode: str = "vector", filters: Optional[dict] = None) -> list[dict]:
+    """retrieve_hits behind the result cache; identical in-flight queries share one call."""
+    query = normalize_query(query)
+    key = (await index_generation(), query, top_k, mode, filters_key(filters))
+    hits = result_cache.get(key)
+    if hits is None:
+        hits = await coalescer.do(key, lambda: retrieve_hits(query, top_k, mode, filters))
+        result_cache.put(key, hits)
+    return hits
+
+
+async def cached_hits_batch(queries: list[str], top_k: int, mode: str = "vector",
+                            filters: Optional[dict] = None) -> list[list[dict]]:
+    """retrieve_hits_batch for the queries missing from the result cache (each distinct query once)."""
+    queries = [normalize_query(q) for q in queries]
+    generation, fkey = await index_generation(), filters_key(filters)
+    results = [result_cache.get((generation, q, top_k, mode, fkey)) for q in queries]
+    missing = list(dict.fromkeys(q for q, r in zip(queries, results) if r is None))
+    if missing:
+        fresh = dict(zip(missing, await retrieve_hits_batch(missing, top_k, mode, filters)))
+        for q in missing:
+            result_cache.put((generation, q, top_k, mode, fkey), fresh[q])
+        results = [fresh[q] if r is None else r for q, r in zip(queries, results)]
+    return results
+
+
+async def search_async(vectors: list[list[float]], top_k: int, filters: Optional[dict] = None) -> list[list[dict]]:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(search_pool, vector_index.search, vectors, top_k, filters)
+
+
+async def lexical_async(queries: list[str], top_k: int, filters: Optional[dict] = None) -> list[list[dict]]:
+    if lexical_index is None:
+        raise HTTPException(status_code=503, detail="Lexical index not built; run jd_chunk_embed.py")
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(search_pool, lexical_index.search, queries, top_k, filters)
+
+
+async def retrieve_hits(query: str, top_k: int, mode: str = "vector", filters: Optional[dict] = None) -> list[dict]:
+    if mode == "lexical":
+        return (await lexical_async([query], top_k, filters))[0]
+    if mode == "hybrid":
+        depth = max(top_k, HYBRID_DEPTH)
+        vector_hits, lexical_hits = await asyncio.gather(
+            vector_search(query, depth, filters), lexical_async([query], depth, filters)
+        )
+        return rrf_fuse([vector_hits, lexical_hits[0]], top_k)
+    return await vector_search(query, top_k, filters)
+
+
+async def vector_search(query: str, top_k: int, filters: Optional[dict] = None) -> list[dict]:
+    # Embed the query using Gemini (or the query cache)
+    print(f"Embedding query: {query}")
+    query_vector = (await embed_queries([query]))[0]
+
+    print(f"Query vector dimension: {len(query_vector)}")
+
+    # Search the vector index (COSINE similarity)
+    hits = (await search_async([query_vector], top_k, filters))[0]
+    print(f"Found {len(hits)} results")
+    return hits
+
+
+def hydrate(results: list[list[dict]]) -> list[list[dict]]:
+    """Copy of `results` with each hit's chunk text under "text" (one bulk lookup)."""
+    flat = [hit for hits in results for hit in hits]
+    texts = chunk_store.get_many([h["chunk_id"] for h in flat], [h["object_url"] for h in flat])
+    return [[dict(hit, text=texts.get(hit["chunk_id"])) for hit in hits] for hits in results]
+
+
+async def hydrate_async(results: list[list[dict]]) -> list[list[dict]]:
+    return await asyncio.to_thread(hydrate, results)
+
+class RetrieveFilters(BaseModel):
+    family: Optional[list[str]] = None
+    level: Optional[list[str]] = None
+    department: Optional[list[str]] = None
+    location: Optional[list[str]] = None
+    employment_type: Optional[list[str]] = None
+    tags: Optional[list[str]] = None   # JDs having any of these tags
+
+    def as_dict(self) -> dict:
+        return self.dict(exclude_none=True)
+
 class RetrieveRequest(BaseModel):
     query: str
-    top_k: int = 5
+    top_k: int = Field(5, ge=1)
+    include_text: bool = False   # return chunk text inline (no MinIO round trip for clients)
+    mode: Literal["vector", "lexical", "hybrid"] = "vector"
+    filters: Optional[RetrieveFilters] = None
+
+class RetrieveBatchRequest(BaseModel):
+    queries: list[str]
+    top_k: int = Field(5, ge=1)
+    include_text: bool = False
+    mode: Literal["vector", "lexical", "hybrid"] = "vector"
+    filters: Optional[RetrieveFilters] = None   # applied to every query
+
+class RetrieveJDsRequest(RetrieveRequest):
+    aggregation: Aggregation = "max"
+    top_m: int = Field(3, ge=1)            # chunks averaged per JD with aggregation="top_m_mean"
+    chunks_per_jd: int = Field(3, ge=1)    # best chunks returned with each JD
+
+class RetrieveJDsBatchRequest(RetrieveBatchRequest):
+    aggregation: Aggregation = "max"
+    top_m: int = Field(3, ge=1)
+    chunks_per_jd: int = Field(3, ge=1)
 
 class ChunkResult(BaseModel):
     chunk_id: str
@@ -42,76 +299,154 @@ class ChunkResult(BaseModel):
     chunk_index: int
     object_url: str
     score: float
+    text: Optional[str] = None
+
+class JDResult(BaseModel):
+    jd_id: int
+    score: float
+    chunks: list[ChunkResult]
 
 @app.post("/retrieve", response_model=list[ChunkResult])
-def retrieve(req: RetrieveRequest):
+async def retrieve(req: RetrieveRequest):
+    filters = req.filters.as_dict() if req.filters else None
     try:
-        # Embed the query using Gemini
-        print(f"Embedding query: {req.query}")
-        query_embeddings = embed_text([req.query])
-        query_vector = query_embeddings[0]
-        
-        print(f"Query vector dimension: {len(query_vector)}")
-        
-        # Search in Milvus using COSINE similarity
-        search_params = {
-            "metric_type": "COSINE",  # Use COSINE similarity for text embeddings
-            "params": {"nprobe": 50}
-        }
-        
-        results = collection.search(
-            data=[query_vector],
-            anns_field="embedding",
-            param=search_params,
-            limit=req.top_k,
-            output_fields=["chunk_id", "jd_id", "chunk_index", "object_url"]
-        )
-        
-        hits = results[0]
-        print(f"Found {len(hits)} results")
+        hits = await cached_hits(req.query, req.top_k, req.mode, filters)
 
         if not hits:
             raise HTTPException(status_code=404, detail="No matches found")
+        if req.include_text:
+            hits = (await hydrate_async([hits]))[0]
 
         # Format results
         out = []
         for hit in hits:
-            out.append(ChunkResult(
-                chunk_id=hit.entity.get("chunk_id"),        
-                jd_id=hit.entity.get("jd_id"),
-                chunk_index=hit.entity.get("chunk_index"),
-                object_url=hit.entity.get("object_url"),
-                score=hit.score  # Milvus returns similarity score
-            ))
+            out.append(ChunkResult(**hit))
         
         return out
         
+    except HTTPException:
+        raise
+    except ValueError as e:  # e.g. index built without metadata
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error during retrieval: {e}")
         raise HTTPException(status_code=500, detail=f"Retrieval failed: {str(e)}")
 
+async def vector_search_batch(queries: list[str], top_k: int, filters: Optional[dict] = None) -> list[list[dict]]:
+    print(f"Embedding {len(queries)} queries")
+    query_vectors = await embed_queries(queries)
+    return await search_async(query_vectors, top_k, filters)
+
+async def retrieve_hits_batch(queries: list[str], top_k: int, mode: str = "vector",
+                              filters: Optional[dict] = None) -> list[list[dict]]:
+    if mode == "lexical":
+        return await lexical_async(queries, top_k, filters)
+    if mode == "hybrid":
+        depth = max(top_k, HYBRID_DEPTH)
+        vector_results, lexical_results = await asyncio.gather(
+            vector_search_batch(queries, depth, filters), lexical_async(queries, depth, filters)
+        )
+        return [rrf_fuse([v, l], top_k) for v, l in zip(vector_results, lexical_results)]
+    return await vector_search_batch(queries, top_k, filters)
+
+def collapse_k(top_k: int) -> int:
+    """Chunk hits to search for `top_k` distinct JDs."""
+    return max(top_k, min(top_k * JD_COLLAPSE_FACTOR, JD_COLLAPSE_MAX_K))
+
+@app.post("/retrieve_batch", response_model=list[list[ChunkResult]])
+async def retrieve_batch(req: RetrieveBatchRequest):
+    """
+    Retrieve for many queries at once: one embedding call and one vector
+    search for the whole batch (none in lexical mode). Results are aligned
+    with `queries`; a query without matches gets an empty list.
+    """
+    if not req.queries:
+        return []
+    if len(req.queries) > RETRIEVE_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {RETRIEVE_BATCH_MAX} queries per batch")
+    filters = req.filters.as_dict() if req.filters else None
+    try:
+        results = await cached_hits_batch(req.queries, req.top_k, req.mode, filters)
+        if req.include_text:
+            results = await hydrate_async(results)
+        return [[ChunkResult(**hit) for hit in hits] for hits in results]
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error during batch retrieval: {e}")
+        raise HTTPException(status_code=500, detail=f"Batch retrieval failed: {str(e)}")
+
+@app.post("/retrieve_jds", response_model=list[JDResult])
+async def retrieve_jds(req: RetrieveJDsRequest):
+    """Top `top_k` distinct JDs for the query, each with its best chunks."""
+    filters = req.filters.as_dict() if req.filters else None
+    k = collapse_k(req.top_k)
+    try:
+        hits = await cached_hits(req.query, k, req.mode, filters)
+        jds = collapse_by_jd(hits, req.top_k, req.aggregation, req.top_m, req.chunks_per_jd)
+        if not jds:
+            raise HTTPException(status_code=404, detail="No matches found")
+        if req.include_text:
+            chunks = await hydrate_async([jd["chunks"] for jd in jds])
+            jds = [dict(jd, chunks=c) for jd, c in zip(jds, chunks)]
+        return [JDResult(**jd) for jd in jds]
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error during JD retrieval: {e}")
+        raise HTTPException(status_code=500, detail=f"Retrieval failed: {str(e)}")
+
+@app.post("/retrieve_jds_batch", response_model=list[list[JDResult]])
+async def retrieve_jds_batch(req: RetrieveJDsBatchRequest):
+    """/retrieve_jds for many queries, with one embedding call and one search."""
+    if not req.queries:
+        return []
+    if len(req.queries) > RETRIEVE_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {RETRIEVE_BATCH_MAX} queries per batch")
+    filters = req.filters.as_dict() if req.filters else None
+    try:
+        results = await cached_hits_batch(req.queries, collapse_k(req.top_k), req.mode, filters)
+        results = [collapse_by_jd(hits, req.top_k, req.aggregation, req.top_m, req.chunks_per_jd) for hits in results]
+        if req.include_text:
+            flat = await hydrate_async([jd["chunks"] for jds in results for jd in jds])
+            flat = iter(flat)
+            results = [[dict(jd, chunks=next(flat)) for jd in jds] for jds in results]
+        return [[JDResult(**jd) for jd in jds] for jds in results]
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error during batch JD retrieval: {e}")
+        raise HTTPException(status_code=500, detail=f"Batch retrieval failed: {str(e)}")
+
 @app.get("/ping")
 def ping():
-    return {"status": "ok", "collection": MILVUS_COLLECTION, "entities": collection.num_entities}
+    return {"status": "ok", "collection": MILVUS_COLLECTION, "backend": vector_index.backend, "entities": vector_index.count()}
 
 @app.get("/health")
 def health():
-    """Health check endpoint that verifies Milvus connection and collection status"""
+    """Health check endpoint that verifies the vector index (Milvus connection / local index) status"""
     try:
-        # Check if collection is loaded
-        collection.load()
-        entity_count = collection.num_entities
         return {
             "status": "healthy",
-            "milvus_connected": True,
-            "collection_name": MILVUS_COLLECTION,
-            "total_entities": entity_count,
-            "collection_loaded": True
+            **vector_index.health(),
+            "lexical_index": lexical_index.health() if lexical_index is not None else None,
+            "embed_cache": embed_cache_stats(),
+            "coalescing": coalescer.stats(),
+            "query_cache": query_cache.stats(),
+            "result_cache": result_cache.stats(),
+            "index_generation": list(loaded_generation),
+            "chunk_store": chunk_store.stats()
         }
     except Exception as e:
         return {
             "status": "unhealthy",
             "error": str(e),
-            "milvus_connected": False,
+            "backend": vector_index.backend,
             "collection_name": MILVUS_COLLECTION
         }
@@ -0,0 +1,16 @@
+-- infra/migrations/004_create_jd_index_state.sql
+
+-- 1. updated_at is bumped by the JD ETL on every upsert
+ALTER TABLE job_descriptions
+  ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;
+
+-- 2. What the vector index currently holds for each JD (maintained by
+--    api/embeddings/jd_chunk_embed.py for incremental re-indexing)
+CREATE TABLE IF NOT EXISTS jd_index_state (
+  jd_id             INT PRIMARY KEY,
+  version           INT NOT NULL,
+  source_updated_at TIMESTAMP,             -- job_descriptions.updated_at at index time
+  content_hash      CHAR(64) NOT NULL,     -- sha256 of chunking config + content_md
+  chunk_count       INT NOT NULL,
+  indexed_at        TIMESTAMP NOT NULL DEFAULT NOW()
+);
@@ -0,0 +1,13 @@
+-- infra/migrations/005_add_jd_content_hash.sql
+
+-- 1. sha256(content_md): the JD ETL skips upserts (and version bumps) when unchanged
+ALTER TABLE job_descriptions
+  ADD COLUMN IF NOT EXISTS content_hash CHAR(64);
+
+-- 2. Raw-file hashes of the last load, so unchanged Markdown files are not even parsed
+CREATE TABLE IF NOT EXISTS jd_source_files (
+  path      TEXT PRIMARY KEY,
+  file_hash CHAR(64) NOT NULL,           -- sha256 of the file bytes
+  job_code  VARCHAR(50),
+  loaded_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
@@ -0,0 +1,8 @@
+-- infra/migrations/006_extend_candidate_profiles.sql
+
+-- Fields of the candidate export (resume_raw is stored in resume_text)
+ALTER TABLE candidate_profiles
+  ADD COLUMN IF NOT EXISTS location      TEXT,
+  ADD COLUMN IF NOT EXISTS resume_parsed JSONB,      -- {"skills": [...], "education": [...], "experience": [...]}
+  ADD COLUMN IF NOT EXISTS parsed_at     TIMESTAMP,
+  ADD COLUMN IF NOT EXISTS updated_at    TIMESTAMP;
@@ -0,0 +1,18 @@
+-- infra/migrations/007_create_matches.sql
+-- Output of api/matching/match_job.py (replaced on every run)
+
+CREATE TABLE IF NOT EXISTS jd_candidate_matches (
+  jd_id        INT NOT NULL REFERENCES job_descriptions(jd_id) ON DELETE CASCADE,
+  rank         INT NOT NULL,
+  candidate_id INT NOT NULL REFERENCES candidate_profiles(candidate_id) ON DELETE CASCADE,
+  score        REAL NOT NULL,
+  PRIMARY KEY (jd_id, rank)
+);
+
+CREATE TABLE IF NOT EXISTS candidate_jd_matches (
+  candidate_id INT NOT NULL REFERENCES candidate_profiles(candidate_id) ON DELETE CASCADE,
+  rank         INT NOT NULL,
+  jd_id        INT NOT NULL REFERENCES job_descriptions(jd_id) ON DELETE CASCADE,
+  score        REAL NOT NULL,
+  PRIMARY KEY (candidate_id, rank)
+);
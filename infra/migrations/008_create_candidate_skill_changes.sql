@@ -0,0 +1,9 @@
+-- infra/migrations/008_create_candidate_skill_changes.sql
+-- Change log written by api/etl/profiles_etl.py for every upserted candidate;
+-- utils/skill_index.py refreshes its in-memory inverted index from it.
+
+CREATE TABLE IF NOT EXISTS candidate_skill_changes (
+  seq          BIGSERIAL PRIMARY KEY,
+  candidate_id INT NOT NULL,
+  changed_at   TIMESTAMP NOT NULL DEFAULT NOW()
+);
@@ -0,0 +1,11 @@
+-- infra/migrations/009_key_jd_source_files_by_loader.sql
+
+-- jd_etl.py and jd_taxonomy_etl.py both record loaded files in jd_source_files:
+-- key it by (loader, path) so one loader's run never makes the other skip files.
+-- Rows recorded before this have no loader and are dropped (both loaders then
+-- reload those files once).
+ALTER TABLE jd_source_files ADD COLUMN IF NOT EXISTS loader VARCHAR(50);
+DELETE FROM jd_source_files WHERE loader IS NULL;
+ALTER TABLE jd_source_files ALTER COLUMN loader SET NOT NULL;
+ALTER TABLE jd_source_files DROP CONSTRAINT IF EXISTS jd_source_files_pkey;
+ALTER TABLE jd_source_files ADD PRIMARY KEY (loader, path);
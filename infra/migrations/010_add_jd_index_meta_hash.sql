@@ -0,0 +1,10 @@
+-- infra/migrations/010_add_jd_index_meta_hash.sql
+
+-- md5 of a JD's metadata columns (department, family, level, location,
+-- employment_type, tags) at index time. Tags and front-matter attributes change
+-- without a version / updated_at bump, so api/embeddings/jd_chunk_embed.py also
+-- re-indexes JDs whose metadata hash moved. Existing rows start NULL: the next
+-- run selects every JD once and, where the content hash still matches, only
+-- records the metadata hash.
+ALTER TABLE jd_index_state
+  ADD COLUMN IF NOT EXISTS meta_hash CHAR(32);
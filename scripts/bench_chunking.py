@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""
+scripts/bench_chunking.py
+
+Benchmark of the chunker (api/embeddings/chunk_utils.py) against the inline
+chunker jd_chunk_embed.py used before, which re-split the growing chunk on
+every paragraph and never split oversized paragraphs:
+
+  - the jd_markdown corpus (front matter stripped, as in content_md)
+  - large synthetic Markdown documents (many short list items)
+  - one huge paragraph (the old chunker returns it as a single chunk)
+
+    python scripts/bench_chunking.py --max-words 300 --sizes 1,10
+"""
+
+import argparse
+import glob
+import os
+import random
+import sys
+import time
+
+import frontmatter
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from api.embeddings.chunk_utils import iter_chunks
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORDS = "data pipeline python sql cloud security network customer product design team lead".split()
+
+
+def old_chunk_text(text: str, max_words: int = 300) -> list[str]:
+    """The former jd_chunk_embed.chunk_text, kept here as the baseline."""
+    paras, chunks, current = text.split("\n\n"), [], ""
+    for p in paras:
+        words = (current + " " + p).split()
+        if len(words) <= max_words:
+            current = (current + "\n\n" + p).strip()
+        else:
+            if current:
+                chunks.append(current.strip())
+            current = p
+    if current:
+        chunks.append(current.strip())
+    return chunks
+
+
+def synthetic_doc(megabytes: float, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    parts, size, section = [], 0, 0
+    while size < megabytes * 1024 * 1024:
+        section += 1
+        part = f"### Section {section}\n" + "\n\n".join(
+            "- " + " ".join(rng.choices(WORDS, k=rng.randint(3, 12))) for _ in range(rng.randint(5, 40))
+        )
+        parts.append(part)
+        size += len(part) + 2
+    return "\n\n".join(parts)
+
+
+def bench(name: str, docs: list[str], max_words: int, repeat: int, run_old: bool = True) -> None:
+    def timed(fn):
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            out = [fn(d) for d in docs]
+            best = min(best, time.perf_counter() - t0)
+        return best, out
+
+    mb = sum(len(d) for d in docs) / 1024 / 1024
+    t_new, new = timed(lambda d: list(iter_chunks(d, max_words=max_words, overlap=0, max_tokens=None)))
+    biggest = max(c.words for chunks in new for c in chunks)
+    line = f"{name:<22} {mb:8.2f} MB  new {t_new * 1e3:9.1f} ms ({mb / t_new:6.1f} MB/s, max {biggest} words)"
+    if run_old:
+        t_old, old = timed(lambda d: old_chunk_text(d, max_words))
+        biggest_old = max(len(c.split()) for chunks in old for c in chunks)
+        line += f"  old {t_old * 1e3:9.1f} ms (max {biggest_old} words)  speedup {t_old / t_new:5.1f}x"
+    print(line)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--max-words", type=int, default=300)
+    ap.add_argument("--sizes", default="1,10", help="synthetic document sizes in MB")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--skip-old-above", type=float, default=20, help="MB above which the baseline is skipped")
+    args = ap.parse_args()
+
+    corpus = [frontmatter.load(f).content for f in sorted(glob.glob(os.path.join(root_dir, "jd_markdown", "*.md")))]
+    bench(f"jd_markdown ({len(corpus)})", corpus, args.max_words, args.repeat)
+    for mb in (float(s) for s in args.sizes.split(",")):
+        bench(f"synthetic {mb:g} MB", [synthetic_doc(mb)], args.max_words, args.repeat, mb <= args.skip_old_above)
+    huge = " ".join(random.Random(1).choices(WORDS, k=200_000))
+    bench("one 200k-word para", [huge], args.max_words, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""
+scripts/bench_embed_batching.py
+
+Offline benchmark: per-JD sequential embedding (the old jd_chunk_embed loop)
+vs. the cross-document batched pipeline, both against FakeEmbedder with a
+simulated round-trip latency.
+
+    python scripts/bench_embed_batching.py --jds 5000 --request-latency 0.05
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from api.embeddings.batching import embed_batched
+from api.embeddings.chunk_utils import chunk_text
+from utils.fake_embed import FakeEmbedder
+
+WORDS = "data pipeline python sql cloud security network customer product design team lead".split()
+
+
+def synthetic_jds(n: int, seed: int = 0) -> list[tuple[int, str]]:
+    rng = random.Random(seed)
+    docs = []
+    for jd_id in range(1, n + 1):
+        sections = []
+        for name in ("Responsibilities", "Requirements", "Benefits"):
+            bullets = ["- " + " ".join(rng.choices(WORDS, k=rng.randint(5, 15))) for _ in range(rng.randint(3, 30))]
+            sections.append(f"### {name}\n" + "\n".join(bullets))
+        docs.append((jd_id, "\n\n".join(sections)))
+    return docs
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--jds", type=int, default=2000)
+    ap.add_argument("--max-words", type=int, default=150)
+    ap.add_argument("--request-latency", type=float, default=0.05, help="seconds per API round trip")
+    ap.add_argument("--item-latency", type=float, default=0.0005, help="seconds per embedded item")
+    ap.add_argument("--max-items", type=int, default=100)
+    ap.add_argument("--max-tokens", type=int, default=20000)
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--dim", type=int, default=64, help="fake vector dim (keeps CPU cost out of the measurement)")
+    args = ap.parse_args()
+
+    docs = synthetic_jds(args.jds)
+    jd_chunks = {jd_id: chunk_text(text, args.max_words) for jd_id, text in docs}
+    n_chunks = sum(len(c) for c in jd_chunks.values())
+    print(f"INFO: {args.jds} JDs, {n_chunks} chunks")
+
+    # Baseline: one request per JD, strictly sequential
+    fake = FakeEmbedder(args.dim, args.request_latency, args.item_latency)
+    t0 = time.perf_counter()
+    baseline = {}
+    for jd_id, chunks in jd_chunks.items():
+        for idx, vec in enumerate(fake(chunks)):
+            baseline[(jd_id, idx)] = vec
+    t_seq = time.perf_counter() - t0
+    seq_calls = fake.calls
+
+    # Batched: cross-document packing + bounded worker pool
+    fake = FakeEmbedder(args.dim, args.request_latency, args.item_latency)
+    t0 = time.perf_counter()
+    batched = embed_batched(
+        (((jd_id, idx), c) for jd_id, chunks in jd_chunks.items() for idx, c in enumerate(chunks)),
+        fake, max_items=args.max_items, max_tokens=args.max_tokens, workers=args.workers,
+    )
+    t_bat = time.perf_counter() - t0
+
+    assert batched == baseline, "batched vectors do not match per-JD vectors"
+    print(f"sequential : {t_seq:8.2f}s  {seq_calls:6d} requests  {n_chunks / t_seq:10.1f} chunks/s")
+    print(f"batched    : {t_bat:8.2f}s  {fake.calls:6d} requests  {n_chunks / t_bat:10.1f} chunks/s")
+    print(f"speedup    : {t_seq / t_bat:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
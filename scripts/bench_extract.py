@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+"""
+scripts/bench_extract.py
+
+/improve_jd extraction throughput: the old inline extraction (pdfminer,
+python-docx, pytesseract called on the event loop) vs. utils/extract.py's
+process pool with per-page PDF parallelism.
+
+Sample files are generated: multi-page text PDFs (written by hand, no PDF
+library needed), DOCX files (python-docx) and PNG images of text (Pillow,
+for OCR). Formats whose libraries are missing are skipped.
+
+For each format and mode, --concurrency uploads are extracted at a time;
+reported are files/s, p50/p99 latency per file, and the event loop's worst
+stall (a ticker coroutine's maximum lateness), which is what every other
+request on the worker waits during extraction.
+
+    python scripts/bench_extract.py --files 16 --pages 12 --concurrency 4
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils import extract
+from utils.extract import docx_text, extract_pages, image_text, pdf_page_count, pdf_pages_text
+
+WORDS = ("data pipeline python sql cloud security network customer product design team lead "
+         "responsibilities requirements experience benefits engineer analyst manager").split()
+
+
+def lines(rng: random.Random, n: int) -> list[str]:
+    return [" ".join(rng.choices(WORDS, k=rng.randint(6, 12))) for _ in range(n)]
+
+
+def write_pdf(path: str, pages: list[list[str]]) -> None:
+    """Minimal PDF: one Helvetica text stream per page."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page_lines in pages:
+        text = "".join(f"({l}) Tj T* " for l in page_lines)
+        stream = f"BT /F1 11 Tf 14 TL 50 780 Td {text}ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+    out, offsets = b"%PDF-1.4\n", []
+    for i, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{o:010d} 00000 n \n" for o in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def write_docx(path: str, paragraphs: list[str]) -> None:
+    from docx import Document
+    doc = Document()
+    for p in paragraphs:
+        doc.add_paragraph(p)
+    doc.save(path)
+
+
+def write_png(path: str, text_lines: list[str]) -> None:
+    from PIL import Image, ImageDraw
+    image = Image.new("L", (1200, 40 + 30 * len(text_lines)), 255)
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(text_lines):
+        draw.text((20, 20 + 30 * i), line, fill=0)
+    image.save(path)
+
+
+def samples(tmp: str, fmt: str, args) -> list[str]:
+    rng = random.Random(0)
+    paths = []
+    for i in range(args.files):
+        path = os.path.join(tmp, f"sample-{i}.{'png' if fmt == 'image' else fmt}")
+        if fmt == "pdf":
+            write_pdf(path, [lines(rng, 50) for _ in range(args.pages)])
+        elif fmt == "docx":
+            write_docx(path, lines(rng, 50 * args.pages))
+        else:
+            write_png(path, lines(rng, 40))
+        paths.append(path)
+    return paths
+
+
+def extract_inline(path: str, fmt: str) -> list[str]:
+    """The old /improve_jd behaviour: everything in the calling thread."""
+    if fmt == "pdf":
+        return pdf_pages_text(path, 0, pdf_page_count(path))
+    return docx_text(path) if fmt == "docx" else image_text(path)
+
+
+async def run(paths: list[str], fmt: str, mode: str, concurrency: int) -> dict:
+    stalls, latencies = [0.0], []
+    done = asyncio.Event()
+
+    async def ticker(interval: float = 0.005):
+        while not done.is_set():
+            t0 = time.perf_counter()
+            await asyncio.sleep(interval)
+            stalls.append(time.perf_counter() - t0 - interval)
+
+    async def one(path: str, sem: asyncio.Semaphore):
+        async with sem:
+            t0 = time.perf_counter()
+            if mode == "inline":
+                extract_inline(path, fmt)
+                await asyncio.sleep(0)
+            else:
+                await extract_pages(path, fmt)
+            latencies.append(time.perf_counter() - t0)
+
+    sem = asyncio.Semaphore(concurrency)
+    tick = asyncio.create_task(ticker())
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(p, sem) for p in paths))
+    elapsed = time.perf_counter() - t0
+    done.set()
+    await tick
+    lat = np.asarray(latencies) * 1e3
+    return {"files_s": len(paths) / elapsed, "p50_ms": float(np.percentile(lat, 50)),
+            "p99_ms": float(np.percentile(lat, 99)), "max_stall_ms": max(stalls) * 1e3}
+
+
+async def bench(args):
+    formats = [f for f in args.formats.split(",") if f]
+    print(f"INFO: {args.files} files per format, {args.pages} pages per PDF/DOCX, "
+          f"concurrency {args.concurrency}, {extract.EXTRACT_WORKERS} pool workers")
+    print(f"{'format':<7} {'mode':<7} {'files/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'loop stall ms':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in formats:
+            try:
+                paths = samples(tmp, fmt, args)
+                extract_inline(paths[0], fmt)   # warm-up; fails early if a library is missing
+            except ImportError as e:
+                print(f"⚠️ {fmt}: {e.name} is not installed, skipping")
+                continue
+            await extract_pages(paths[0], fmt)  # spawns the pool workers
+            for mode in ("inline", "pool"):
+                r = await run(paths, fmt, mode, args.concurrency)
+                print(f"{fmt:<7} {mode:<7} {r['files_s']:>8.1f} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} "
+                      f"{r['max_stall_ms']:>14.1f}")
+    extract.close_extract_pool()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--formats", default="pdf,docx,image")
+    ap.add_argument("--files", type=int, default=16)
+    ap.add_argument("--pages", type=int, default=12, help="pages per PDF (DOCX: same amount of text)")
+    ap.add_argument("--concurrency", type=int, default=4, help="uploads extracted at the same time")
+    args = ap.parse_args()
+    asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+"""
+scripts/bench_index.py
+
+Index tuning / recall benchmark for the retriever's vector index. Runs
+offline: vectors come from utils/fake_embed.py and every index is built
+in-process.
+
+For each corpus, the exact top-k of every query (brute-force float32 cosine)
+is the ground truth, then these configurations are swept:
+
+  - FLAT:      exact search (LocalVectorIndex, nlist=0)
+  - IVF_FLAT:  LocalVectorIndex with nlist in --nlist x nprobe in --nprobe
+               (same parameters, same meaning as the Milvus IVF_FLAT index)
+  - HNSW:      hnswlib, the graph index Milvus HNSW is built on,
+               M in --hnsw-m x ef in --ef (skipped if hnswlib is missing)
+
+Each row reports build time, recall@k, single-query QPS and p50/p99 latency.
+Per corpus, the fastest configuration reaching --target-recall is compared
+with what recommend_index() picks for that collection size.
+
+Corpora: the jd_markdown chunks embedded with FakeEmbedder (queries: the JD
+titles), and clustered synthetic vectors of each --sizes (held-out queries
+from the same distribution).
+
+    python scripts/bench_index.py --sizes 10000,100000 --top-k 10 --json index_bench.json
+"""
+
+import argparse
+import glob
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+
+import frontmatter
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from api.embeddings.chunk_utils import chunk_text
+from utils.fake_embed import FakeEmbedder, clustered_vectors
+from utils.vector_index import LocalVectorIndex, normalize, recommend_index, top_k_rows
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def jd_corpus(dim: int) -> tuple[np.ndarray, np.ndarray]:
+    chunks, titles = [], []
+    for f in sorted(glob.glob(os.path.join(root_dir, "jd_markdown", "*.md"))):
+        post = frontmatter.load(f)
+        chunks += chunk_text(post.content)
+        titles.append(str(post.get("title") or os.path.basename(f)))
+    embed = FakeEmbedder(dim)
+    return np.asarray(embed(chunks), dtype=np.float32), np.asarray(embed(titles), dtype=np.float32)
+
+
+def ints(s: str) -> list[int]:
+    return [int(x) for x in s.split(",") if x]
+
+
+def power_of_two(x: float) -> int:
+    return 2 ** max(0, round(math.log2(max(x, 1))))
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, top_k: int) -> list[set]:
+    rows, _ = top_k_rows(normalize(queries) @ normalize(vectors).T, top_k)
+    return [set(r.tolist()) for r in rows]
+
+
+def measure(search, queries: np.ndarray, truth: list[set], top_k: int) -> dict:
+    """recall@k and latency of `search(query) -> row ids`, one query at a time."""
+    search(queries[0])  # warm-up (page cache, lazy allocations)
+    latencies, recall = [], []
+    for q, expected in zip(queries, truth):
+        t0 = time.perf_counter()
+        found = search(q)
+        latencies.append(time.perf_counter() - t0)
+        recall.append(len(set(found) & expected) / max(1, len(expected)))
+    lat = np.asarray(latencies) * 1e3
+    return {"recall": float(np.mean(recall)), "qps": float(len(lat) / lat.sum() * 1e3),
+            "p50_ms": float(np.percentile(lat, 50)), "p99_ms": float(np.percentile(lat, 99))}
+
+
+def sweep_local(tmp: str, vectors: np.ndarray, queries: np.ndarray, truth: list[set], top_k: int,
+                nlists: list[int], nprobes: list[int]):
+    n = len(vectors)
+    ids = [str(i) for i in range(n)]
+    for nlist in [0] + [l for l in nlists if l < n]:
+        path = os.path.join(tmp, f"nlist-{nlist}")
+        t0 = time.perf_counter()
+        LocalVectorIndex.write(path, ids, vectors, range(n), [0] * n, ["u"] * n, nlist=nlist, quantization="none")
+        build = time.perf_counter() - t0
+        for nprobe in ([0] if not nlist else [p for p in nprobes if p <= nlist]):
+            index = LocalVectorIndex.open(path, nprobe=nprobe or 1)
+            stats = measure(lambda q: [int(h["chunk_id"]) for h in index.search([q], top_k)[0]],
+                            queries, truth, top_k)
+            yield dict(stats, index_type="IVF_FLAT" if nlist else "FLAT", nlist=nlist, nprobe=nprobe, build_s=build)
+            if stats["recall"] >= 0.999:
+                break  # more probes cannot help
+
+
+def sweep_hnsw(vectors: np.ndarray, queries: np.ndarray, truth: list[set], top_k: int,
+               ms: list[int], efs: list[int], ef_construction: int):
+    try:
+        import hnswlib
+    except ImportError:
+        print("⚠️ hnswlib is not installed (pip install hnswlib): skipping HNSW")
+        return
+    data = normalize(vectors)
+    for m in ms:
+        t0 = time.perf_counter()
+        index = hnswlib.Index(space="ip", dim=data.shape[1])
+        index.init_index(max_elements=len(data), M=m, ef_construction=ef_construction)
+        index.add_items(data, np.arange(len(data)))
+        build = time.perf_counter() - t0
+        for ef in efs:
+            index.set_ef(max(ef, top_k))
+            stats = measure(lambda q: index.knn_query(normalize(q), k=top_k)[0][0].tolist(), queries, truth, top_k)
+            yield dict(stats, index_type="HNSW", M=m, ef=max(ef, top_k), build_s=build)
+
+
+def describe(row: dict) -> str:
+    if row["index_type"] == "IVF_FLAT":
+        return f"IVF_FLAT nlist={row['nlist']} nprobe={row['nprobe']}"
+    if row["index_type"] == "HNSW":
+        return f"HNSW M={row['M']} ef={row['ef']}"
+    return "FLAT"
+
+
+def bench(name: str, vectors: np.ndarray, queries: np.ndarray, args) -> dict:
+    n, dim = vectors.shape
+    truth = exact_top_k(vectors, queries, args.top_k)
+    nlists = ints(args.nlist) or sorted({power_of_two(f * math.sqrt(n)) for f in (1, 2, 4, 8)} | {1024})
+    print(f"\n{name}: {n} vectors x {dim} dims, {len(queries)} queries, recall@{args.top_k} vs exact")
+    print(f"{'config':<34} {'build s':>8} {'recall':>7} {'QPS':>8} {'p50 ms':>7} {'p99 ms':>7}")
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        results = list(sweep_local(tmp, vectors, queries, truth, args.top_k, nlists, ints(args.nprobe)))
+        results += sweep_hnsw(vectors, queries, truth, args.top_k, ints(args.hnsw_m), ints(args.ef),
+                              args.ef_construction)
+        for row in results:
+            rows.append(row)
+            print(f"{describe(row):<34} {row['build_s']:>8.2f} {row['recall']:>7.3f} {row['qps']:>8.0f} "
+                  f"{row['p50_ms']:>7.2f} {row['p99_ms']:>7.2f}")
+
+    good = [r for r in rows if r["recall"] >= args.target_recall]
+    best = max(good, key=lambda r: r["qps"]) if good else None
+    rule = recommend_index(n)
+    if best:
+        print(f"✅ Fastest at recall >= {args.target_recall}: {describe(best)} "
+              f"({best['recall']:.3f} recall, {best['qps']:.0f} QPS, p99 {best['p99_ms']:.2f} ms)")
+    else:
+        print(f"⚠️ No configuration reached recall {args.target_recall}")
+    print(f"INFO: recommend_index({n}) -> {describe(rule)}")
+    return {"corpus": name, "count": n, "dim": dim, "results": rows, "best": best, "recommended": rule}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--dim", type=int, default=768)
+    ap.add_argument("--sizes", default="10000,100000", help="synthetic collection sizes (comma-separated)")
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--top-k", type=int, default=10)
+    ap.add_argument("--nlist", default="", help="IVF list counts (default: powers of two around sqrt(n), and 1024)")
+    ap.add_argument("--nprobe", default="1,2,4,8,16,32,64,128")
+    ap.add_argument("--hnsw-m", default="8,16,32")
+    ap.add_argument("--ef", default="16,32,64,128,256")
+    ap.add_argument("--ef-construction", type=int, default=200)
+    ap.add_argument("--target-recall", type=float, default=0.95)
+    ap.add_argument("--json", help="write all results to this file")
+    args = ap.parse_args()
+
+    reports = [bench("jd_markdown (fake embeddings)", *jd_corpus(args.dim), args)]
+    for n in ints(args.sizes):
+        data = clustered_vectors(n + args.queries, args.dim)
+        reports.append(bench(f"synthetic clustered {n}", data[:n], data[n:], args))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+        print(f"INFO: Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""
+scripts/bench_quantization.py
+
+Recall-vs-memory report for the local vector index quantizations
+(none / int8 / binary / pq), with and without exact rescoring:
+
+  - the jd_markdown corpus, chunked like jd_chunk_embed.py and embedded with
+    FakeEmbedder (offline, default) or Gemini (--embedder gemini)
+  - a synthetic clustered corpus of --synthetic vectors (0 = skip)
+
+Queries are noisy copies of corpus vectors; recall@k is measured against
+exact float32 search.
+
+    python scripts/bench_quantization.py --synthetic 100000 --top-k 10
+"""
+
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+
+import frontmatter
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from api.embeddings.chunk_utils import chunk_text
+from utils.fake_embed import FakeEmbedder, clustered_vectors
+from utils.quantization import QUANTIZATIONS
+from utils.vector_index import LocalVectorIndex
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def corpus_vectors(embedder: str, dim: int) -> np.ndarray:
+    chunks = []
+    for f in sorted(glob.glob(os.path.join(root_dir, "jd_markdown", "*.md"))):
+        chunks += chunk_text(frontmatter.load(f).content)
+    if embedder == "gemini":
+        from api.embeddings.batching import embed_batched
+        from utils.gemini_embed import embed_text
+        vectors = embed_batched(enumerate(chunks), embed_text)
+        return np.asarray([vectors[i] for i in range(len(chunks))], dtype=np.float32)
+    return np.asarray(FakeEmbedder(dim)(chunks), dtype=np.float32)
+
+
+def report(name: str, vectors: np.ndarray, n_queries: int, top_k: int, rescores: list[int]) -> None:
+    rng = np.random.default_rng(1)
+    picks = rng.integers(0, len(vectors), size=n_queries)
+    queries = vectors[picks] + 0.3 * rng.normal(size=(n_queries, vectors.shape[1])).astype(np.float32) \
+        * np.linalg.norm(vectors[picks], axis=1, keepdims=True) / np.sqrt(vectors.shape[1])
+    ids = [str(i) for i in range(len(vectors))]
+    n, dim = vectors.shape
+    print(f"\n{name}: {n} vectors x {dim} dims, {n_queries} queries, recall@{top_k} vs exact float32")
+    print(f"{'quantization':<13} {'rescore':>7} {'B/vector':>9} {'in RAM MB':>10} {'recall':>7} {'ms/query':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        exact = None
+        for quantization in QUANTIZATIONS:
+            t0 = time.perf_counter()
+            LocalVectorIndex.write(os.path.join(tmp, quantization), ids, vectors, range(n), [0] * n, ["u"] * n,
+                                   nlist=0, quantization=quantization)
+            build = time.perf_counter() - t0
+            for r in ([0] if quantization == "none" else [0] + rescores):
+                index = LocalVectorIndex.open(os.path.join(tmp, quantization), rescore=r)
+                t0 = time.perf_counter()
+                hits = [index.search([q], top_k)[0] for q in queries]
+                per_query = (time.perf_counter() - t0) / n_queries * 1e3
+                found = [{h["chunk_id"] for h in row} for row in hits]
+                if exact is None:
+                    exact = found
+                recall = np.mean([len(a & b) / max(1, len(b)) for a, b in zip(found, exact)])
+                mb = index.health()["vector_bytes"] / 1024 / 1024
+                print(f"{quantization:<13} {r:>7} {index.health()['vector_bytes'] // n:>9} {mb:>10.1f} "
+                      f"{recall:>7.3f} {per_query:>9.2f}" + (f"   (build {build:.1f}s)" if r == 0 else ""))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--embedder", choices=["fake", "gemini"], default="fake")
+    ap.add_argument("--dim", type=int, default=768)
+    ap.add_argument("--synthetic", type=int, default=50000)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--top-k", type=int, default=10)
+    ap.add_argument("--rescore", default="4,16", help="rescore factors to compare (comma-separated)")
+    args = ap.parse_args()
+
+    rescores = [int(r) for r in args.rescore.split(",") if r]
+    report(f"jd_markdown ({args.embedder} embeddings)", corpus_vectors(args.embedder, args.dim),
+           args.queries, args.top_k, rescores)
+    if args.synthetic:
+        report("synthetic clustered", clustered_vectors(args.synthetic, args.dim), args.queries, args.top_k,
+               rescores)
+
+
+if __name__ == "__main__":
+    main()
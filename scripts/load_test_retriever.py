@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+"""
+scripts/load_test_retriever.py
+
+Offline load test for the retriever. Builds a synthetic local vector index,
+runs the FastAPI app in-process (VECTOR_BACKEND=local) with FakeEmbedder
+standing in for Gemini, fires concurrent /retrieve requests and reports
+throughput and p50/p95/p99 latency.
+
+    python scripts/load_test_retriever.py --requests 2000 --concurrency 64 --distinct 200
+"""
+
+import argparse
+import asyncio
+import importlib
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def percentile(values: list[float], p: float) -> float:
+    return float(np.percentile(np.asarray(values), p)) if values else 0.0
+
+
+async def run(app, queries: list[str], concurrency: int, top_k: int, path: str = "/retrieve") -> tuple[list[float], int, float]:
+    import httpx
+
+    latencies: list[float] = []
+    errors = 0
+    sem = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://retriever") as client:
+        async def one(q: str):
+            nonlocal errors
+            async with sem:
+                t0 = time.perf_counter()
+                resp = await client.post(path, json={"query": q, "top_k": top_k})
+                latencies.append(time.perf_counter() - t0)
+                if resp.status_code != 200:
+                    errors += 1
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(q) for q in queries))
+        wall = time.perf_counter() - t0
+    return latencies, errors, wall
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--concurrency", type=int, default=64)
+    ap.add_argument("--distinct", type=int, default=200, help="number of distinct query strings")
+    ap.add_argument("--corpus", type=int, default=20000, help="chunks in the synthetic index")
+    ap.add_argument("--dim", type=int, default=768)
+    ap.add_argument("--nlist", type=int, default=0, help="IVF lists for the local index (0 = brute force)")
+    ap.add_argument("--top-k", type=int, default=5)
+    ap.add_argument("--embed-latency", type=float, default=0.05, help="simulated Gemini round trip (s)")
+    ap.add_argument("--cache", action="store_true", help="enable the embedding cache")
+    ap.add_argument("--query-caches", action="store_true", help="enable the retriever's query-vector and result caches")
+    args = ap.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="retriever-load-")
+    os.environ["VECTOR_BACKEND"] = "local"
+    os.environ["LOCAL_INDEX_DIR"] = os.path.join(workdir, "index")
+    os.environ["EMBED_CACHE_PATH"] = os.path.join(workdir, "embeddings.sqlite3")
+    os.environ.setdefault("EMBED_CACHE_ENABLED", "1" if args.cache else "0")
+    os.environ["INDEX_GENERATION_FILE"] = os.path.join(workdir, "index_generation")
+    if not args.query_caches:
+        os.environ.setdefault("QUERY_CACHE_SIZE", "0")
+        os.environ.setdefault("RESULT_CACHE_SIZE", "0")
+
+    from utils.fake_embed import FakeEmbedder
+    from utils.vector_index import LocalVectorIndex
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(args.corpus, args.dim)).astype(np.float32)
+    LocalVectorIndex.write(
+        os.environ["LOCAL_INDEX_DIR"],
+        [f"{i // 2}_{i % 2}" for i in range(args.corpus)], vectors,
+        [i // 2 for i in range(args.corpus)], [i % 2 for i in range(args.corpus)],
+        [f"http://minio/jdchunks/jd_{i // 2}_chunk_{i % 2}.txt" for i in range(args.corpus)],
+        nlist=args.nlist,
+    )
+
+    retriever = importlib.import_module("api.retriever.app")
+    fake = FakeEmbedder(args.dim, request_latency=args.embed_latency)
+    retriever.aembed_text = fake.acall
+
+    pool = [f"query {i}" for i in range(args.distinct)]
+    queries = [random.Random(i).choice(pool) for i in range(args.requests)]
+    latencies, errors, wall = asyncio.run(run(retriever.app, queries, args.concurrency, args.top_k))
+
+    print(f"requests    : {len(latencies)} ({errors} errors), concurrency {args.concurrency}")
+    print(f"throughput  : {len(latencies) / wall:.1f} req/s over {wall:.2f}s")
+    print(f"latency p50 : {percentile(latencies, 50) * 1000:.1f} ms")
+    print(f"latency p95 : {percentile(latencies, 95) * 1000:.1f} ms")
+    print(f"latency p99 : {percentile(latencies, 99) * 1000:.1f} ms")
+    print(f"embed calls : {fake.calls}")
+    print(f"coalescing  : {retriever.coalescer.stats()}")
+    if args.query_caches:
+        print(f"query cache : {retriever.query_cache.stats()}")
+        print(f"result cache: {retriever.result_cache.stats()}")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
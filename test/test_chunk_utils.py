@@ -0,0 +1,58 @@
+import os
+import random
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from api.embeddings.chunk_utils import HEADING_RE, chunk_text, estimate_tokens, iter_chunks
+
+JD = """### Responsibilities
+- Build data pipelines.
+- Review code.
+
+### Requirements
+- Python and SQL.
+- 3+ years of experience."""
+
+
+def _random_doc(rng):
+    words = ["alpha", "be", "c", "delta-epsilon", "x" * 30, "node.js"]
+    out = []
+    for s in range(rng.randint(1, 6)):
+        out.append("#" * rng.randint(1, 4) + f" Section {s}")
+        for _ in range(rng.randint(0, 5)):
+            lines = [" ".join(rng.choice(words) for _ in range(rng.randint(1, 400 if rng.random() < 0.1 else 30)))
+                     for _ in range(rng.randint(1, 8))]
+            out += ["\n".join(lines), ""]
+    return "\n".join(out)
+
+
+def test_small_document_is_one_chunk_with_original_text():
+    assert chunk_text(JD) == [JD]
+    chunk = next(iter_chunks(JD))
+    assert chunk.section == "Responsibilities" and chunk.words == len(JD.split())
+
+
+def test_sections_headings_and_limits():
+    chunks = list(iter_chunks(JD, max_words=12))
+    assert [c.section for c in chunks] == ["Responsibilities", "Requirements"]
+    assert all(c.text.startswith("###") for c in chunks)
+
+    # Oversized paragraph: split, continuation chunks repeat the heading
+    doc = "## Skills\n" + " ".join(f"w{i}" for i in range(1000))
+    chunks = list(iter_chunks(doc, max_words=300))
+    assert all(c.text.startswith("## Skills") and c.words <= 300 for c in chunks)
+    body = [w for c in chunks for w in c.text.split() if w.startswith("w")]
+    assert body == [f"w{i}" for i in range(1000)]
+
+
+def test_random_documents_respect_limits_and_keep_content():
+    rng = random.Random(0)
+    for _ in range(200):
+        doc = _random_doc(rng)
+        plain = list(iter_chunks(doc, max_words=50, overlap=0, max_tokens=None, repeat_headings=False))
+        assert [w for c in plain for w in c.text.split()] == doc.split()
+        assert not any(all(HEADING_RE.match(l) for l in c.text.split("\n")) for c in plain[:-1])
+        for kw in ({"max_words": 80, "overlap": 10}, {"max_words": 40, "overlap": 5, "max_tokens": 90}):
+            for c in iter_chunks(doc, **kw):
+                assert c.words == len(c.text.split()) <= kw["max_words"]
+                assert "max_tokens" not in kw or estimate_tokens(c.text) <= kw["max_tokens"]
@@ -0,0 +1,41 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils.collapse import collapse_by_jd
+
+
+def _naive(hits, top_k, aggregation, m, chunks_per_jd):
+    by_jd = {}
+    for h in hits:
+        by_jd.setdefault(h["jd_id"], []).append(h)
+    scored = []
+    for jd_id, chunks in by_jd.items():
+        chunks.sort(key=lambda h: -h["score"])
+        s = [h["score"] for h in chunks]
+        agg = {"max": s[0], "sum": sum(s), "top_m_mean": sum(s[:m]) / len(s[:m])}[aggregation]
+        scored.append((agg, s[0], jd_id, chunks[:chunks_per_jd]))
+    scored.sort(key=lambda t: (-t[0], -t[1]))
+    return [(jd_id, [h["chunk_id"] for h in chunks]) for _, _, jd_id, chunks in scored[:top_k]]
+
+
+def test_collapse_matches_naive_grouping():
+    rng = np.random.default_rng(0)
+    scores = np.sort(rng.random(300))[::-1]
+    hits = [{"chunk_id": f"c{i}", "jd_id": int(rng.integers(0, 40)), "score": float(s)} for i, s in enumerate(scores)]
+    for aggregation in ("max", "sum", "top_m_mean"):
+        jds = collapse_by_jd(hits, 10, aggregation, m=2, chunks_per_jd=3)
+        assert [(j["jd_id"], [h["chunk_id"] for h in j["chunks"]]) for j in jds] == _naive(hits, 10, aggregation, 2, 3)
+        assert len({j["jd_id"] for j in jds}) == 10
+        assert all(a["score"] >= b["score"] for a, b in zip(jds, jds[1:]))
+    assert collapse_by_jd([], 5) == []
+
+
+def test_top_m_mean_rejects_m_below_one():
+    try:
+        collapse_by_jd([{"jd_id": 1, "score": 0.5}], 5, "top_m_mean", m=0)
+        raise AssertionError("expected ValueError")
+    except ValueError:
+        pass
@@ -0,0 +1,29 @@
+import hashlib
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils.extract import ExtractionError, file_format, save_upload
+
+
+def test_file_format():
+    assert file_format("JD.PDF") == "pdf" and file_format("a.b.docx") == "docx"
+    assert file_format("scan.jpeg") == file_format("scan.png") == "image"
+    assert file_format("notes.txt") is None and file_format("README") is None
+
+
+def test_save_upload_copies_in_chunks_and_enforces_the_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr("utils.extract.UPLOAD_CHUNK_BYTES", 3)
+    monkeypatch.setattr("tempfile.tempdir", str(tmp_path))
+    path, file_hash = save_upload(io.BytesIO(b"0123456789"), ".pdf", max_bytes=10)
+    assert file_hash == hashlib.sha256(b"0123456789").hexdigest()
+    with open(path, "rb") as f:
+        assert f.read() == b"0123456789"
+    os.remove(path)
+    with pytest.raises(ExtractionError) as e:
+        save_upload(io.BytesIO(b"0123456789"), ".pdf", max_bytes=9)
+    assert e.value.status_code == 413
+    assert os.listdir(tmp_path) == []   # partial copy removed
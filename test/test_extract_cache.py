@@ -0,0 +1,26 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils.extract_cache import ExtractionCache
+
+
+def test_pages_resume_complete_and_evict(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "x.sqlite3"), max_bytes=10)
+    assert cache.get("h1", "pdf") == (None, {})
+    cache.put_pages("h1", "pdf", 0, ["aa", "bb"])           # interrupted after the first batch
+    assert cache.get("h1", "pdf") == (None, {0: "aa", 1: "bb"})
+    cache.put_pages("h1", "pdf", 2, ["cc"])
+    cache.complete("h1", "pdf", 3)
+    assert cache.get("h1", "pdf") == (["aa", "bb", "cc"], {})
+    assert cache.get("h1", "docx") == (None, {})             # same bytes, other format
+
+    # shared: a second connection (another worker) sees the entry
+    assert ExtractionCache(cache.path).get("h1", "pdf")[0] == ["aa", "bb", "cc"]
+
+    cache.put_pages("h2", "image", 0, ["0123456"])
+    cache.complete("h2", "image", 1)                         # 13 bytes > 10: LRU file "h1" goes
+    assert cache.get("h1", "pdf") == (None, {})
+    assert cache.get("h2", "image")[0] == ["0123456"]
+    stats = cache.stats()
+    assert (stats["hits"], stats["partial_hits"], stats["evicted"], stats["files"]) == (2, 1, 1, 1)
@@ -0,0 +1,41 @@
+import asyncio
+import json
+import os
+import sys
+
+import httpx
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils import gemini_chat
+
+
+def _client(handler):
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url=gemini_chat.GEMINI_API_BASE)
+
+
+def _chunk(text):
+    return "data: " + json.dumps({"candidates": [{"content": {"parts": [{"text": text}]}}]}) + "\r\n\r\n"
+
+
+def test_stream_yields_pieces_and_raises_upstream_errors(monkeypatch):
+    monkeypatch.setattr(gemini_chat, "API_KEY", "k")
+
+    def handler(request):
+        assert request.url.path.endswith(":streamGenerateContent") and request.url.params["alt"] == "sse"
+        body = json.loads(request.content)
+        assert body["systemInstruction"]["parts"][0]["text"] == "sys"
+        return httpx.Response(200, text=_chunk("Hello") + _chunk("") + _chunk(", world"),
+                              headers={"content-type": "text/event-stream"})
+
+    async def collect():
+        return [t async for t in gemini_chat.astream_chat("sys", "hi", 0.3)]
+
+    monkeypatch.setattr(gemini_chat, "_client", _client(handler))
+    assert asyncio.run(collect()) == ["Hello", ", world"]
+
+    monkeypatch.setattr(gemini_chat, "_client", _client(lambda request: httpx.Response(429, text="quota")))
+    try:
+        asyncio.run(collect())
+        raise AssertionError("expected ChatError")
+    except gemini_chat.ChatError as e:
+        assert (e.status_code, e.detail) == (429, "quota")
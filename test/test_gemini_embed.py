@@ -0,0 +1,26 @@
+import asyncio
+import json
+import os
+import sys
+
+import httpx
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils import gemini_embed
+
+
+def test_async_embed_splits_into_requests_of_at_most_100(monkeypatch):
+    monkeypatch.setattr(gemini_embed, "API_KEY", "k")
+    sizes = []
+
+    def handler(request):
+        texts = [r["content"]["parts"][0]["text"] for r in json.loads(request.content)["requests"]]
+        sizes.append(len(texts))
+        return httpx.Response(200, json={"embeddings": [{"values": [float(t)]} for t in texts]})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url=gemini_embed.GEMINI_API_BASE)
+    monkeypatch.setattr(gemini_embed, "_async_client", client)
+    texts = [str(i) for i in range(250)]
+    vectors = asyncio.run(gemini_embed.aembed_text(texts, use_cache=False))
+    assert vectors == [[float(i)] for i in range(250)]
+    assert sorted(sizes) == [50, 100, 100]
@@ -0,0 +1,29 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from api.embeddings.index_state import CANDIDATES_SQL, META_HASH_SQL, content_hash, jd_meta, plan_window
+
+JD = "### Responsibilities\n- Build data pipelines."
+
+
+def _row(jd_id, tags, old_hash, old_count=1, meta_hash="m1"):
+    # CANDIDATES_SQL layout: id, version, updated_at, content, state hash, state chunk count, meta hash, META_SQL
+    return (jd_id, 1, None, JD, old_hash, old_count, meta_hash, "Data", "Engineering", "Senior", "HN", "full_time", tags)
+
+
+def test_tag_only_change_reindexes_metadata():
+    assert f"s.meta_hash IS DISTINCT FROM {META_HASH_SQL}" in CANDIDATES_SQL
+    indexed = content_hash(JD, jd_meta(["Data", "Engineering", "Senior", "HN", "full_time", ["python"]]))
+
+    # same version, updated_at and content; the taxonomy ETL added a tag
+    plan = plan_window([_row(1, ["python", "sql"], indexed, meta_hash="m2")])
+    assert list(plan.jd_chunks) == [1] and plan.unchanged == 0
+    assert plan.metas[1]["tags"] == ["python", "sql"]
+    jd_id, _, _, new_hash, chunk_count, meta_hash = plan.state_rows[0]
+    assert new_hash != indexed and chunk_count == len(plan.jd_chunks[1]) and meta_hash == "m2"
+
+    # first run after migration 010 (no meta hash stored yet): bookkeeping only
+    plan = plan_window([_row(1, ["python"], indexed, old_count=3)])
+    assert plan.jd_chunks == {} and plan.unchanged == 1
+    assert plan.state_rows == [(1, 1, None, indexed, 3, "m1")]
@@ -0,0 +1,97 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils.jd_metadata import MetadataColumns, milvus_expr
+from utils.lexical_index import BM25Index
+from utils.vector_index import LocalIndexBuilder, LocalVectorIndex
+
+
+def _corpus(n=2000, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(20, dim))
+    vecs = (centers[rng.integers(0, 20, size=n)] + 0.3 * rng.normal(size=(n, dim))).astype(np.float32)
+    metas = [{
+        "family": ["Data", "Engineering", "Sales"][i % 3],
+        "level": ["Junior", "Senior", None][i % 5 % 3],
+        "location": "Hanoi" if i % 7 == 0 else "Remote",
+        "tags": [["python"], ["sql", "python"], []][i % 4 % 3],
+    } for i in range(n)]
+    return [f"{i}_0" for i in range(n)], vecs, metas
+
+
+def _matches(meta, filters):
+    return all(
+        bool(set(meta.get("tags") or []) & set(v)) if f == "tags" else meta.get(f) in v
+        for f, v in filters.items()
+    )
+
+
+FILTERS = [
+    {"family": ["Data"]},
+    {"family": ["Data", "Sales"], "level": ["Senior"]},
+    {"location": ["Hanoi"], "tags": ["sql"]},
+    {"level": ["Principal"]},
+]
+
+
+def test_filtered_search_equals_post_filtered_exact(tmp_path):
+    ids, vecs, metas = _corpus()
+    LocalVectorIndex.write(str(tmp_path / "flat"), ids, vecs, range(len(ids)), [0] * len(ids), ["u"] * len(ids),
+                           metadata=metas)
+    LocalVectorIndex.write(str(tmp_path / "ivf"), ids, vecs, range(len(ids)), [0] * len(ids), ["u"] * len(ids),
+                           nlist=16, metadata=metas)
+    flat = LocalVectorIndex.open(str(tmp_path / "flat"))
+    ivf = LocalVectorIndex.open(str(tmp_path / "ivf"), nprobe=16)  # all lists: exact
+
+    normed = vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+    scores = normed[:5] @ normed.T
+    for filters in FILTERS:
+        allowed = np.array([_matches(m, filters) for m in metas])
+        for index in (flat, ivf):
+            hits = index.search(vecs[:5].tolist(), 10, filters)
+            for row, s in zip(hits, scores):
+                expected = [ids[i] for i in np.argsort(-s) if allowed[i]][:10]
+                assert [h["chunk_id"] for h in row] == expected
+
+
+def test_metadata_survives_incremental_builds(tmp_path):
+    ids, vecs, metas = _corpus(n=20)
+    root = str(tmp_path)
+    LocalVectorIndex.write(root, ids, vecs, range(20), [0] * 20, ["u"] * 20, metadata=metas)
+    builder = LocalIndexBuilder(root)
+    builder.drop_jds([0])
+    builder.add("0_0", vecs[0].tolist(), 0, 0, "u", {"family": "Legal", "tags": ["law"]})
+    builder.save()
+    index = LocalVectorIndex.open(root)
+
+    hits = index.search(vecs[:1].tolist(), 20, {"family": ["Legal"]})
+    assert [h["chunk_id"] for h in hits[0]] == ["0_0"]
+    assert len(index.search(vecs[:1].tolist(), 20, {"tags": ["sql"]})[0]) == sum(_matches(m, {"tags": ["sql"]})
+                                                                               for m in metas[1:])
+
+
+def test_lexical_filters_and_milvus_expr(tmp_path):
+    docs = [("1_0", 1, 0, "u", "python data pipelines", {"family": "Data", "tags": ["python"]}),
+            ("2_0", 2, 0, "u", "python backend services", {"family": "Engineering", "tags": []})]
+    BM25Index.write(str(tmp_path), docs)
+    index = BM25Index.open(str(tmp_path))
+    assert {h["chunk_id"] for h in index.search(["python"], 5)[0]} == {"1_0", "2_0"}
+    assert [h["chunk_id"] for h in index.search(["python"], 5, {"family": "Engineering"})[0]] == ["2_0"]
+
+    assert milvus_expr({"level": ["Senior", "Lead"], "tags": ["SQL"]}) == \
+        'level in ["lead", "senior"] and array_contains_any(tags, ["sql"])'
+    assert MetadataColumns.build([]).mask({"family": ["Data"]}).tolist() == []
+
+
+def test_filters_match_case_insensitively(tmp_path):
+    ids, vecs, metas = _corpus(n=50)
+    LocalVectorIndex.write(str(tmp_path), ids, vecs, range(50), [0] * 50, ["u"] * 50, metadata=metas)
+    index = LocalVectorIndex.open(str(tmp_path))
+    expected = [h["chunk_id"] for h in index.search(vecs[:1].tolist(), 50, {"level": ["Senior"]})[0]]
+    assert expected and all(_matches(metas[int(c.split("_")[0])], {"level": ["Senior"]}) for c in expected)
+    for level in ("senior", " SENIOR "):
+        assert [h["chunk_id"] for h in index.search(vecs[:1].tolist(), 50, {"level": [level]})[0]] == expected
+    assert MetadataColumns.build(metas).rows_meta([1])[0]["level"] == "senior"
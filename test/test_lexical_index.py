@@ -0,0 +1,27 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils.lexical_index import BM25Index, rrf_fuse, tokenize
+
+
+def test_bm25_exact_terms_and_rrf(tmp_path):
+    texts = {
+        1: "DATA-JU-014 Data Engineer\nBuild pipelines in Python and SQL.",
+        2: "DATA-JU-020 Data Analyst\nDashboards, SQL and stakeholder reports.",
+        3: "SEC-SE-002 Security Engineer\nHarden Kubernetes clusters; C++ tooling.",
+    }
+    docs = [(f"{jd}_0", jd, 0, f"u{jd}", text) for jd, text in texts.items()]
+    index = BM25Index.open(os.path.dirname(BM25Index.write(str(tmp_path), docs)))
+
+    assert "data-ju-014" in tokenize("data-ju-014") and "014" in tokenize("DATA-JU-014")
+    assert [h["jd_id"] for h in index.search(["DATA-JU-014"], 1)[0]] == [1]
+    assert [h["jd_id"] for h in index.search(["c++ kubernetes"], 3)[0]] == [3]
+    assert {h["jd_id"] for h in index.search(["sql"], 3)[0]} == {1, 2}
+    assert index.search(["nothing matches"], 3) == [[]]
+
+    fused = rrf_fuse([index.search(["sql"], 3)[0], index.search(["dashboards"], 3)[0]], top_k=2)
+    assert fused[0]["jd_id"] == 2
+
+    empty = BM25Index.open(os.path.dirname(BM25Index.write(str(tmp_path / "empty"), [])))
+    assert empty.count() == 0 and empty.search(["sql"], 3) == [[]]
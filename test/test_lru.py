@@ -0,0 +1,20 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils.lru import TTLCache
+
+
+def test_ttl_cache_evicts_lru_and_expires():
+    cache = TTLCache(2, ttl=0.05)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1     # "b" is now least recently used
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("c") == 3
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expired"]) == (2, 2, 1)
+    assert TTLCache(0).put("a", 1) is None and len(TTLCache(0)) == 0
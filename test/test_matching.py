@@ -0,0 +1,55 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from api.matching.engine import ChunkMatrix, match_all
+
+
+def _docs(n, dim, rng, max_chunks=3):
+    return ChunkMatrix.from_docs(
+        (100 + i, rng.normal(size=(rng.integers(1, max_chunks + 1), dim))) for i in range(n)
+    )
+
+
+def _naive(cands, jds, cand_skills, jd_skills, pooling, w):
+    scores = np.zeros((len(cands), len(jds)))
+    for i in range(len(cands)):
+        a = cands.vectors[cands.offsets[i]:cands.offsets[i + 1]]
+        for j in range(len(jds)):
+            b = jds.vectors[jds.offsets[j]:jds.offsets[j + 1]]
+            if pooling == "max":
+                semantic = max(float(x @ y) for x in a for y in b)
+            else:
+                ma, mb = a.mean(axis=0), b.mean(axis=0)
+                semantic = float(ma @ mb / np.linalg.norm(ma) / np.linalg.norm(mb))
+            tags = {t.lower() for t in jd_skills[j]}
+            overlap = len(tags & {s.lower() for s in cand_skills[i]}) / len(tags) if tags else 0.0
+            scores[i, j] = (1 - w) * semantic + w * overlap
+    return scores
+
+
+def test_match_all_agrees_with_naive_scoring():
+    rng = np.random.default_rng(0)
+    cands, jds = _docs(57, 16, rng), _docs(9, 16, rng, max_chunks=4)
+    vocab = ["Python", "SQL", "Docker", "AWS", "Java"]
+    cand_skills = [list(rng.choice(vocab, size=2, replace=False)) for _ in range(len(cands))]
+    jd_skills = [[s.lower() for s in rng.choice(vocab, size=3, replace=False)] for _ in range(len(jds))]
+    jd_skills[0] = []
+
+    for pooling in ("max", "mean"):
+        # small blocks so the running per-JD top-N is merged many times
+        result = match_all(cands, jds, cand_skills, jd_skills, top_n=5, pooling=pooling,
+                           skill_weight=0.3, block_rows=7)
+        expected = _naive(cands, jds, cand_skills, jd_skills, pooling, 0.3)
+
+        np.testing.assert_allclose(result.top_jd_scores, -np.sort(-expected, axis=1)[:, :5], atol=1e-5)
+        np.testing.assert_allclose(result.top_candidate_scores, -np.sort(-expected.T, axis=1)[:, :5], atol=1e-5)
+        for j in range(len(jds)):
+            got = expected[result.top_candidates[j], j]
+            np.testing.assert_allclose(got, result.top_candidate_scores[j], atol=1e-5)
+
+    rows = list(result.jd_rows())
+    assert len(rows) == len(jds) * 5
+    assert rows[0][:2] == (100, 1) and rows[0][2] >= 100
@@ -0,0 +1,26 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils.prompt_context import dedupe_near_duplicates, fit_token_budget, pack_context
+
+BOILERPLATE = "We offer a competitive salary, flexible hours and a yearly training budget for every employee."
+
+
+def test_near_duplicates_are_dropped_in_rank_order():
+    texts = [
+        "Design and operate batch and streaming data pipelines on the cloud.",
+        BOILERPLATE,
+        "Benefits: " + BOILERPLATE.upper(),      # same text, different case / prefix
+        BOILERPLATE[:60],                         # trimmed copy
+        "Mentor junior engineers and review their code.",
+    ]
+    assert dedupe_near_duplicates(texts) == [texts[0], texts[1], texts[4]]
+
+
+def test_budget_keeps_rank_order_and_skips_what_overflows():
+    def count(t):
+        return len(t.split())
+
+    assert fit_token_budget(["a b c", "d e f g h i", "j"], 8, count) == ["a b c", "j"]
+    assert pack_context([BOILERPLATE, BOILERPLATE], 1000, count) == [BOILERPLATE]
@@ -0,0 +1,37 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils.quantization import load_codec, save_codec, train_codec
+from utils.vector_index import LocalVectorIndex
+from test_vector_index import _corpus
+
+
+def test_codec_scores_estimate_cosine(tmp_path):
+    _, vecs, _, _ = _corpus(n=500)
+    normed = vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+    exact = normed[:10] @ normed.T
+    for name, tolerance in (("int8", 0.02), ("pq", 0.15), ("binary", 0.5)):
+        codec = train_codec(name, normed)
+        save_codec(str(tmp_path), codec)
+        codec = load_codec(str(tmp_path), name)
+        approx = codec.scores(normed[:10], codec.encode(normed))
+        assert np.abs(approx - exact).mean() < tolerance, name
+
+
+def test_quantized_search_rescores_to_exact(tmp_path):
+    ids, vecs, jd_ids, idxs = _corpus()
+    LocalVectorIndex.write(str(tmp_path / "flat"), ids, vecs, jd_ids, idxs, ["u"] * len(ids), nlist=0)
+    flat = LocalVectorIndex.open(str(tmp_path / "flat"))
+    queries = vecs[:20].tolist()
+    expected = flat.search(queries, 10)
+    for quantization in ("int8", "binary", "pq"):
+        path = str(tmp_path / quantization)
+        LocalVectorIndex.write(path, ids, vecs, jd_ids, idxs, ["u"] * len(ids), nlist=0, quantization=quantization)
+        index = LocalVectorIndex.open(path, rescore=50)
+        assert index.health()["vector_bytes"] < flat.health()["vector_bytes"] / 3
+        for got, want in zip(index.search(queries, 10), expected):
+            assert [h["chunk_id"] for h in got] == [h["chunk_id"] for h in want], quantization
+            assert np.allclose([h["score"] for h in got], [h["score"] for h in want], atol=1e-5)
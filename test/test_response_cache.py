@@ -0,0 +1,42 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils.response_cache import ResponseCache, response_key, semantic_bucket
+
+
+def test_exact_and_semantic_tiers():
+    cache = ResponseCache(2, threshold=0.95)
+    key = response_key("m", 0.3, "sys", "Data Engineer")
+    assert key != response_key("m", 0.4, "sys", "Data Engineer")
+    assert cache.get(key) is None
+    cache.put(key, "answer", bucket="jd", vector=[1.0, 0.0, 0.0])
+    assert cache.get(key) == "answer"
+
+    # the app only asks the semantic tier after an exact miss
+    assert cache.get("other prompt") is None
+    assert cache.get_similar("jd", np.array([0.99, 0.05, 0.0])) == "answer"
+    assert cache.get_similar("jd", [0.5, 0.5, 0.0]) is None          # not similar enough
+    assert cache.get_similar("questions", [1.0, 0.0, 0.0]) is None   # other prompt kind
+
+    cache.put("k2", "two", bucket="jd", vector=[0.0, 1.0, 0.0])
+    cache.put("k3", "three", bucket="jd", vector=[0.0, 0.0, 1.0])   # evicts `key` from both tiers
+    assert cache.get_similar("jd", [1.0, 0.0, 0.0]) is None
+    cache.bypass()
+    stats = cache.stats()
+    assert (stats["hits_exact"], stats["hits_semantic"], stats["misses"]) == (1, 1, 1)
+    assert stats["hit_rate"] == round(2 / 3, 4)
+    assert stats["bypassed"] == 1 and stats["semantic_entries"] == 2
+
+
+def test_semantic_tier_is_scoped_to_title_level_department():
+    cache = ResponseCache(10, threshold=0.97)
+    prompt = [0.6, 0.8, 0.0]   # identical prompt embeddings: only the title differs
+    senior = semantic_bucket("m", 0.3, "sys", "Senior Data Engineer", "L3", "Data")
+    cache.put("k1", "senior jd", bucket=senior, vector=prompt)
+    junior = semantic_bucket("m", 0.3, "sys", "Junior Data Engineer", "L3", "Data")
+    assert cache.get_similar(junior, prompt) is None
+    same = semantic_bucket("m", 0.3, "sys", " senior  data ENGINEER", "l3", "data")
+    assert cache.get_similar(same, prompt) == "senior jd"
@@ -0,0 +1,44 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils.skill_index import SkillIndex
+
+
+def _index(skills_of):
+    index = SkillIndex()
+    index.set_names({"Python": 1, "SQL": 2, "Docker": 3, "Java": 4})
+    index.build(((c, s) for c, skills in skills_of.items() for s in skills), candidate_ids=skills_of)
+    return index
+
+
+def _expected(skills_of, all_of=(), any_of=(), none_of=()):
+    return [c for c, s in sorted(skills_of.items())
+            if set(all_of) <= s and (not any_of or s & set(any_of)) and not s & set(none_of)]
+
+
+def test_queries_and_incremental_updates():
+    rng = np.random.default_rng(0)
+    skills_of = {int(c): set(rng.choice([1, 2, 3, 4], size=rng.integers(0, 4), replace=False).tolist())
+                 for c in rng.choice(10000, size=500, replace=False)}
+    index = _index(skills_of)
+
+    cases = [((1,), (), ()), ((1, 2), (), ()), ((), (3, 4), ()), ((2,), (3, 4), (1,)), ((), (), (1, 2))]
+    for all_of, any_of, none_of in cases:
+        assert index.query(all_of, any_of, none_of).tolist() == _expected(skills_of, all_of, any_of, none_of)
+
+    assert index.query(["python", "sql"]).tolist() == _expected(skills_of, (1, 2))
+    assert index.query(["cobol"]).tolist() == []
+
+    # Replace some candidates' skills, add a new one, remove one
+    changed = list(skills_of)[:50]
+    changes = {c: {4} for c in changed}
+    changes[20000] = {1, 3}
+    removed = list(skills_of)[60]
+    index.apply(changes, removed=[removed])
+    skills_of.update(changes)
+    del skills_of[removed]
+    for all_of, any_of, none_of in cases:
+        assert index.query(all_of, any_of, none_of).tolist() == _expected(skills_of, all_of, any_of, none_of)
@@ -0,0 +1,75 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils.vector_index import LocalIndexBuilder, LocalVectorIndex, recommend_index
+
+
+def _corpus(n=2000, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    # clustered data, like real embeddings
+    centers = rng.normal(size=(20, dim))
+    vecs = centers[rng.integers(0, 20, size=n)] + 0.3 * rng.normal(size=(n, dim))
+    ids = [f"{i // 2}_{i % 2}" for i in range(n)]
+    return ids, vecs.astype(np.float32), [i // 2 for i in range(n)], [i % 2 for i in range(n)]
+
+
+def test_brute_force_matches_exact_cosine(tmp_path):
+    ids, vecs, jd_ids, idxs = _corpus()
+    LocalVectorIndex.write(str(tmp_path), ids, vecs, jd_ids, idxs, ["u"] * len(ids))
+    index = LocalVectorIndex.open(str(tmp_path))
+
+    queries = vecs[:5]
+    hits = index.search(queries.tolist(), 10)
+    normed = vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+    q = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    exact = np.argsort(-(q @ normed.T), axis=1)[:, :10]
+    for row, expected in zip(hits, exact):
+        assert [h["chunk_id"] for h in row] == [ids[i] for i in expected]
+        assert all(a["score"] >= b["score"] for a, b in zip(row, row[1:]))
+
+
+def test_ivf_recall(tmp_path):
+    ids, vecs, jd_ids, idxs = _corpus()
+    LocalVectorIndex.write(str(tmp_path / "flat"), ids, vecs, jd_ids, idxs, ["u"] * len(ids))
+    LocalVectorIndex.write(str(tmp_path / "ivf"), ids, vecs, jd_ids, idxs, ["u"] * len(ids), nlist=16)
+    flat = LocalVectorIndex.open(str(tmp_path / "flat"))
+    ivf = LocalVectorIndex.open(str(tmp_path / "ivf"), nprobe=4)
+
+    queries = vecs[:50].tolist()
+    recall = np.mean([
+        len({h["chunk_id"] for h in a} & {h["chunk_id"] for h in b}) / 10
+        for a, b in zip(ivf.search(queries, 10), flat.search(queries, 10))
+    ])
+    assert recall >= 0.9
+
+
+def test_builder_replaces_changed_jds(tmp_path):
+    ids, vecs, jd_ids, idxs = _corpus(n=10)
+    LocalVectorIndex.write(str(tmp_path), ids, vecs, jd_ids, idxs, ["old"] * len(ids))
+
+    builder = LocalIndexBuilder(str(tmp_path))
+    builder.drop_jds([0, 4])             # 0 changed, 4 removed
+    builder.add("0_0", vecs[0].tolist(), 0, 0, "new")
+    builder.save()
+
+    index = LocalVectorIndex.open(str(tmp_path))
+    assert index.count() == 10 - 4 + 1
+    assert "4_0" not in index.chunk_ids and "0_1" not in index.chunk_ids
+    top = index.search([vecs[0].tolist()], 1)[0][0]
+    assert top["chunk_id"] == "0_0" and top["object_url"] == "new"
+
+
+def test_recommended_index_scales_with_collection_size(tmp_path):
+    assert recommend_index(5000)["index_type"] == "FLAT"
+    ivf = recommend_index(100_000)
+    assert ivf["index_type"] == "IVF_FLAT" and ivf["nlist"] == 1024 and 8 <= ivf["nprobe"] <= ivf["nlist"]
+    assert recommend_index(100_000_000)["index_type"] == "HNSW"
+    assert recommend_index(100_000_000, hnsw=False)["nlist"] > ivf["nlist"]
+
+    # The local index follows it by default: a small corpus stays exact
+    ids, vecs, jd_ids, idxs = _corpus(n=100)
+    LocalVectorIndex.write(str(tmp_path), ids, vecs, jd_ids, idxs, ["u"] * len(ids))
+    assert LocalVectorIndex.open(str(tmp_path)).health()["nlist"] == 0
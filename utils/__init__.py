@@ -4,5 +4,6 @@ Utils package: shared helper functions (e.g., Gemini embedding, file extraction)
 """
 
 from .gemini_embed import embed_text
+from .embed_cache import EmbeddingCache, embed_cache_stats
 
-__all__ = ["embed_text"]
+__all__ = ["embed_text", "EmbeddingCache", "embed_cache_stats"]
@@ -0,0 +1,181 @@
+"""
+utils/chunk_store.py
+
+Local store of chunk text keyed by chunk_id, so the retriever can return
+chunk text inline instead of only a MinIO object_url.
+
+Lookups go memory LRU -> SQLite file (written by jd_chunk_embed.py) -> MinIO.
+Chunks that have to be fetched from MinIO are downloaded concurrently in one
+bulk step per request and written back to SQLite (read-through).
+
+Chunk ids are reused when a JD is re-chunked: jd_chunk_embed.py replaces the
+SQLite rows, and readers call clear_memory() when a new index generation is
+published so their LRU does not keep serving the old text.
+"""
+
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Optional
+from urllib.parse import urlparse
+
+from .lru import SizedLRU
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHUNK_STORE_PATH      = os.getenv("CHUNK_STORE_PATH", os.path.join(root_dir, ".cache", "chunks.sqlite3"))
+CHUNK_STORE_MAX_MB    = float(os.getenv("CHUNK_STORE_MAX_MB", "64"))
+HYDRATE_FETCH_WORKERS = int(os.getenv("HYDRATE_FETCH_WORKERS", "16"))
+
+# (bucket, object_name) -> text
+ObjectFetcher = Callable[[str, str], str]
+
+
+def minio_fetcher() -> Optional[ObjectFetcher]:
+    """Build a fetcher from the MINIO_* settings, or None if MinIO isn't configured."""
+    endpoint = os.getenv("MINIO_ENDPOINT")
+    if not endpoint:
+        return None
+    try:
+        from minio import Minio
+    except ImportError:
+        print("⚠️ WARNING: minio is not installed; chunk text will only be served from the local store.")
+        return None
+
+    client = Minio(
+        endpoint,
+        access_key=os.getenv("MINIO_ACCESS_KEY"),
+        secret_key=os.getenv("MINIO_SECRET_KEY"),
+        secure=False
+    )
+
+    def fetch(bucket: str, name: str) -> str:
+        resp = client.get_object(bucket, name)
+        try:
+            return resp.read().decode("utf-8")
+        finally:
+            resp.close()
+            resp.release_conn()
+
+    return fetch
+
+
+def split_object_url(url: str) -> tuple[str, str]:
+    """http://host:9000/<bucket>/<object> -> (bucket, object)"""
+    bucket, _, name = urlparse(url).path.lstrip("/").partition("/")
+    return bucket, name
+
+
+class ChunkTextStore:
+    def __init__(self, path: str = CHUNK_STORE_PATH,
+                 max_memory_bytes: int = int(CHUNK_STORE_MAX_MB * 1024 * 1024),
+                 fetcher: Optional[ObjectFetcher] = None,
+                 fetch_workers: int = HYDRATE_FETCH_WORKERS):
+        self._lru = SizedLRU(max_memory_bytes)
+        self._lock = threading.Lock()
+        self.fetcher = fetcher
+        self._pool = ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix="chunk-fetch") if fetcher else None
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.fetched = 0
+        self.missing = 0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL;")
+        self._db.execute("PRAGMA synchronous=NORMAL;")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+              chunk_id TEXT PRIMARY KEY,
+              text     TEXT NOT NULL
+            ) WITHOUT ROWID;
+        """)
+        self._db.commit()
+
+    def _remember(self, chunk_id: str, text: str) -> None:
+        self._lru.put(chunk_id, text, len(text.encode("utf-8")) + len(chunk_id))
+
+    def put_many(self, items: Iterable[tuple[str, str]], replace: bool = True) -> None:
+        """Store (chunk_id, text) pairs; with replace=False, rows already stored are kept."""
+        items = list(items)
+        verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+        with self._lock:
+            self._db.executemany(f"{verb} INTO chunks (chunk_id, text) VALUES (?, ?);", items)
+            self._db.commit()
+        for chunk_id, text in items:
+            self._remember(chunk_id, text)
+
+    def delete_many(self, chunk_ids: Iterable[str]) -> None:
+        chunk_ids = list(chunk_ids)
+        with self._lock:
+            self._db.executemany("DELETE FROM chunks WHERE chunk_id = ?;", [(c,) for c in chunk_ids])
+            self._db.commit()
+        for chunk_id in chunk_ids:
+            self._lru.pop(chunk_id)
+
+    def get_many(self, chunk_ids: list[str], object_urls: Optional[list[str]] = None) -> dict[str, str]:
+        """
+        Text for each of `chunk_ids` that can be found. With `object_urls`
+        (aligned with `chunk_ids`) and a fetcher configured, chunks missing
+        locally are bulk-fetched from MinIO.
+        """
+        out: dict[str, str] = {}
+        todo = []
+        for chunk_id in dict.fromkeys(chunk_ids):
+            text = self._lru.get(chunk_id)
+            if text is not None:
+                out[chunk_id] = text
+                self.hits_memory += 1
+            else:
+                todo.append(chunk_id)
+
+        if todo:
+            with self._lock:
+                for start in range(0, len(todo), 500):
+                    part = todo[start:start + 500]
+                    rows = self._db.execute(
+                        f"SELECT chunk_id, text FROM chunks WHERE chunk_id IN ({','.join('?' * len(part))});",
+                        part,
+                    ).fetchall()
+                    for chunk_id, text in rows:
+                        out[chunk_id] = text
+                        self._remember(chunk_id, text)
+                        self.hits_disk += 1
+
+        remote = [c for c in todo if c not in out]
+        if remote and self.fetcher is not None and object_urls is not None:
+            url_of = dict(zip(chunk_ids, object_urls))
+            futures = {
+                chunk_id: self._pool.submit(self.fetcher, *split_object_url(url_of[chunk_id]))
+                for chunk_id in remote
+            }
+            fetched = []
+            for chunk_id, fut in futures.items():
+                try:
+                    fetched.append((chunk_id, fut.result()))
+                except Exception as e:
+                    print(f"❌ Failed to fetch chunk {chunk_id} from MinIO: {e}")
+            self.fetched += len(fetched)
+            if fetched:
+                out.update(fetched)
+                # never overwrite text the embedding job wrote while this fetch was in flight
+                self.put_many(fetched, replace=False)
+
+        self.missing += len([c for c in todo if c not in out])
+        return out
+
+    def clear_memory(self) -> None:
+        """Drop the in-memory tier (after a re-index; SQLite holds the current text)."""
+        self._lru.clear()
+
+    def stats(self) -> dict:
+        return {
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "fetched_minio": self.fetched,
+            "missing": self.missing,
+            "memory_entries": len(self._lru),
+            "memory_bytes": self._lru.bytes,
+        }
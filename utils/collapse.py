@@ -0,0 +1,60 @@
+"""
+utils/collapse.py
+
+Chunk-to-JD aggregation for document-level retrieval: chunk hits (from a
+search with a larger internal k) are grouped by jd_id, each JD is scored from
+its chunk scores and the best `top_k` distinct JDs are returned with their
+best chunks. Grouping and scoring run on NumPy arrays built from the hits
+(one sort, segment reductions), not per-JD Python loops.
+
+Aggregations:
+  - "max":        best chunk score
+  - "sum":        sum of chunk scores (favors JDs matching in many places)
+  - "top_m_mean": mean of the JD's best `m` chunk scores
+"""
+
+from typing import Literal
+
+import numpy as np
+
+Aggregation = Literal["max", "sum", "top_m_mean"]
+
+
+def collapse_by_jd(hits: list[dict], top_k: int, aggregation: Aggregation = "max",
+                   m: int = 3, chunks_per_jd: int = 3) -> list[dict]:
+    """
+    Group chunk `hits` by jd_id and return up to `top_k` dicts
+    {"jd_id", "score", "chunks"} best first; "chunks" are the JD's best
+    `chunks_per_jd` hits, best first.
+    """
+    if m < 1:
+        raise ValueError(f"m must be at least 1, got {m}")
+    if not hits or top_k <= 0:
+        return []
+    jd_ids = np.fromiter((h["jd_id"] for h in hits), dtype=np.int64, count=len(hits))
+    scores = np.fromiter((h["score"] for h in hits), dtype=np.float64, count=len(hits))
+
+    # Group by JD, best chunk first within each group
+    order = np.lexsort((-scores, jd_ids))
+    sorted_scores = scores[order]
+    groups, starts, counts = np.unique(jd_ids[order], return_index=True, return_counts=True)
+    if aggregation == "max":
+        agg = sorted_scores[starts]
+    elif aggregation == "sum":
+        agg = np.add.reduceat(sorted_scores, starts)
+    elif aggregation == "top_m_mean":
+        # Rank of each chunk inside its JD; only the first m count
+        rank = np.arange(len(order)) - np.repeat(starts, counts)
+        group_of = np.repeat(np.arange(len(groups)), counts)
+        agg = np.bincount(group_of, weights=np.where(rank < m, sorted_scores, 0.0), minlength=len(groups))
+        agg /= np.minimum(counts, m)
+    else:
+        raise ValueError(f"Unknown aggregation {aggregation!r}")
+
+    # Best JDs first; ties broken by best chunk score
+    best = np.lexsort((-sorted_scores[starts], -agg))[:top_k]
+    out = []
+    for g in best:
+        rows = order[starts[g]:starts[g] + min(counts[g], chunks_per_jd)]
+        out.append({"jd_id": int(groups[g]), "score": float(agg[g]), "chunks": [hits[r] for r in rows]})
+    return out
@@ -0,0 +1,163 @@
+"""
+utils/embed_cache.py
+
+Content-addressed cache for embedding vectors.
+
+Entries are keyed on (model, task_type, sha256(text)) and stored in a SQLite
+file so they survive across runs and are shared between processes (the
+embedding job and the retriever). A size-bounded in-process LRU sits in front
+of SQLite so hot keys (e.g. repeated retriever queries) never touch disk.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+from typing import Optional
+
+from .lru import SizedLRU
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+EMBED_CACHE_PATH    = os.getenv("EMBED_CACHE_PATH", os.path.join(root_dir, ".cache", "embeddings.sqlite3"))
+EMBED_CACHE_MAX_MB  = float(os.getenv("EMBED_CACHE_MAX_MB", "256"))
+
+
+def text_hash(text: str) -> str:
+    """Return the hex sha256 digest of `text` (UTF-8)."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Two-tier (memory LRU + SQLite) cache of embedding vectors.
+
+    Vectors are stored as packed float32, so a 768-dim vector costs ~3 KB both
+    in memory and on disk. The LRU evicts by total byte size, not entry count.
+    """
+
+    def __init__(self, path: str = EMBED_CACHE_PATH, max_memory_bytes: int = int(EMBED_CACHE_MAX_MB * 1024 * 1024)):
+        self.path = path
+        self._lru = SizedLRU(max_memory_bytes)
+        self._lock = threading.Lock()
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL;")
+        self._db.execute("PRAGMA synchronous=NORMAL;")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+              model     TEXT NOT NULL,
+              task_type TEXT NOT NULL,
+              text_hash TEXT NOT NULL,
+              dim       INTEGER NOT NULL,
+              vector    BLOB NOT NULL,
+              PRIMARY KEY (model, task_type, text_hash)
+            ) WITHOUT ROWID;
+        """)
+        self._db.commit()
+
+    def _remember(self, key: tuple, vec: array) -> None:
+        self._lru.put(key, vec, vec.itemsize * len(vec))
+
+    # -- public API ----------------------------------------------------------
+    def get_many(self, model: str, task_type: str, texts: list[str]) -> list[Optional[list[float]]]:
+        """
+        Look up vectors for `texts`. Returns a list aligned with `texts`
+        holding the cached vector or None for a miss.
+        """
+        keys = [(model, task_type, text_hash(t)) for t in texts]
+        out: list[Optional[list[float]]] = [None] * len(texts)
+        disk_lookup: dict[str, list[int]] = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vec = self._lru.get(key)
+                if vec is not None:
+                    out[i] = vec.tolist()
+                    self.hits_memory += 1
+                else:
+                    disk_lookup.setdefault(key[2], []).append(i)
+
+            hashes = list(disk_lookup)
+            # SQLite caps bound parameters per statement; query in slices.
+            for start in range(0, len(hashes), 500):
+                part = hashes[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND task_type = ? AND text_hash IN ({','.join('?' * len(part))});",
+                    (model, task_type, *part),
+                ).fetchall()
+                for h, blob in rows:
+                    vec = array("f")
+                    vec.frombytes(blob)
+                    self._remember((model, task_type, h), vec)
+                    for i in disk_lookup[h]:
+                        out[i] = vec.tolist()
+                        self.hits_disk += 1
+
+            self.misses += sum(1 for v in out if v is None)
+        return out
+
+    def put_many(self, model: str, task_type: str, texts: list[str], vectors: list[list[float]]) -> None:
+        """Store `vectors` for `texts` in both tiers."""
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                h = text_hash(text)
+                vec = array("f", vector)
+                self._remember((model, task_type, h), vec)
+                rows.append((model, task_type, h, len(vec), vec.tobytes()))
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, task_type, text_hash, dim, vector) VALUES (?,?,?,?,?);",
+                rows,
+            )
+            self._db.commit()
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current tier sizes."""
+        with self._lock:
+            hits = self.hits_memory + self.hits_disk
+            lookups = hits + self.misses
+            disk_entries = self._db.execute("SELECT COUNT(*) FROM embeddings;").fetchone()[0]
+            return {
+                "hits": hits,
+                "hits_memory": self.hits_memory,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._lru),
+                "memory_bytes": self._lru.bytes,
+                "disk_entries": disk_entries,
+            }
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.hits_memory = self.hits_disk = self.misses = 0
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embed_cache() -> Optional[EmbeddingCache]:
+    """Process-wide cache instance, or None when EMBED_CACHE_ENABLED is off."""
+    global _cache
+    if not EMBED_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache()
+        return _cache
+
+
+def embed_cache_stats() -> dict:
+    """Counters of the process-wide cache (empty dict when disabled)."""
+    cache = get_embed_cache()
+    return cache.stats() if cache else {}
@@ -0,0 +1,214 @@
+"""
+utils/extract.py
+
+Text extraction for uploaded JD files (PDF, DOCX, JPG/PNG) off the event
+loop, on a bounded process pool:
+
+  - an upload is copied in chunks to a temp file (never read into memory
+    whole), and workers get its path
+  - a PDF is split into page ranges of EXTRACT_PDF_PAGES_PER_TASK pages
+    extracted in parallel; the joined text is what pdfminer's extract_text
+    returns for the whole file (pages end with a form feed)
+  - each format has a deadline (EXTRACT_TIMEOUT_*); OCR is also stopped in
+    the worker (tesseract's own timeout), pdfminer / python-docx jobs keep
+    their worker until they finish
+  - workers are spawned (not forked from the threaded server) and import
+    pdfminer / python-docx / PIL / pytesseract on first use
+  - results are cached per page under the file's sha256, computed while
+    copying (utils/extract_cache.py): a re-upload skips extraction
+
+Errors are raised as ExtractionError with the HTTP status to answer.
+"""
+
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Awaitable, BinaryIO, Callable, Optional
+
+from .extract_cache import get_extract_cache
+
+EXTRACT_WORKERS             = int(os.getenv("EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+EXTRACT_PDF_PAGES_PER_TASK  = int(os.getenv("EXTRACT_PDF_PAGES_PER_TASK", "4"))
+EXTRACT_TIMEOUT_PDF         = float(os.getenv("EXTRACT_TIMEOUT_PDF", "60"))    # seconds per file
+EXTRACT_TIMEOUT_DOCX        = float(os.getenv("EXTRACT_TIMEOUT_DOCX", "20"))
+EXTRACT_TIMEOUT_IMAGE       = float(os.getenv("EXTRACT_TIMEOUT_IMAGE", "60"))
+UPLOAD_MAX_BYTES            = int(os.getenv("UPLOAD_MAX_BYTES", str(20 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES          = 1024 * 1024
+
+FORMATS = {"pdf": "pdf", "docx": "docx", "jpg": "image", "jpeg": "image", "png": "image"}
+TIMEOUTS = {"pdf": EXTRACT_TIMEOUT_PDF, "docx": EXTRACT_TIMEOUT_DOCX, "image": EXTRACT_TIMEOUT_IMAGE}
+
+
+class ExtractionError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(f"{status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+
+def file_format(filename: str) -> Optional[str]:
+    """"pdf", "docx" or "image" by file extension; None if unsupported."""
+    return FORMATS.get(filename.lower().rsplit(".", 1)[-1])
+
+
+def save_upload(src: BinaryIO, suffix: str = "", max_bytes: int = UPLOAD_MAX_BYTES) -> tuple[str, str]:
+    """
+    Copy `src` to a new temp file chunk by chunk; returns its path (the
+    caller removes it) and the hex sha256 of its content.
+    """
+    fd, path = tempfile.mkstemp(suffix=suffix, prefix="upload-")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := src.read(UPLOAD_CHUNK_BYTES):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ExtractionError(413, f"File larger than {max_bytes} bytes")
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, digest.hexdigest()
+
+
+# ---- worker side --------------------------------------------------------------------------------
+
+def pdf_page_count(path: str) -> int:
+    from pdfminer.pdfpage import PDFPage
+    with open(path, "rb") as f:
+        return sum(1 for _ in PDFPage.get_pages(f))
+
+
+def pdf_pages_text(path: str, first: int, last: int) -> list[str]:
+    """Text of pages [first, last), one string per page, as pdfminer's extract_text lays it out."""
+    import io
+    from pdfminer.converter import TextConverter
+    from pdfminer.layout import LAParams
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
+
+    rsrc = PDFResourceManager()
+    out = io.StringIO()
+    device = TextConverter(rsrc, out, laparams=LAParams())
+    interpreter = PDFPageInterpreter(rsrc, device)
+    pages = []
+    with open(path, "rb") as f:
+        for page in PDFPage.get_pages(f, pagenos=range(first, last)):
+            interpreter.process_page(page)
+            pages.append(out.getvalue())
+            out.seek(0)
+            out.truncate()
+    device.close()
+    return pages
+
+
+def docx_text(path: str) -> list[str]:
+    from docx import Document
+    return ["\n".join(p.text for p in Document(path).paragraphs)]
+
+
+def image_text(path: str, timeout: float = 0) -> list[str]:
+    import pytesseract
+    from PIL import Image
+    with Image.open(path) as image:
+        return [pytesseract.image_to_string(image, timeout=timeout)]
+
+
+# ---- pool side ----------------------------------------------------------------------------------
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_extract_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=EXTRACT_WORKERS,
+                                    mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def close_extract_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def _run(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(get_extract_pool(), fn, *args)
+
+
+PageStore = Callable[[int, list[str]], Awaitable[None]]
+
+
+async def _extract(path: str, fmt: str, known: dict[int, str], store: Optional[PageStore]) -> list[str]:
+    async def run_batch(first: int, fn, *args) -> list[str]:
+        texts = await _run(fn, *args)
+        if store is not None:
+            await store(first, texts)
+        return texts
+
+    if fmt == "docx":
+        return await run_batch(0, docx_text, path)
+    if fmt == "image":
+        return await run_batch(0, image_text, path, TIMEOUTS["image"])
+    n = await _run(pdf_page_count, path)
+    step = max(1, EXTRACT_PDF_PAGES_PER_TASK)
+
+    async def pdf_batch(first: int, last: int) -> list[str]:
+        if all(i in known for i in range(first, last)):
+            return [known[i] for i in range(first, last)]
+        return await run_batch(first, pdf_pages_text, path, first, last)
+
+    parts = await asyncio.gather(*(pdf_batch(first, min(first + step, n)) for first in range(0, n, step)))
+    return [page for part in parts for page in part]
+
+
+async def extract_pages(path: str, fmt: str, known: Optional[dict[int, str]] = None,
+                        store: Optional[PageStore] = None) -> list[str]:
+    """
+    Text of the file at `path` per page (one element for DOCX and images).
+    PDF batches whose pages are all in `known` are not extracted again;
+    `store(first_page, texts)` is awaited after each extracted batch.
+    """
+    try:
+        return await asyncio.wait_for(_extract(path, fmt, known or {}, store), TIMEOUTS[fmt])
+    except asyncio.TimeoutError:
+        raise ExtractionError(504, f"Text extraction timed out after {TIMEOUTS[fmt]:.0f}s")
+    except BrokenProcessPool:
+        close_extract_pool()   # a worker died (e.g. out of memory): next call gets a fresh pool
+        raise ExtractionError(503, "Extraction worker crashed, please retry")
+    except RuntimeError as e:
+        if "timeout" in str(e).lower():   # pytesseract's timeout inside the worker
+            raise ExtractionError(504, f"Text extraction timed out after {TIMEOUTS[fmt]:.0f}s")
+        raise ExtractionError(422, f"Could not extract text: {e}")
+    except Exception as e:
+        raise ExtractionError(422, f"Could not extract text: {e}")
+
+
+async def extract_upload(src: BinaryIO, filename: str) -> str:
+    """Text of an uploaded file object (e.g. UploadFile.file)."""
+    fmt = file_format(filename)
+    if fmt is None:
+        raise ExtractionError(400, "Unsupported file type")
+    path, file_hash = await asyncio.to_thread(save_upload, src, os.path.splitext(filename)[1])
+    try:
+        cache = get_extract_cache()
+        if cache is None:
+            return "".join(await extract_pages(path, fmt))
+        pages, known = await asyncio.to_thread(cache.get, file_hash, fmt)
+        if pages is None:
+            async def store(first: int, texts: list[str]) -> None:
+                await asyncio.to_thread(cache.put_pages, file_hash, fmt, first, texts)
+
+            pages = await extract_pages(path, fmt, known, store)
+            await asyncio.to_thread(cache.complete, file_hash, fmt, len(pages))
+        return "".join(pages)
+    finally:
+        os.remove(path)
@@ -0,0 +1,162 @@
+"""
+utils/extract_cache.py
+
+Content-addressed cache of extracted upload text.
+
+Entries are keyed on (sha256 of the file's bytes, format) and stored per
+page in a SQLite file shared by all prompt_generator workers, so a
+re-uploaded file skips extraction entirely. Pages are stored as soon as
+their batch is extracted: an extraction that timed out half-way resumes
+from the missing pages on the next upload.
+
+A file counts as cached once complete() recorded its page count. Beyond
+EXTRACT_CACHE_MAX_MB of text, the least recently used files are evicted.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+EXTRACT_CACHE_ENABLED = os.getenv("EXTRACT_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+EXTRACT_CACHE_PATH    = os.getenv("EXTRACT_CACHE_PATH", os.path.join(root_dir, ".cache", "extractions.sqlite3"))
+EXTRACT_CACHE_MAX_MB  = float(os.getenv("EXTRACT_CACHE_MAX_MB", "256"))
+
+
+class ExtractionCache:
+    def __init__(self, path: str = EXTRACT_CACHE_PATH, max_bytes: int = int(EXTRACT_CACHE_MAX_MB * 1024 * 1024)):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # several server processes write the same file: wait for their locks instead of failing
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL;")
+        self._db.execute("PRAGMA synchronous=NORMAL;")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+              file_hash TEXT NOT NULL,
+              format    TEXT NOT NULL,
+              pages     INTEGER,            -- NULL until complete()
+              bytes     INTEGER NOT NULL DEFAULT 0,
+              last_used REAL NOT NULL,
+              PRIMARY KEY (file_hash, format)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS files_last_used ON files (last_used);
+            CREATE TABLE IF NOT EXISTS pages (
+              file_hash TEXT NOT NULL,
+              format    TEXT NOT NULL,
+              page      INTEGER NOT NULL,
+              text      TEXT NOT NULL,
+              PRIMARY KEY (file_hash, format, page)
+            ) WITHOUT ROWID;
+        """)
+        self._db.commit()
+
+    def _pages(self, file_hash: str, fmt: str) -> dict[int, str]:
+        rows = self._db.execute("SELECT page, text FROM pages WHERE file_hash = ? AND format = ?;",
+                                (file_hash, fmt)).fetchall()
+        return dict(rows)
+
+    def get(self, file_hash: str, fmt: str) -> tuple[Optional[list[str]], dict[int, str]]:
+        """
+        (all pages, {}) of a completely cached file; otherwise (None, the pages
+        already extracted by an earlier, interrupted run).
+        """
+        with self._lock:
+            row = self._db.execute("SELECT pages FROM files WHERE file_hash = ? AND format = ?;",
+                                   (file_hash, fmt)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None, {}
+            pages = self._pages(file_hash, fmt)
+            if row[0] is not None and len(pages) == row[0]:
+                self._db.execute("UPDATE files SET last_used = ? WHERE file_hash = ? AND format = ?;",
+                                 (time.time(), file_hash, fmt))
+                self._db.commit()
+                self.hits += 1
+                return [pages[i] for i in range(row[0])], {}
+            self.partial_hits += 1 if pages else 0
+            self.misses += 0 if pages else 1
+            return None, pages
+
+    def put_pages(self, file_hash: str, fmt: str, first: int, texts: list[str]) -> None:
+        """Store pages first, first + 1, ... of a file."""
+        size = sum(len(t.encode("utf-8")) for t in texts)
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO pages (file_hash, format, page, text) VALUES (?,?,?,?);",
+                [(file_hash, fmt, first + i, t) for i, t in enumerate(texts)])
+            self._db.execute(
+                "INSERT INTO files (file_hash, format, bytes, last_used) VALUES (?,?,?,?) "
+                "ON CONFLICT (file_hash, format) DO UPDATE SET bytes = bytes + excluded.bytes, "
+                "last_used = excluded.last_used;",
+                (file_hash, fmt, size, time.time()))
+            self._db.commit()
+
+    def complete(self, file_hash: str, fmt: str, n_pages: int) -> None:
+        """Mark a file as fully extracted, then evict beyond the size budget."""
+        with self._lock:
+            # exact size: pages re-extracted after an interrupted run were counted twice by put_pages
+            size = self._db.execute(
+                "SELECT COALESCE(SUM(LENGTH(CAST(text AS BLOB))), 0) FROM pages WHERE file_hash = ? AND format = ?;",
+                (file_hash, fmt)).fetchone()[0]
+            self._db.execute(
+                "INSERT OR REPLACE INTO files (file_hash, format, pages, bytes, last_used) VALUES (?,?,?,?,?);",
+                (file_hash, fmt, n_pages, size, time.time()))
+            self._evict()
+            self._db.commit()
+
+    def _evict(self) -> None:
+        total = self._db.execute("SELECT COALESCE(SUM(bytes), 0) FROM files;").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for file_hash, fmt, size in self._db.execute(
+                "SELECT file_hash, format, bytes FROM files ORDER BY last_used;"):
+            if total <= self.max_bytes:
+                break
+            victims.append((file_hash, fmt))
+            total -= size
+        self._db.executemany("DELETE FROM pages WHERE file_hash = ? AND format = ?;", victims)
+        self._db.executemany("DELETE FROM files WHERE file_hash = ? AND format = ?;", victims)
+        self.evicted += len(victims)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.partial_hits + self.misses
+            files, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM files;").fetchone()
+            return {
+                "hits": self.hits,
+                "partial_hits": self.partial_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evicted": self.evicted,
+                "files": files,
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+            }
+
+
+_cache: Optional[ExtractionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_extract_cache() -> Optional[ExtractionCache]:
+    """Process-wide cache instance, or None when EXTRACT_CACHE_ENABLED is off."""
+    global _cache
+    if not EXTRACT_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ExtractionCache()
+        return _cache
@@ -0,0 +1,63 @@
+"""
+utils/fake_embed.py
+
+Deterministic, offline stand-in for `embed_text`, used by benchmarks and
+load tests. Vectors are seeded from sha256(text) so identical texts always
+map to the same unit vector, and an optional latency model mimics the cost
+of a real API round trip (fixed per request + per item).
+
+FakeEmbedder vectors are unrelated to each other; clustered_vectors() makes
+synthetic corpora with the structure of real text embeddings (clusters and a
+decaying variance spectrum), for benchmarking vector indexes at any size.
+"""
+
+import asyncio
+import hashlib
+import math
+import random
+import time
+
+import numpy as np
+
+
+class FakeEmbedder:
+    def __init__(self, dim: int = 768, request_latency: float = 0.0, item_latency: float = 0.0):
+        self.dim = dim
+        self.request_latency = request_latency
+        self.item_latency = item_latency
+        self.calls = 0
+        self.items = 0
+
+    def vector(self, text: str) -> list[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+        rng = random.Random(seed)
+        vec = [rng.gauss(0.0, 1.0) for _ in range(self.dim)]
+        norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+        return [v / norm for v in vec]
+
+    def __call__(self, chunks: list[str], model=None, task_type="RETRIEVAL_DOCUMENT") -> list[list[float]]:
+        self.calls += 1
+        self.items += len(chunks)
+        delay = self.request_latency + self.item_latency * len(chunks)
+        if delay:
+            time.sleep(delay)
+        return [self.vector(c) for c in chunks]
+
+    async def acall(self, chunks: list[str], model=None, task_type="RETRIEVAL_DOCUMENT") -> list[list[float]]:
+        """Async variant (same signature as aembed_text); sleeps without blocking the loop."""
+        self.calls += 1
+        self.items += len(chunks)
+        delay = self.request_latency + self.item_latency * len(chunks)
+        if delay:
+            await asyncio.sleep(delay)
+        return [self.vector(c) for c in chunks]
+
+
+def clustered_vectors(n: int, dim: int = 768, seed: int = 0) -> np.ndarray:
+    """`n` float32 vectors in clusters of ~200, with a decaying variance spectrum in a random basis."""
+    rng = np.random.default_rng(seed)
+    spectrum = (1.0 + np.arange(dim)) ** -0.75
+    basis, _ = np.linalg.qr(rng.normal(size=(dim, dim)))
+    centers = rng.normal(size=(max(1, n // 200), dim)) * spectrum
+    points = centers[rng.integers(0, len(centers), size=n)] + 0.5 * rng.normal(size=(n, dim)) * spectrum
+    return (points @ basis).astype(np.float32)
@@ -0,0 +1,107 @@
+"""
+utils/gemini_chat.py
+
+Async Gemini chat client (REST generateContent) for the prompt generator.
+
+All calls go through one shared, pooled httpx.AsyncClient per process, so
+they never block the event loop and reuse keep-alive connections.
+astream_chat uses streamGenerateContent with server-sent events and yields
+text as soon as the model produces it.
+"""
+
+import json
+import os
+from typing import AsyncIterator, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+load_dotenv(os.path.join(root_dir, '.env'))
+
+API_KEY              = os.getenv("GEMINI_API_KEY")
+CHAT_MODEL           = os.getenv("GEMINI_CHAT_MODEL", "gemini-2.5-flash")
+GEMINI_API_BASE      = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta")
+CHAT_TIMEOUT         = float(os.getenv("CHAT_TIMEOUT", "60"))   # per read: between streamed chunks
+CHAT_MAX_CONNECTIONS = int(os.getenv("CHAT_MAX_CONNECTIONS", "32"))
+
+
+class ChatError(Exception):
+    """Non-2xx answer from the Gemini API."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(f"{status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_chat_client() -> httpx.AsyncClient:
+    """Shared pooled HTTP client for chat calls (one per process)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=GEMINI_API_BASE,
+            timeout=httpx.Timeout(CHAT_TIMEOUT, connect=min(CHAT_TIMEOUT, 5.0)),
+            limits=httpx.Limits(max_connections=CHAT_MAX_CONNECTIONS,
+                                max_keepalive_connections=CHAT_MAX_CONNECTIONS),
+        )
+    return _client
+
+
+async def close_chat_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _request(system: str, user: str, temperature: float) -> dict:
+    return {
+        "systemInstruction": {"parts": [{"text": system}]},
+        "contents": [{"role": "user", "parts": [{"text": user}]}],
+        "generationConfig": {"temperature": temperature, "candidateCount": 1},
+    }
+
+
+def _text(response: dict) -> str:
+    """Text of the first candidate of a (possibly partial) generateContent response."""
+    candidates = response.get("candidates") or [{}]
+    parts = (candidates[0].get("content") or {}).get("parts") or []
+    return "".join(p.get("text", "") for p in parts)
+
+
+def _path(model: str, method: str) -> str:
+    model_name = model if model.startswith("models/") else f"models/{model}"
+    return f"/{model_name}:{method}"
+
+
+async def achat(system: str, user: str, temperature: float, model: str = CHAT_MODEL) -> str:
+    """Full answer of one chat turn."""
+    if not API_KEY:
+        raise ValueError("Gemini API key is not configured. Please set GEMINI_API_KEY in your .env file.")
+    resp = await get_chat_client().post(_path(model, "generateContent"), params={"key": API_KEY},
+                                        json=_request(system, user, temperature))
+    if resp.is_error:
+        raise ChatError(resp.status_code, resp.text)
+    return _text(resp.json()).strip()
+
+
+async def astream_chat(system: str, user: str, temperature: float,
+                       model: str = CHAT_MODEL) -> AsyncIterator[str]:
+    """Yield the answer of one chat turn piece by piece, as it is generated."""
+    if not API_KEY:
+        raise ValueError("Gemini API key is not configured. Please set GEMINI_API_KEY in your .env file.")
+    async with get_chat_client().stream("POST", _path(model, "streamGenerateContent"),
+                                        params={"key": API_KEY, "alt": "sse"},
+                                        json=_request(system, user, temperature)) as resp:
+        if resp.is_error:
+            await resp.aread()
+            raise ChatError(resp.status_code, resp.text)
+        async for line in resp.aiter_lines():
+            if line.startswith("data:"):
+                text = _text(json.loads(line[5:]))
+                if text:
+                    yield text
@@ -1,8 +1,14 @@
 
+import asyncio
 import os
+from typing import Optional
+
 import google.generativeai as genai
+import httpx
 from dotenv import load_dotenv
 
+from .embed_cache import get_embed_cache
+
 root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 env_path = os.path.join(root_dir, '.env')
 load_dotenv(env_path)
@@ -10,6 +16,12 @@ load_dotenv(env_path)
 API_KEY = os.getenv("GEMINI_API_KEY")
 EMBED_MODEL = os.getenv("GEMINI_EMBED_MODEL", "text-embedding-004")
 
+# Async REST client (used by the async retriever path)
+GEMINI_API_BASE       = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta")
+EMBED_TIMEOUT         = float(os.getenv("EMBED_TIMEOUT", "10"))
+EMBED_MAX_CONNECTIONS = int(os.getenv("EMBED_MAX_CONNECTIONS", "64"))
+BATCH_EMBED_MAX_TEXTS = 100   # batchEmbedContents limit per request
+
 # In thông tin debug để kiểm tra
 print(f"DEBUG: .env path = {env_path}")
 if API_KEY:
@@ -24,11 +36,8 @@ if API_KEY:
 else:
     print("⚠️ WARNING: GEMINI_API_KEY is not set. The embedding function will fail.")
 
-def embed_text(chunks: list[str], model=EMBED_MODEL, task_type="RETRIEVAL_DOCUMENT") -> list[list[float]]:
-    """
-    Embeds a batch of text chunks using the Gemini API.
-    This function will raise an exception if the API call fails.
-    """
+def _embed_remote(chunks: list[str], model: str, task_type: str) -> list[list[float]]:
+    """Call the Gemini API for `chunks` (no caching)."""
     if not API_KEY:
         raise ValueError("Gemini API key is not configured. Please set GEMINI_API_KEY in your .env file.")
 
@@ -48,3 +57,114 @@ def embed_text(chunks: list[str], model=EMBED_MODEL, task_type="RETRIEVAL_DOCUME
         raise
 
 
+def _split_cached(cache, chunks: list[str], model: str, task_type: str):
+    """
+    Look `chunks` up in the cache. Returns (vectors, missing) where `vectors`
+    has None for misses and `missing` maps each distinct missing text to its
+    positions in `chunks`.
+    """
+    vectors = cache.get_many(model, task_type, chunks)
+    missing: dict[str, list[int]] = {}
+    for i, (chunk, vec) in enumerate(zip(chunks, vectors)):
+        if vec is None:
+            missing.setdefault(chunk, []).append(i)
+    return vectors, missing
+
+
+def _fill_missing(cache, vectors, missing, fresh, model: str, task_type: str) -> list[list[float]]:
+    texts = list(missing)
+    cache.put_many(model, task_type, texts, fresh)
+    for text, vec in zip(texts, fresh):
+        for i in missing[text]:
+            vectors[i] = vec
+    return vectors
+
+
+def embed_text(chunks: list[str], model=EMBED_MODEL, task_type="RETRIEVAL_DOCUMENT", use_cache: bool = True) -> list[list[float]]:
+    """
+    Embeds a batch of text chunks using the Gemini API.
+
+    Vectors are looked up in the content-addressed embedding cache first
+    (see utils/embed_cache.py); only the misses are sent to the API, and
+    duplicate texts within one call are embedded once.
+    This function will raise an exception if the API call fails.
+    """
+    cache = get_embed_cache() if use_cache else None
+    if cache is None:
+        return _embed_remote(chunks, model, task_type)
+
+    vectors, missing = _split_cached(cache, chunks, model, task_type)
+    if not missing:
+        return vectors
+    fresh = _embed_remote(list(missing), model, task_type)
+    return _fill_missing(cache, vectors, missing, fresh, model, task_type)
+
+
+# -- async path ---------------------------------------------------------------
+_async_client: Optional[httpx.AsyncClient] = None
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Shared pooled HTTP client for the Gemini REST API (one per process)."""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            base_url=GEMINI_API_BASE,
+            timeout=httpx.Timeout(EMBED_TIMEOUT, connect=min(EMBED_TIMEOUT, 5.0)),
+            limits=httpx.Limits(max_connections=EMBED_MAX_CONNECTIONS,
+                                max_keepalive_connections=EMBED_MAX_CONNECTIONS),
+        )
+    return _async_client
+
+
+async def close_async_client() -> None:
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+async def _abatch_embed(chunks: list[str], model_name: str, task_type: str) -> list[list[float]]:
+    payload = {
+        "requests": [
+            {"model": model_name, "content": {"parts": [{"text": c}]}, "taskType": task_type}
+            for c in chunks
+        ]
+    }
+    resp = await get_async_client().post(
+        f"/{model_name}:batchEmbedContents", params={"key": API_KEY}, json=payload
+    )
+    resp.raise_for_status()
+    return [e["values"] for e in resp.json()["embeddings"]]
+
+
+async def _aembed_remote(chunks: list[str], model: str, task_type: str) -> list[list[float]]:
+    """Async batchEmbedContents calls for `chunks` (no caching), BATCH_EMBED_MAX_TEXTS per request, concurrently."""
+    if not API_KEY:
+        raise ValueError("Gemini API key is not configured. Please set GEMINI_API_KEY in your .env file.")
+
+    model_name = model if model.startswith("models/") else f"models/{model}"
+    parts = await asyncio.gather(*(
+        _abatch_embed(chunks[start:start + BATCH_EMBED_MAX_TEXTS], model_name, task_type)
+        for start in range(0, len(chunks), BATCH_EMBED_MAX_TEXTS)
+    ))
+    return [vec for part in parts for vec in part]
+
+
+async def aembed_text(chunks: list[str], model=EMBED_MODEL, task_type="RETRIEVAL_DOCUMENT", use_cache: bool = True) -> list[list[float]]:
+    """
+    Async counterpart of embed_text: same cache semantics, but misses are sent
+    through the shared pooled httpx client so the event loop is never blocked
+    on the network.
+    """
+    cache = get_embed_cache() if use_cache else None
+    if cache is None:
+        return await _aembed_remote(chunks, model, task_type)
+
+    # the SQLite lookup takes the cache lock: never wait for it on the event loop
+    vectors, missing = await asyncio.to_thread(_split_cached, cache, chunks, model, task_type)
+    if not missing:
+        return vectors
+    fresh = await _aembed_remote(list(missing), model, task_type)
+    await asyncio.to_thread(_fill_missing, cache, vectors, missing, fresh, model, task_type)
+    return vectors
@@ -0,0 +1,65 @@
+"""
+utils/index_generation.py
+
+A token that changes whenever new index contents are published.
+
+jd_chunk_embed.py bumps INDEX_GENERATION_FILE after every run that changed
+the indexes (Milvus has no generation of its own); the local vector index
+and the BM25 index publish a new CURRENT on every rebuild. The retriever
+watches all of them, reloads its in-process indexes when the token moves,
+and keys its result cache on it, so stale results are never served.
+"""
+
+import os
+import threading
+import time
+from typing import Optional
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+INDEX_GENERATION_FILE = os.getenv("INDEX_GENERATION_FILE", os.path.join(root_dir, ".cache", "index_generation"))
+
+
+def read_marker(path: str) -> Optional[str]:
+    """Content of a small marker file (generation token, CURRENT pointer), or None if missing."""
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def bump_generation(path: str = INDEX_GENERATION_FILE) -> str:
+    """Atomically replace the generation token; returns the new one."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    token = str(time.time_ns())
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(token)
+    os.replace(tmp, path)
+    return token
+
+
+class GenerationWatcher:
+    """
+    Combined token of several marker files, re-read at most every `interval`
+    seconds so a hot path can call current() on every request.
+    """
+
+    def __init__(self, paths: list[str], interval: float = 2.0):
+        self.paths = paths
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._checked = 0.0
+        self._token = self._read()
+
+    def _read(self) -> tuple:
+        return tuple(read_marker(p) for p in self.paths)
+
+    def current(self) -> tuple:
+        with self._lock:
+            now = time.monotonic()
+            if now - self._checked >= self.interval:
+                self._token = self._read()
+                self._checked = now
+            return self._token
@@ -0,0 +1,169 @@
+"""
+utils/jd_metadata.py
+
+JD attributes (family, level, department, location, employment_type, tags)
+denormalized onto every indexed chunk, so retrieval filters run inside the
+index instead of over-fetching top_k and post-filtering:
+
+  - Milvus: scalar fields + a boolean `expr` (milvus_expr)
+  - local vector / BM25 indexes: MetadataColumns, per-row int32 codes for
+    each field plus an inverted tag -> rows list, turned into a row mask
+
+Filters are {field: [allowed values]}: a chunk matches when every given
+field has one of the listed values and, for tags, when it has any of them.
+Values are compared case- and whitespace-insensitively: indexed values and
+filter values both go through normalize_value ("Senior" matches "senior").
+"""
+
+import json
+import os
+import unicodedata
+from typing import Iterable, Optional
+
+import numpy as np
+
+FILTER_FIELDS = ["family", "level", "department", "location", "employment_type"]
+TAGS = "tags"
+
+# Milvus field sizes (see jd_chunk_embed.open_collection)
+MAX_VALUE_LENGTH = 256
+MAX_TAGS = 64
+
+Filters = dict[str, tuple[str, ...]]
+
+
+def normalize_value(value) -> str:
+    """Form a metadata value is indexed and filtered in (NFKC, casefolded, single spaces)."""
+    return " ".join(unicodedata.normalize("NFKC", str(value)).casefold().split())
+
+
+def normalize_filters(filters: Optional[dict]) -> Filters:
+    """Drop empty entries, accept a single value or a list, reject unknown fields."""
+    out: Filters = {}
+    for field, values in (filters or {}).items():
+        if field not in FILTER_FIELDS and field != TAGS:
+            raise ValueError(f"Unknown filter field {field!r}")
+        if values is None:
+            continue
+        if isinstance(values, str):
+            values = [values]
+        values = tuple(sorted({normalize_value(v) for v in values}))
+        if values:
+            out[field] = values
+    return out
+
+
+def filters_key(filters: Optional[dict]) -> tuple:
+    """Hashable form of `filters` (cache / coalescing keys)."""
+    return tuple(sorted(normalize_filters(filters).items()))
+
+
+def milvus_expr(filters: Optional[dict]) -> str:
+    """Milvus boolean expression for `filters` ("" when unfiltered)."""
+    parts = []
+    for field, values in normalize_filters(filters).items():
+        if field == TAGS:
+            parts.append(f"array_contains_any({TAGS}, {json.dumps(list(values))})")
+        else:
+            parts.append(f"{field} in {json.dumps(list(values))}")
+    return " and ".join(parts)
+
+
+def empty_meta() -> dict:
+    return {**{f: None for f in FILTER_FIELDS}, TAGS: []}
+
+
+def normalize_meta(meta: dict) -> dict:
+    """`meta` with its field values and tags in normalize_value form."""
+    out = {f: normalize_value(meta[f]) if meta.get(f) is not None else None for f in FILTER_FIELDS}
+    out[TAGS] = list(dict.fromkeys(normalize_value(t) for t in meta.get(TAGS) or []))
+    return out
+
+
+class MetadataColumns:
+    """Column store of chunk metadata for the local indexes."""
+
+    def __init__(self, count: int, codes: dict[str, np.ndarray], vocab: dict[str, list[str]],
+                 tag_vocab: list[str], tag_offsets: np.ndarray, tag_rows: np.ndarray):
+        self.count = count
+        self.codes = codes
+        self.vocab = vocab
+        self.tag_vocab = tag_vocab
+        self.tag_offsets = tag_offsets
+        self.tag_rows = tag_rows
+        self._value_ids = {f: {v: i for i, v in enumerate(vocab[f])} for f in FILTER_FIELDS}
+        self._tag_ids = {t: i for i, t in enumerate(tag_vocab)}
+
+    @classmethod
+    def build(cls, metas: Iterable[dict]) -> "MetadataColumns":
+        """From one metadata dict per row (missing fields = None / no tags)."""
+        metas = [normalize_meta(m) for m in metas]
+        vocab, codes = {}, {}
+        for field in FILTER_FIELDS:
+            values = sorted({m.get(field) for m in metas if m.get(field) is not None})
+            ids = {v: i for i, v in enumerate(values)}
+            vocab[field] = values
+            codes[field] = np.fromiter((ids.get(m.get(field), -1) for m in metas), dtype=np.int32, count=len(metas))
+        tag_vocab = sorted({t for m in metas for t in m.get(TAGS) or []})
+        tag_ids = {t: i for i, t in enumerate(tag_vocab)}
+        pairs = np.array([(tag_ids[t], row) for row, m in enumerate(metas) for t in set(m.get(TAGS) or [])],
+                         dtype=np.int64).reshape(-1, 2)
+        order = np.lexsort((pairs[:, 1], pairs[:, 0]))
+        tag_offsets = np.zeros(len(tag_vocab) + 1, dtype=np.int64)
+        tag_offsets[1:] = np.cumsum(np.bincount(pairs[:, 0], minlength=len(tag_vocab)))
+        return cls(len(metas), codes, vocab, tag_vocab, tag_offsets, pairs[order, 1].astype(np.int32))
+
+    def save(self, path: str) -> None:
+        for field in FILTER_FIELDS:
+            np.save(os.path.join(path, f"meta_{field}.npy"), self.codes[field])
+        np.save(os.path.join(path, "tag_offsets.npy"), self.tag_offsets)
+        np.save(os.path.join(path, "tag_rows.npy"), self.tag_rows)
+        with open(os.path.join(path, "metadata.json"), "w") as f:
+            json.dump({"count": self.count, "vocab": self.vocab, "tags": self.tag_vocab}, f)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["MetadataColumns"]:
+        """None for generations written before metadata was indexed."""
+        try:
+            with open(os.path.join(path, "metadata.json")) as f:
+                info = json.load(f)
+        except FileNotFoundError:
+            return None
+        codes = {field: np.load(os.path.join(path, f"meta_{field}.npy")) for field in FILTER_FIELDS}
+        return cls(info["count"], codes, info["vocab"], info["tags"],
+                   np.load(os.path.join(path, "tag_offsets.npy")), np.load(os.path.join(path, "tag_rows.npy")))
+
+    def rows_meta(self, rows: Iterable[int]) -> list[dict]:
+        """Metadata dicts of `rows` (to carry rows over into a new generation)."""
+        rows = list(rows)
+        tags_of: dict[int, list[str]] = {}
+        for t, tag in enumerate(self.tag_vocab):
+            for r in self.tag_rows[self.tag_offsets[t]:self.tag_offsets[t + 1]]:
+                tags_of.setdefault(int(r), []).append(tag)
+        out = []
+        for r in rows:
+            meta = {TAGS: tags_of.get(int(r), [])}
+            for field in FILTER_FIELDS:
+                code = int(self.codes[field][r])
+                meta[field] = self.vocab[field][code] if code >= 0 else None
+            out.append(meta)
+        return out
+
+    def mask(self, filters: Optional[dict]) -> Optional[np.ndarray]:
+        """Boolean row mask for `filters`, or None when nothing is filtered."""
+        filters = normalize_filters(filters)
+        if not filters:
+            return None
+        mask = np.ones(self.count, dtype=bool)
+        for field, values in filters.items():
+            if field == TAGS:
+                tagged = np.zeros(self.count, dtype=bool)
+                for tag in values:
+                    t = self._tag_ids.get(tag)
+                    if t is not None:
+                        tagged[self.tag_rows[self.tag_offsets[t]:self.tag_offsets[t + 1]]] = True
+                mask &= tagged
+            else:
+                ids = [self._value_ids[field][v] for v in values if v in self._value_ids[field]]
+                mask &= np.isin(self.codes[field], ids)
+        return mask
@@ -0,0 +1,248 @@
+"""
+utils/lexical_index.py
+
+BM25 index over the JD chunks produced by jd_chunk_embed.py, for exact-term
+queries (job codes like "DATA-JU-014", tool names) that cosine search misses,
+answered without any embedding call.
+
+Postings are stored CSR-style in flat NumPy arrays (no per-term Python
+objects): term t owns rows[offsets[t]:offsets[t + 1]] / tfs[...]. Each chunk
+is indexed together with its JD's job_code and title so codes and titles
+match every chunk of that JD.
+
+On-disk layout (LEXICAL_INDEX_DIR, same generation scheme as the local
+vector index):
+
+    CURRENT
+    gen-<timestamp>/
+      meta.json             count, terms, avgdl, k1, b
+      terms.json            list[str], position = term id
+      offsets.npy           int64 (terms + 1)
+      rows.npy              int32 chunk row per posting
+      tfs.npy               uint16 term frequency per posting
+      doc_len.npy           int32 tokens per chunk
+      jd_ids.npy, chunk_index.npy, chunk_ids.json, object_urls.json
+      metadata.json, meta_<field>.npy, tag_*.npy   JD metadata (filters)
+"""
+
+import json
+import os
+import re
+import time
+from array import array
+from collections import Counter
+from typing import Iterable, Optional
+
+import numpy as np
+
+from .jd_metadata import MetadataColumns, empty_meta, filters_key, normalize_filters
+from .vector_index import MASK_CACHE_SIZE, current_generation, new_generation, publish_generation, top_k_rows
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LEXICAL_INDEX_DIR = os.getenv("LEXICAL_INDEX_DIR", os.path.join(root_dir, ".cache", "lexical_index"))
+BM25_K1           = float(os.getenv("BM25_K1", "1.2"))
+BM25_B            = float(os.getenv("BM25_B", "0.75"))
+RRF_K             = int(os.getenv("RRF_K", "60"))
+
+# Keeps compound tokens such as "data-ju-014", "node.js", "c++", "c#" intact
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#]*(?:[-_./][a-z0-9+#]+)*")
+SPLIT_RE = re.compile(r"[-_./]")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercased tokens; compound tokens are also indexed by their parts."""
+    out = []
+    for tok in TOKEN_RE.findall(text.lower()):
+        out.append(tok)
+        if SPLIT_RE.search(tok):
+            out.extend(p for p in SPLIT_RE.split(tok) if p)
+    return out
+
+
+def rrf_fuse(result_lists: list[list[dict]], top_k: int, k: int = RRF_K) -> list[dict]:
+    """
+    Reciprocal-rank fusion of ranked hit lists (keyed by chunk_id):
+    score = sum over lists of 1 / (k + rank).
+    """
+    fused: dict[str, dict] = {}
+    for hits in result_lists:
+        for rank, hit in enumerate(hits, start=1):
+            entry = fused.get(hit["chunk_id"])
+            if entry is None:
+                entry = fused[hit["chunk_id"]] = dict(hit, score=0.0)
+            entry["score"] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda h: -h["score"])[:top_k]
+
+
+class BM25Index:
+    backend = "bm25"
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        with open(os.path.join(path, "terms.json")) as f:
+            self.term_ids = {t: i for i, t in enumerate(json.load(f))}
+        self.offsets = np.load(os.path.join(path, "offsets.npy"))
+        self.rows = np.load(os.path.join(path, "rows.npy"), mmap_mode="r")
+        self.tfs = np.load(os.path.join(path, "tfs.npy"), mmap_mode="r")
+        self.jd_ids = np.load(os.path.join(path, "jd_ids.npy"))
+        self.chunk_index = np.load(os.path.join(path, "chunk_index.npy"))
+        with open(os.path.join(path, "chunk_ids.json")) as f:
+            self.chunk_ids = json.load(f)
+        with open(os.path.join(path, "object_urls.json")) as f:
+            self.object_urls = json.load(f)
+
+        k1, b, avgdl = self.meta["k1"], self.meta["b"], self.meta["avgdl"] or 1.0
+        n = self.meta["count"]
+        df = np.diff(self.offsets).astype(np.float64)
+        self.idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        doc_len = np.load(os.path.join(path, "doc_len.npy"))
+        # Per-chunk length normalization, precomputed once
+        self.norm = (k1 * (1.0 - b + b * doc_len / avgdl)).astype(np.float32)
+        self.k1 = k1
+        self.metadata = MetadataColumns.load(path)
+        self._masks: dict[tuple, np.ndarray] = {}
+
+    # -- loading / writing ---------------------------------------------------
+    @staticmethod
+    def current_path(root: str = LEXICAL_INDEX_DIR) -> Optional[str]:
+        return current_generation(root)
+
+    @classmethod
+    def open(cls, root: str = LEXICAL_INDEX_DIR) -> "BM25Index":
+        path = current_generation(root)
+        if path is None:
+            raise FileNotFoundError(f"No lexical index published under {root}")
+        return cls(path)
+
+    @staticmethod
+    def write(root: str, docs: Iterable[tuple],
+              k1: float = BM25_K1, b: float = BM25_B) -> str:
+        """
+        Build and publish a new generation from
+        (chunk_id, jd_id, chunk_index, object_url, text[, meta]) tuples,
+        `meta` being the JD metadata dict used by filters.
+        """
+        terms: dict[str, int] = {}
+        post_terms, post_rows, post_tfs = array("i"), array("i"), array("i")
+        doc_len = array("i")
+        chunk_ids, jd_ids, chunk_indexes, object_urls = [], array("q"), array("q"), []
+        metas = []
+        for row, (chunk_id, jd_id, chunk_index, object_url, text, *meta) in enumerate(docs):
+            tokens = tokenize(text)
+            for term, tf in Counter(tokens).items():
+                post_terms.append(terms.setdefault(term, len(terms)))
+                post_rows.append(row)
+                post_tfs.append(min(tf, 65535))
+            doc_len.append(len(tokens))
+            chunk_ids.append(chunk_id)
+            jd_ids.append(jd_id)
+            chunk_indexes.append(chunk_index)
+            object_urls.append(object_url)
+            metas.append(meta[0] if meta else empty_meta())
+
+        t = np.frombuffer(post_terms, dtype=np.int32)
+        order = np.lexsort((np.frombuffer(post_rows, dtype=np.int32), t))
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(t, minlength=len(terms)))
+        lengths = np.frombuffer(doc_len, dtype=np.int32)
+
+        name, path = new_generation(root)
+        np.save(os.path.join(path, "offsets.npy"), offsets)
+        np.save(os.path.join(path, "rows.npy"), np.frombuffer(post_rows, dtype=np.int32)[order])
+        np.save(os.path.join(path, "tfs.npy"), np.frombuffer(post_tfs, dtype=np.int32)[order].astype(np.uint16))
+        np.save(os.path.join(path, "doc_len.npy"), lengths)
+        np.save(os.path.join(path, "jd_ids.npy"), np.frombuffer(jd_ids, dtype=np.int64))
+        np.save(os.path.join(path, "chunk_index.npy"), np.frombuffer(chunk_indexes, dtype=np.int64))
+        with open(os.path.join(path, "terms.json"), "w") as f:
+            json.dump(sorted(terms, key=terms.get), f)
+        with open(os.path.join(path, "chunk_ids.json"), "w") as f:
+            json.dump(chunk_ids, f)
+        with open(os.path.join(path, "object_urls.json"), "w") as f:
+            json.dump(object_urls, f)
+        MetadataColumns.build(metas).save(path)
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({
+                "count": len(chunk_ids), "terms": len(terms), "postings": len(t),
+                "avgdl": float(lengths.mean()) if len(lengths) else 0.0,
+                "k1": k1, "b": b, "created_at": time.time(),
+            }, f)
+        publish_generation(root, name)
+        return path
+
+    # -- search --------------------------------------------------------------
+    def score(self, query: str) -> tuple[np.ndarray, np.ndarray]:
+        """(rows, scores) of every chunk matching at least one query term."""
+        tids = sorted({self.term_ids[t] for t in tokenize(query) if t in self.term_ids})
+        if not tids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        rows, contribs = [], []
+        for t in tids:
+            start, stop = self.offsets[t], self.offsets[t + 1]
+            r = np.asarray(self.rows[start:stop])
+            tf = np.asarray(self.tfs[start:stop], dtype=np.float32)
+            rows.append(r)
+            contribs.append(self.idf[t] * tf * (self.k1 + 1.0) / (tf + self.norm[r]))
+        rows = np.concatenate(rows)
+        uniq, inverse = np.unique(rows, return_inverse=True)
+        return uniq, np.bincount(inverse, weights=np.concatenate(contribs)).astype(np.float32)
+
+    def filter_mask(self, filters: Optional[dict]) -> Optional[np.ndarray]:
+        """Row mask for `filters` (cached per distinct filter), None when unfiltered."""
+        if not normalize_filters(filters):
+            return None
+        if self.metadata is None:
+            raise ValueError("This lexical index was built without JD metadata; rebuild it to filter")
+        key = filters_key(filters)
+        mask = self._masks.get(key)
+        if mask is None:
+            if len(self._masks) >= MASK_CACHE_SIZE:
+                self._masks.clear()
+            mask = self._masks[key] = self.metadata.mask(filters)
+        return mask
+
+    def search(self, queries: list[str], top_k: int, filters: Optional[dict] = None) -> list[list[dict]]:
+        mask = self.filter_mask(filters)
+        out = []
+        for query in queries:
+            rows, scores = self.score(query)
+            if mask is not None:
+                keep = mask[rows]
+                rows, scores = rows[keep], scores[keep]
+            if not len(rows):
+                out.append([])
+                continue
+            best, best_scores = top_k_rows(scores[None, :], top_k)
+            out.append([
+                {
+                    "chunk_id": self.chunk_ids[r],
+                    "jd_id": int(self.jd_ids[r]),
+                    "chunk_index": int(self.chunk_index[r]),
+                    "object_url": self.object_urls[r],
+                    "score": float(s),
+                }
+                for r, s in zip(rows[best[0]], best_scores[0])
+            ])
+        return out
+
+    def count(self) -> int:
+        return len(self.chunk_ids)
+
+    def health(self) -> dict:
+        return {
+            "index_path": self.path,
+            "total_chunks": self.count(),
+            "terms": self.meta["terms"],
+            "postings": self.meta["postings"],
+            "metadata": self.metadata is not None,
+        }
+
+
+def open_lexical_index(root: str = LEXICAL_INDEX_DIR) -> Optional[BM25Index]:
+    """The live lexical index, or None if none was built yet."""
+    try:
+        return BM25Index.open(root)
+    except FileNotFoundError:
+        return None
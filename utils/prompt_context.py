@@ -0,0 +1,59 @@
+"""
+utils/prompt_context.py
+
+Packing retrieved chunks into an LLM prompt: near-duplicate chunks (the same
+boilerplate copied across JDs) are dropped, then chunks are kept in rank
+order while they fit a token budget.
+
+Two chunks are near-duplicates when most word shingles of the shorter one
+also occur in the other (containment), which also catches a chunk that is a
+trimmed copy of another.
+"""
+
+import re
+from typing import Callable
+
+WORD_RE = re.compile(r"\w+")
+SHINGLE_SIZE = 3
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set:
+    words = WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def containment(a: set, b: set) -> float:
+    """Share of the smaller shingle set found in the other."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+def dedupe_near_duplicates(texts: list[str], threshold: float = 0.8) -> list[str]:
+    """`texts` without the ones that near-duplicate an earlier (better ranked) text."""
+    kept, kept_shingles = [], []
+    for text in texts:
+        s = shingles(text)
+        if not s or any(containment(s, k) >= threshold for k in kept_shingles):
+            continue
+        kept.append(text)
+        kept_shingles.append(s)
+    return kept
+
+
+def fit_token_budget(texts: list[str], max_tokens: int, count_tokens: Callable[[str], int]) -> list[str]:
+    """Texts in order while their total fits `max_tokens`; ones that would overflow are skipped."""
+    out, used = [], 0
+    for text in texts:
+        cost = count_tokens(text) + 2   # "- " bullet and newline in the template
+        if used + cost <= max_tokens:
+            out.append(text)
+            used += cost
+    return out
+
+
+def pack_context(texts: list[str], max_tokens: int, count_tokens: Callable[[str], int],
+                 threshold: float = 0.8) -> list[str]:
+    return fit_token_budget(dedupe_near_duplicates(texts, threshold), max_tokens, count_tokens)
@@ -0,0 +1,208 @@
+"""
+utils/quantization.py
+
+Compact vector codes for the local vector index (LOCAL_INDEX_QUANTIZATION):
+
+  - "int8":   per-dimension symmetric scalar quantization, 1 byte per
+              dimension (4x smaller than float32)
+  - "binary": sign bits, dim / 8 bytes (32x smaller), scored by Hamming
+              similarity
+  - "pq":     product quantization, one byte per subspace (PQ_M subspaces,
+              256 centroids each), scored asymmetrically: the float query
+              against per-subspace lookup tables
+
+Codes live in RAM and are scanned to pick candidates; the float32 vectors
+stay on disk (memory-mapped) and are only read for the few candidates that
+get rescored exactly (see LocalVectorIndex).
+
+Every codec's scores estimate the cosine similarity of L2-normalized vectors.
+"""
+
+import os
+from typing import Optional
+
+import numpy as np
+
+QUANTIZATIONS = ("none", "int8", "binary", "pq")
+SCORE_BLOCK_ROWS = 2048    # rows decoded at a time when scoring (stays in cache)
+PQ_TRAIN_SIZE    = 16384   # rows sampled to train PQ centroids
+PQ_ITERATIONS    = 12
+
+
+class Codec:
+    name = "none"
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def scores(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """(queries x codes) estimated cosine similarity."""
+        raise NotImplementedError
+
+    def bytes_per_vector(self, dim: int) -> int:
+        raise NotImplementedError
+
+    def params(self) -> dict:
+        return {}
+
+
+class Int8Codec(Codec):
+    name = "int8"
+
+    def __init__(self, scale: np.ndarray):
+        self.scale = scale.astype(np.float32)
+
+    @classmethod
+    def train(cls, vectors: np.ndarray) -> "Int8Codec":
+        scale = np.abs(vectors).max(axis=0) / 127.0 if len(vectors) else np.ones(vectors.shape[1])
+        return cls(np.maximum(scale, 1e-12))
+
+    def encode(self, vectors):
+        return np.clip(np.rint(vectors / self.scale), -127, 127).astype(np.int8)
+
+    def scores(self, queries, codes):
+        # q . (codes * scale) == (q * scale) . codes
+        scaled = (queries * self.scale).astype(np.float32)
+        out = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+            block = codes[start:start + SCORE_BLOCK_ROWS].astype(np.float32)
+            out[:, start:start + len(block)] = scaled @ block.T
+        return out
+
+    def bytes_per_vector(self, dim):
+        return dim
+
+    def params(self):
+        return {"scale": self.scale}
+
+
+if hasattr(np, "bitwise_count"):
+    def popcount(x: np.ndarray) -> np.ndarray:
+        return np.bitwise_count(x)
+else:
+    _POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def popcount(x: np.ndarray) -> np.ndarray:
+        return _POPCOUNT[x]
+
+
+class BinaryCodec(Codec):
+    name = "binary"
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def encode(self, vectors):
+        return np.packbits(vectors > 0, axis=1)
+
+    def scores(self, queries, codes):
+        q_codes = self.encode(queries)
+        out = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for i, q in enumerate(q_codes):
+            hamming = popcount(np.bitwise_xor(codes, q)).sum(axis=1, dtype=np.int32)
+            # 1 - 2 * (fraction of differing signs), in [-1, 1]
+            out[i] = 1.0 - 2.0 * hamming / self.dim
+        return out
+
+    def bytes_per_vector(self, dim):
+        return (dim + 7) // 8
+
+    def params(self):
+        return {"dim": np.array(self.dim)}
+
+
+def _kmeans(x: np.ndarray, k: int, iterations: int, rng) -> np.ndarray:
+    """Euclidean k-means centroids of the rows of `x`."""
+    centroids = x[rng.choice(len(x), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = _nearest(x, centroids)
+        counts = np.bincount(assign, minlength=k)
+        sums = np.stack([np.bincount(assign, weights=x[:, d], minlength=k) for d in range(x.shape[1])], axis=1)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        centroids[empty] = x[rng.choice(len(x), size=int(empty.sum()))]
+    return centroids
+
+
+def _nearest(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    # argmin ||x - c||^2 == argmin (||c||^2 - 2 x.c)
+    return np.argmin((centroids * centroids).sum(axis=1) - 2.0 * x @ centroids.T, axis=1)
+
+
+class PQCodec(Codec):
+    name = "pq"
+
+    def __init__(self, centroids: np.ndarray):
+        self.centroids = centroids.astype(np.float32)  # (m, ks, dim / m)
+        self.m, self.ks, self.dsub = centroids.shape
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, m: int = 0, seed: int = 0) -> "PQCodec":
+        dim = vectors.shape[1]
+        m = m or max(1, dim // 8)
+        while dim % m:
+            m -= 1  # subspaces must split the dimension evenly
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(len(vectors), size=min(len(vectors), PQ_TRAIN_SIZE), replace=False)]
+        ks = min(256, len(sample))
+        dsub = dim // m
+        centroids = np.stack([
+            _kmeans(np.ascontiguousarray(sample[:, j * dsub:(j + 1) * dsub]), ks, PQ_ITERATIONS, rng)
+            for j in range(m)
+        ])
+        return cls(centroids)
+
+    def encode(self, vectors):
+        # Column-major: scoring reads one subspace column at a time
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8, order="F")
+        for start in range(0, len(vectors), SCORE_BLOCK_ROWS):
+            block = vectors[start:start + SCORE_BLOCK_ROWS]
+            for j in range(self.m):
+                codes[start:start + len(block), j] = _nearest(block[:, j * self.dsub:(j + 1) * self.dsub],
+                                                              self.centroids[j])
+        return codes
+
+    def scores(self, queries, codes):
+        # Lookup tables: tables[q, j, c] = q_j . centroid_{j,c}
+        tables = np.einsum("qjd,jcd->qjc", queries.reshape(len(queries), self.m, self.dsub), self.centroids)
+        out = np.zeros((len(queries), len(codes)), dtype=np.float32)
+        for i, table in enumerate(tables):
+            for j in range(self.m):
+                out[i] += table[j][codes[:, j]]
+        return out
+
+    def bytes_per_vector(self, dim):
+        return self.m
+
+    def params(self):
+        return {"centroids": self.centroids}
+
+
+def train_codec(name: str, vectors: np.ndarray, pq_m: int = 0) -> Optional[Codec]:
+    """Fit the codec `name` on (normalized) `vectors`; None for "none"."""
+    if name not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization {name!r} (expected one of {QUANTIZATIONS})")
+    if name == "int8":
+        return Int8Codec.train(vectors)
+    if name == "binary":
+        return BinaryCodec(vectors.shape[1])
+    if name == "pq":
+        return PQCodec.train(vectors, pq_m)
+    return None
+
+
+def save_codec(path: str, codec: Codec) -> None:
+    np.savez(os.path.join(path, "codec.npz"), **codec.params())
+
+
+def load_codec(path: str, name: str) -> Optional[Codec]:
+    if name == "none":
+        return None
+    params = np.load(os.path.join(path, "codec.npz"))
+    if name == "int8":
+        return Int8Codec(params["scale"])
+    if name == "binary":
+        return BinaryCodec(int(params["dim"]))
+    if name == "pq":
+        return PQCodec(params["centroids"])
+    raise ValueError(f"Unknown quantization {name!r}")
@@ -0,0 +1,111 @@
+"""
+utils/response_cache.py
+
+Cache of LLM answers for the prompt generator, in two tiers:
+
+  - exact:    keyed on sha256 of (model, temperature, system, user prompt);
+              a repeated request never reaches the model
+  - semantic: (optional) each answer also stores an embedding of its
+              prompt; a new prompt whose embedding is at least `threshold`
+              cosine-similar to a stored one in the same bucket reuses that
+              answer. A bucket (semantic_bucket) is the system prompt, model,
+              temperature and the request's normalized title / level /
+              department: prompts that differ in one of those are nearly
+              identical as embeddings but need different answers
+
+Entries expire after `ttl` seconds and the least recently used ones are
+evicted beyond `max_entries` (both tiers share the exact tier's entries).
+"""
+
+import hashlib
+import json
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+import numpy as np
+
+from .lru import TTLCache
+
+
+def response_key(model: str, temperature: float, system: str, user: str) -> str:
+    payload = json.dumps([model, temperature, system, user], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def semantic_bucket(model: str, temperature: float, system: str, *scope: str) -> tuple:
+    """Bucket of the semantic tier; `scope` fields are compared case- and whitespace-insensitively."""
+    return (model, temperature, system,
+            *(" ".join(unicodedata.normalize("NFKC", s).casefold().split()) for s in scope))
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int, ttl: float = 0.0, threshold: float = 0.97):
+        self.exact = TTLCache(max_entries, ttl)
+        self.threshold = threshold
+        # key -> (bucket, unit vector); the answer itself lives in `exact`
+        self._vectors: "OrderedDict[str, tuple[Hashable, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.semantic_hits = 0
+        self.bypassed = 0
+
+    def get(self, key: str) -> Optional[str]:
+        return self.exact.get(key)
+
+    def get_similar(self, bucket: Hashable, vector) -> Optional[str]:
+        """Answer of the most similar stored prompt in `bucket`, if similar enough."""
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        with self._lock:
+            keys = [k for k, (b, _) in self._vectors.items() if b == bucket]
+            if not keys:
+                return None
+            scores = np.stack([self._vectors[k][1] for k in keys]) @ query
+        for i in np.argsort(-scores):
+            if scores[i] < self.threshold:
+                break
+            answer = self.exact.peek(keys[i])
+            if answer is None:   # expired or evicted from the exact tier
+                with self._lock:
+                    self._vectors.pop(keys[i], None)
+                continue
+            with self._lock:
+                self.semantic_hits += 1
+            return answer
+        return None
+
+    def put(self, key: str, answer: str, bucket: Hashable = None, vector=None) -> None:
+        self.exact.put(key, answer)
+        if vector is None or self.exact.max_entries <= 0:
+            return
+        unit = np.asarray(vector, dtype=np.float32)
+        unit = unit / (np.linalg.norm(unit) or 1.0)
+        with self._lock:
+            self._vectors.pop(key, None)
+            self._vectors[key] = (bucket, unit)
+            while len(self._vectors) > self.exact.max_entries:
+                self._vectors.popitem(last=False)
+
+    def bypass(self) -> None:
+        with self._lock:
+            self.bypassed += 1
+
+    def stats(self) -> dict:
+        exact = self.exact.stats()
+        with self._lock:
+            # exact misses that the semantic tier answered are hits overall
+            lookups = exact["hits"] + exact["misses"]
+            hits = exact["hits"] + self.semantic_hits
+            return {
+                "hits_exact": exact["hits"],
+                "hits_semantic": self.semantic_hits,
+                "misses": lookups - hits,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "bypassed": self.bypassed,
+                "entries": exact["entries"],
+                "semantic_entries": len(self._vectors),
+                "max_entries": exact["max_entries"],
+                "ttl_s": exact["ttl_s"],
+                "threshold": self.threshold,
+            }
@@ -0,0 +1,194 @@
+"""
+utils/skill_index.py
+
+In-memory inverted index skill_id -> sorted candidate_id array, for
+skill-based candidate filtering without JOINs over candidate_skills.
+
+Posting lists are sorted uint32 NumPy arrays (4 bytes per entry), so AND /
+OR / NOT queries are vectorized set operations. The index is built from
+candidate_skills and kept current through candidate_skill_changes, a change
+log that profiles_etl.py appends to for every candidate it upserts: refresh()
+reloads only the skills of candidates logged since the last refresh.
+"""
+
+import threading
+import time
+from typing import Iterable, Optional, Union
+
+import numpy as np
+
+Skill = Union[int, str]   # skill_id or (case-insensitive) skill_name
+
+SKILL_INDEX_DDL = """
+CREATE TABLE IF NOT EXISTS candidate_skill_changes (
+  seq          BIGSERIAL PRIMARY KEY,
+  candidate_id INT NOT NULL,
+  changed_at   TIMESTAMP NOT NULL DEFAULT NOW()
+);
+"""
+
+_EMPTY = np.empty(0, dtype=np.uint32)
+
+
+def _group(candidate_ids: np.ndarray, skill_ids: np.ndarray) -> dict[int, np.ndarray]:
+    """(candidate, skill) pairs -> {skill_id: sorted unique candidate ids}."""
+    if not len(candidate_ids):
+        return {}
+    order = np.lexsort((candidate_ids, skill_ids))
+    cands, skills = candidate_ids[order], skill_ids[order]
+    keys, starts = np.unique(skills, return_index=True)
+    bounds = list(starts[1:]) + [len(skills)]
+    return {int(k): np.unique(cands[s:e]) for k, s, e in zip(keys, starts, bounds)}
+
+
+class SkillIndex:
+    def __init__(self):
+        self._postings: dict[int, np.ndarray] = {}
+        self._all = _EMPTY               # every indexed candidate (universe for NOT)
+        self._names: dict[str, int] = {}
+        self._lock = threading.RLock()
+        self.last_seq = 0
+        self.refreshed_at: Optional[float] = None
+        self.updates = 0
+
+    # -- building / updating -------------------------------------------------
+    def set_names(self, names: dict[str, int]) -> None:
+        with self._lock:
+            self._names = {name.lower(): skill_id for name, skill_id in names.items()}
+
+    def build(self, pairs: Iterable[tuple[int, int]], candidate_ids: Optional[Iterable[int]] = None) -> None:
+        """Replace the index with (candidate_id, skill_id) `pairs`."""
+        arr = np.array(list(pairs), dtype=np.uint32).reshape(-1, 2)
+        postings = _group(arr[:, 0], arr[:, 1])
+        universe = np.unique(np.fromiter(candidate_ids, dtype=np.uint32)) if candidate_ids is not None \
+            else np.unique(arr[:, 0])
+        with self._lock:
+            self._postings, self._all = postings, universe
+
+    def apply(self, changes: dict[int, Iterable[int]], removed: Iterable[int] = ()) -> None:
+        """
+        Replace the skill sets of the candidates in `changes`
+        ({candidate_id: skill_ids}) and drop `removed` candidates entirely.
+        Cost is one vectorized pass over the posting lists per call, so
+        batch updates rather than applying them one by one.
+        """
+        touched = np.unique(np.fromiter(list(changes) + list(removed), dtype=np.uint32))
+        if not len(touched):
+            return
+        pairs = [(c, s) for c, skills in changes.items() for s in skills]
+        arr = np.array(pairs, dtype=np.uint32).reshape(-1, 2)
+        added = _group(arr[:, 0], arr[:, 1])
+        present = np.unique(np.fromiter(changes, dtype=np.uint32))
+
+        with self._lock:
+            postings = {}
+            for skill_id, ids in self._postings.items():
+                kept = ids[~np.isin(ids, touched, assume_unique=True)]
+                if skill_id in added:
+                    kept = np.union1d(kept, added.pop(skill_id))
+                if len(kept):
+                    postings[skill_id] = kept
+            postings.update(added)
+            universe = self._all[~np.isin(self._all, touched, assume_unique=True)]
+            self._postings = postings
+            self._all = np.union1d(universe, present).astype(np.uint32)
+            self.updates += len(touched)
+
+    # -- queries ---------------------------------------------------------------
+    def skill_id(self, skill: Skill) -> Optional[int]:
+        if isinstance(skill, str):
+            return self._names.get(skill.strip().lower())
+        return int(skill)
+
+    def candidates_with(self, skill: Skill) -> np.ndarray:
+        skill_id = self.skill_id(skill)
+        return self._postings.get(skill_id, _EMPTY) if skill_id is not None else _EMPTY
+
+    def query(self, all_of: Iterable[Skill] = (), any_of: Iterable[Skill] = (),
+              none_of: Iterable[Skill] = ()) -> np.ndarray:
+        """
+        Sorted candidate ids having every skill in `all_of`, at least one in
+        `any_of` (if given) and none in `none_of`. Unknown skills match nobody.
+        """
+        all_of, any_of, none_of = list(all_of), list(any_of), list(none_of)
+        with self._lock:
+            if all_of:
+                lists = sorted((self.candidates_with(s) for s in all_of), key=len)
+                result = lists[0]
+                for ids in lists[1:]:
+                    if not len(result):
+                        break
+                    result = np.intersect1d(result, ids, assume_unique=True)
+            else:
+                result = self._all
+            if any_of:
+                union = np.unique(np.concatenate([self.candidates_with(s) for s in any_of]))
+                result = union if not all_of else np.intersect1d(result, union, assume_unique=True)
+            if none_of and len(result):
+                excluded = np.unique(np.concatenate([self.candidates_with(s) for s in none_of]))
+                result = np.setdiff1d(result, excluded, assume_unique=True)
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = sum(len(ids) for ids in self._postings.values())
+            return {
+                "skills": len(self._postings),
+                "candidates": int(len(self._all)),
+                "postings": entries,
+                "memory_bytes": entries * 4 + int(self._all.nbytes),
+                "last_seq": self.last_seq,
+                "updated_candidates": self.updates,
+                "refreshed_at": self.refreshed_at,
+            }
+
+    # -- PostgreSQL ------------------------------------------------------------
+    @classmethod
+    def load(cls, conn) -> "SkillIndex":
+        """Build the index from candidate_skills."""
+        index = cls()
+        with conn.cursor() as cur:
+            cur.execute(SKILL_INDEX_DDL)
+            cur.execute("SELECT COALESCE(MAX(seq), 0) FROM candidate_skill_changes;")
+            index.last_seq = cur.fetchone()[0]
+            cur.execute("SELECT skill_name, skill_id FROM skills_master;")
+            index.set_names(dict(cur.fetchall()))
+            cur.execute("SELECT candidate_id FROM candidate_profiles;")
+            candidate_ids = [r[0] for r in cur]
+            cur.execute("SELECT candidate_id, skill_id FROM candidate_skills;")
+            index.build(cur, candidate_ids)
+        conn.commit()
+        index.refreshed_at = time.time()
+        return index
+
+    def refresh(self, conn) -> int:
+        """Apply candidate_skill_changes logged since the last refresh; returns #candidates updated."""
+        with conn.cursor() as cur:
+            cur.execute("SELECT COALESCE(MAX(seq), 0) FROM candidate_skill_changes;")
+            upto = cur.fetchone()[0]
+            if upto <= self.last_seq:
+                conn.commit()
+                self.refreshed_at = time.time()
+                return 0
+            cur.execute("""
+                WITH changed AS (
+                  SELECT DISTINCT candidate_id FROM candidate_skill_changes
+                  WHERE seq > %s AND seq <= %s
+                )
+                SELECT c.candidate_id, p.candidate_id IS NOT NULL,
+                       COALESCE(array_agg(cs.skill_id) FILTER (WHERE cs.skill_id IS NOT NULL), '{}')
+                FROM changed c
+                LEFT JOIN candidate_profiles p ON p.candidate_id = c.candidate_id
+                LEFT JOIN candidate_skills cs ON cs.candidate_id = c.candidate_id
+                GROUP BY c.candidate_id, p.candidate_id;
+            """, (self.last_seq, upto))
+            rows = cur.fetchall()
+            cur.execute("SELECT skill_name, skill_id FROM skills_master;")
+            names = dict(cur.fetchall())
+        conn.commit()
+        self.set_names(names)
+        self.apply({c: skills for c, exists, skills in rows if exists},
+                   removed=[c for c, exists, _ in rows if not exists])
+        self.last_seq = upto
+        self.refreshed_at = time.time()
+        return len(rows)
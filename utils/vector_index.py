@@ -0,0 +1,580 @@
+"""
+utils/vector_index.py
+
+Vector index backends shared by the embedding job (writer) and the retriever
+(reader):
+
+  - MilvusVectorIndex: the live Milvus collection.
+  - LocalVectorIndex:  an in-process index over a memory-mapped float32
+    matrix, searched with vectorized cosine top-k (brute force, or an IVF
+    coarse quantizer for larger corpora). No services required.
+    With LOCAL_INDEX_QUANTIZATION=int8|binary|pq, candidates are scored from
+    compact in-memory codes (utils/quantization.py) and the best
+    top_k * LOCAL_INDEX_RESCORE are re-ranked with the float32 vectors, so
+    only those rows of the memory map are ever read.
+
+Both return hits as dicts with chunk_id, jd_id, chunk_index, object_url, score,
+and accept JD metadata filters (utils/jd_metadata.py) that are applied inside
+the search: a Milvus boolean expression, or a row mask for the local index.
+
+On-disk layout of a local index (LOCAL_INDEX_DIR):
+
+    CURRENT                 name of the live generation directory
+    gen-<timestamp>/
+      meta.json             dim, count, nlist, quantization
+      vectors.f32           row-major float32 (count x dim), L2-normalized
+      jd_ids.npy            int64
+      chunk_index.npy       int64
+      chunk_ids.json        list[str]
+      object_urls.json      list[str]
+      centroids.npy         float32 (nlist x dim)     -- IVF only
+      list_offsets.npy      int64 (nlist + 1)         -- IVF only
+      codes.npy, codec.npz  quantized codes + codec parameters -- quantized only
+      metadata.json, meta_<field>.npy, tag_offsets.npy, tag_rows.npy
+                            JD metadata columns (see jd_metadata.py)
+
+Rows of an IVF index are stored grouped by list, so probing a list reads one
+contiguous slice of the memory map.
+
+By default both backends size their index to the collection with
+recommend_index(): exact (FLAT) search up to FLAT_MAX_ROWS rows, IVF_FLAT
+with nlist ~ 4 * sqrt(rows) above that, and HNSW (Milvus only) from
+HNSW_MIN_ROWS rows. The thresholds come from scripts/bench_index.py. A new generation is written next to the
+old one and published by atomically replacing CURRENT.
+"""
+
+import json
+import math
+import os
+import shutil
+import time
+from typing import Iterable, Optional
+
+import numpy as np
+
+from .jd_metadata import MetadataColumns, empty_meta, filters_key, milvus_expr, normalize_filters
+from .quantization import load_codec, save_codec, train_codec
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LOCAL_INDEX_DIR    = os.getenv("LOCAL_INDEX_DIR", os.path.join(root_dir, ".cache", "local_index"))
+LOCAL_INDEX_NLIST  = int(os.getenv("LOCAL_INDEX_NLIST", "-1"))  # -1 = auto (recommend_index), 0 = brute force
+LOCAL_INDEX_NPROBE = int(os.getenv("LOCAL_INDEX_NPROBE", "0"))   # 0 = auto (auto_nprobe)
+LOCAL_INDEX_QUANTIZATION = os.getenv("LOCAL_INDEX_QUANTIZATION", "none")  # none | int8 | binary | pq
+LOCAL_INDEX_PQ_M   = int(os.getenv("LOCAL_INDEX_PQ_M", "0"))    # PQ subspaces, 0 = dim / 8
+LOCAL_INDEX_RESCORE = int(os.getenv("LOCAL_INDEX_RESCORE", "4"))  # candidates rescored = top_k * this, 0 = off
+KEEP_GENERATIONS   = 2
+
+# Milvus index (built by jd_chunk_embed.py, searched by the retriever)
+MILVUS_INDEX_TYPE  = os.getenv("MILVUS_INDEX_TYPE", "AUTO")  # AUTO | FLAT | IVF_FLAT | IVF_SQ8 | IVF_PQ | HNSW
+MILVUS_NLIST       = int(os.getenv("MILVUS_NLIST", "0"))         # 0 = auto (auto_nlist)
+MILVUS_PQ_M        = int(os.getenv("MILVUS_PQ_M", "0"))          # 0 = dim / 8
+MILVUS_HNSW_M      = int(os.getenv("MILVUS_HNSW_M", "16"))
+MILVUS_HNSW_EF_CONSTRUCTION = int(os.getenv("MILVUS_HNSW_EF_CONSTRUCTION", "200"))
+MILVUS_EF          = int(os.getenv("MILVUS_EF", "64"))
+MILVUS_RESCORE     = int(os.getenv("MILVUS_RESCORE", "0"))      # rescore top_k * this with raw vectors, 0 = off
+# Collection sizes where the recommended index type changes (see recommend_index)
+FLAT_MAX_ROWS      = int(os.getenv("FLAT_MAX_ROWS", "20000"))
+HNSW_MIN_ROWS      = int(os.getenv("HNSW_MIN_ROWS", "1000000"))
+# Index types whose stored codes are lossy, i.e. where rescoring helps
+MILVUS_QUANTIZED_INDEXES = ("IVF_SQ8", "IVF_PQ")
+
+OUTPUT_FIELDS = ["chunk_id", "jd_id", "chunk_index", "object_url"]
+MASK_CACHE_SIZE = 256   # filter masks kept per local index
+
+
+def current_generation(root: str) -> Optional[str]:
+    """Directory of the live generation under `root`, or None."""
+    try:
+        with open(os.path.join(root, "CURRENT")) as f:
+            return os.path.join(root, f.read().strip())
+    except FileNotFoundError:
+        return None
+
+
+def new_generation(root: str) -> tuple[str, str]:
+    """Create an empty, unpublished generation directory; returns (name, path)."""
+    os.makedirs(root, exist_ok=True)
+    name = f"gen-{time.strftime('%Y%m%d%H%M%S')}-{time.time_ns() % 1_000_000_000:09d}"
+    path = os.path.join(root, name)
+    os.makedirs(path)
+    return name, path
+
+
+def publish_generation(root: str, name: str) -> None:
+    """Atomically point CURRENT at `name`, then drop old generations."""
+    tmp = os.path.join(root, "CURRENT.tmp")
+    with open(tmp, "w") as f:
+        f.write(name)
+    os.replace(tmp, os.path.join(root, "CURRENT"))
+    generations = sorted(d for d in os.listdir(root) if d.startswith("gen-"))
+    for old in generations[:-KEEP_GENERATIONS]:
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+
+
+def normalize(vectors) -> np.ndarray:
+    """Return `vectors` as a float32 matrix with L2-normalized rows."""
+    mat = np.asarray(vectors, dtype=np.float32)
+    if mat.ndim == 1:
+        mat = mat[None, :]
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return mat / norms
+
+
+def top_k_rows(scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Row-wise top-k of a (queries x candidates) score matrix, best first.
+    Uses argpartition so the cost is linear in the number of candidates.
+    """
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0), dtype=np.int64)
+        return empty, empty.astype(np.float32)
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(part_scores, order, axis=1)
+
+
+def train_ivf(vectors: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Spherical k-means coarse quantizer.
+
+    Returns:
+        (centroids, assignment) where assignment[i] is the list of row i.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    nlist = max(1, min(nlist, n))
+    sample = vectors[rng.choice(n, size=min(n, 256 * nlist), replace=False)]
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        # Per-list sums over the rows sorted by list (much faster than np.add.at)
+        counts = np.bincount(assign, minlength=nlist)
+        starts = np.cumsum(counts) - counts
+        empty = counts == 0
+        sums = np.empty_like(centroids)
+        sums[~empty] = np.add.reduceat(sample[np.argsort(assign, kind="stable")], starts[~empty], axis=0)
+        # Re-seed empty lists so every centroid stays useful
+        sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+        centroids = normalize(sums)
+    assignment = np.empty(n, dtype=np.int64)
+    for start in range(0, n, 65536):
+        assignment[start:start + 65536] = np.argmax(vectors[start:start + 65536] @ centroids.T, axis=1)
+    return centroids, assignment
+
+
+def auto_nlist(n: int) -> int:
+    """IVF list count for `n` rows: the power of two nearest 4 * sqrt(n)."""
+    return 2 ** round(math.log2(4 * math.sqrt(n))) if n else 1
+
+
+def auto_nprobe(nlist: int) -> int:
+    """Lists probed per query: 1/64 of them, at least 8 (recall@10 >= 0.99 in bench_index.py)."""
+    return max(1, min(nlist, max(8, nlist // 64)))
+
+
+def recommend_index(n: int, hnsw: bool = True) -> dict:
+    """
+    Index configuration for a collection of `n` rows:
+      - FLAT up to FLAT_MAX_ROWS: exact, and a scan still takes a few ms
+      - HNSW from HNSW_MIN_ROWS (if `hnsw`; the local index has no graph index)
+      - IVF_FLAT otherwise, with auto_nlist(n) lists and auto_nprobe probes
+    """
+    if n <= FLAT_MAX_ROWS:
+        return {"index_type": "FLAT", "nlist": 0, "nprobe": 0}
+    if hnsw and n >= HNSW_MIN_ROWS:
+        return {"index_type": "HNSW", "M": MILVUS_HNSW_M, "ef": MILVUS_EF}
+    nlist = auto_nlist(n)
+    return {"index_type": "IVF_FLAT", "nlist": nlist, "nprobe": auto_nprobe(nlist)}
+
+
+def milvus_index_params(dim: int, count: int, index_type: str = MILVUS_INDEX_TYPE,
+                        nlist: int = MILVUS_NLIST) -> dict:
+    """create_index params for the embedding field of a collection of `count` rows."""
+    if index_type == "AUTO":
+        index_type = recommend_index(count)["index_type"]
+    params: dict = {}
+    if index_type.startswith("IVF_"):
+        params["nlist"] = nlist or auto_nlist(count)
+    if index_type == "IVF_PQ":
+        m = MILVUS_PQ_M or max(1, dim // 8)
+        while dim % m:
+            m -= 1
+        params.update(m=m, nbits=8)
+    if index_type == "HNSW":
+        params.update(M=MILVUS_HNSW_M, efConstruction=MILVUS_HNSW_EF_CONSTRUCTION)
+    return {"metric_type": "COSINE", "index_type": index_type, "params": params}
+
+
+def milvus_search_params(index_type: str, limit: int, nprobe: int, ef: int = MILVUS_EF) -> dict:
+    """search params matching the index type."""
+    params: dict = {}
+    if index_type.startswith("IVF_"):
+        params["nprobe"] = nprobe
+    if index_type == "HNSW":
+        params["ef"] = max(ef, limit)  # Milvus requires ef >= limit
+    return {"metric_type": "COSINE", "params": params}
+
+
+def milvus_current_index(collection) -> Optional[dict]:
+    """{"index_type", "params"} of the collection's vector index, or None if it has none."""
+    if not collection.indexes:
+        return None
+    info = collection.indexes[0].params
+    params = info.get("params") or {}
+    if isinstance(params, str):
+        params = json.loads(params)
+    # Numbers may come back as strings ("nlist": "1024")
+    params = {k: int(v) if isinstance(v, str) and v.isdigit() else v for k, v in params.items()}
+    return {"index_type": info.get("index_type"), "params": params}
+
+
+class VectorIndex:
+    """Common interface of the retriever's vector backends."""
+
+    backend = "base"
+
+    def search(self, vectors: list[list[float]], top_k: int, filters: Optional[dict] = None) -> list[list[dict]]:
+        """
+        Return, for each query vector, up to `top_k` hits best first,
+        restricted to chunks matching `filters`.
+        """
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def health(self) -> dict:
+        return {"backend": self.backend, "total_entities": self.count()}
+
+
+class MilvusVectorIndex(VectorIndex):
+    backend = "milvus"
+
+    def __init__(self, collection_name: str, host: str, port: str, nprobe: int = 0,
+                 ef: int = MILVUS_EF, rescore: int = MILVUS_RESCORE):
+        from pymilvus import connections, Collection
+
+        connections.connect("default", host=host, port=port)
+        self.collection_name = collection_name
+        self.collection = Collection(collection_name)
+        # Load collection into memory for search operations
+        self.collection.load()
+        self.fields = {f.name for f in self.collection.schema.fields}
+        self.ef = ef
+        index = milvus_current_index(self.collection) or {"index_type": "FLAT", "params": {}}
+        self.index_type = index["index_type"]
+        self.nlist = int(index["params"].get("nlist", 0))
+        # 0 = sized to the index (auto_nprobe); Milvus rejects nprobe > nlist
+        self.nprobe = min(nprobe or auto_nprobe(self.nlist), self.nlist) if self.nlist else nprobe
+        # Rescoring only pays off when the index stores lossy codes
+        self.rescore = rescore if self.index_type in MILVUS_QUANTIZED_INDEXES else 0
+
+    def search(self, vectors: list[list[float]], top_k: int, filters: Optional[dict] = None) -> list[list[dict]]:
+        if any(field not in self.fields for field in normalize_filters(filters)):
+            raise ValueError("This Milvus collection was built without JD metadata; rebuild it (EMBED_MODE=full) to filter")
+        # Search in Milvus using COSINE similarity
+        limit = top_k * self.rescore if self.rescore else top_k
+        results = self.collection.search(
+            data=vectors,
+            anns_field="embedding",
+            param=milvus_search_params(self.index_type, limit, self.nprobe, self.ef),
+            limit=limit,
+            expr=milvus_expr(filters) or None,  # filtered inside the ANN search
+            output_fields=OUTPUT_FIELDS + (["embedding"] if self.rescore else [])
+        )
+        out = []
+        for query, hits in zip(normalize(vectors), results):
+            rows = [dict({f: hit.entity.get(f) for f in OUTPUT_FIELDS}, score=hit.score) for hit in hits]
+            if self.rescore and rows:
+                # Exact cosine against the raw vectors for the final top_k
+                exact = normalize([hit.entity.get("embedding") for hit in hits]) @ query
+                best, scores = top_k_rows(exact[None, :], top_k)
+                rows = [dict(rows[i], score=float(s)) for i, s in zip(best[0], scores[0])]
+            out.append(rows)
+        return out
+
+    def count(self) -> int:
+        return self.collection.num_entities
+
+    def health(self) -> dict:
+        # Check if collection is loaded
+        self.collection.load()
+        return {
+            "backend": self.backend,
+            "milvus_connected": True,
+            "collection_name": self.collection_name,
+            "total_entities": self.count(),
+            "collection_loaded": True,
+            "index_type": self.index_type,
+            "nlist": self.nlist,
+            "nprobe": self.nprobe,
+            "ef": self.ef if self.index_type == "HNSW" else None,
+            "rescore": self.rescore,
+        }
+
+
+class LocalVectorIndex(VectorIndex):
+    backend = "local"
+
+    def __init__(self, path: str, nprobe: int = LOCAL_INDEX_NPROBE, rescore: int = LOCAL_INDEX_RESCORE):
+        self.path = path
+        self.rescore = rescore
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.dim = self.meta["dim"]
+        self.nlist = self.meta["nlist"]
+        # 0 = sized to the index (auto_nprobe)
+        self.nprobe = nprobe or (auto_nprobe(self.nlist) if self.nlist else 0)
+        n = self.meta["count"]
+        self.vectors = (
+            np.memmap(os.path.join(path, "vectors.f32"), dtype=np.float32, mode="r", shape=(n, self.dim))
+            if n else np.zeros((0, self.dim), dtype=np.float32)
+        )
+        self.jd_ids = np.load(os.path.join(path, "jd_ids.npy"))
+        self.chunk_index = np.load(os.path.join(path, "chunk_index.npy"))
+        with open(os.path.join(path, "chunk_ids.json")) as f:
+            self.chunk_ids = json.load(f)
+        with open(os.path.join(path, "object_urls.json")) as f:
+            self.object_urls = json.load(f)
+        if self.nlist:
+            self.centroids = np.load(os.path.join(path, "centroids.npy"))
+            self.list_offsets = np.load(os.path.join(path, "list_offsets.npy"))
+        self.metadata = MetadataColumns.load(path)
+        self._masks: dict[tuple, np.ndarray] = {}
+        self.quantization = self.meta.get("quantization", "none")
+        self.codec = load_codec(path, self.quantization)
+        # Codes are scanned on every search: keep them in RAM
+        self.codes = np.load(os.path.join(path, "codes.npy")) if self.codec is not None else None
+
+    # -- loading / writing ---------------------------------------------------
+    @staticmethod
+    def current_path(root: str = LOCAL_INDEX_DIR) -> Optional[str]:
+        """Directory of the live generation under `root`, or None."""
+        return current_generation(root)
+
+    @classmethod
+    def open(cls, root: str = LOCAL_INDEX_DIR, nprobe: int = LOCAL_INDEX_NPROBE,
+             rescore: int = LOCAL_INDEX_RESCORE) -> "LocalVectorIndex":
+        path = cls.current_path(root)
+        if path is None:
+            raise FileNotFoundError(f"No local vector index published under {root}")
+        return cls(path, nprobe=nprobe, rescore=rescore)
+
+    @staticmethod
+    def write(root: str, chunk_ids: list[str], vectors, jd_ids, chunk_indexes, object_urls: list[str],
+              nlist: int = LOCAL_INDEX_NLIST, metadata: Optional[list[dict]] = None,
+              quantization: str = LOCAL_INDEX_QUANTIZATION, pq_m: int = LOCAL_INDEX_PQ_M) -> str:
+        """
+        Write a new generation under `root` and publish it. Returns its path.
+        `metadata` holds one JD metadata dict per row (needed for filters).
+        `nlist` < 0 sizes the IVF to the row count (recommend_index).
+        """
+        mat = normalize(vectors) if len(chunk_ids) else np.zeros((0, 0), dtype=np.float32)
+        jd_ids = np.asarray(jd_ids, dtype=np.int64)
+        chunk_indexes = np.asarray(chunk_indexes, dtype=np.int64)
+        n, dim = len(chunk_ids), (mat.shape[1] if len(chunk_ids) else 0)
+
+        extra = {}
+        if nlist < 0:
+            nlist = recommend_index(n, hnsw=False)["nlist"]
+        nlist = min(nlist, n)
+        if nlist:
+            centroids, assignment = train_ivf(mat, nlist)
+            order = np.argsort(assignment, kind="stable")
+            mat, jd_ids, chunk_indexes = mat[order], jd_ids[order], chunk_indexes[order]
+            chunk_ids = [chunk_ids[i] for i in order]
+            object_urls = [object_urls[i] for i in order]
+            if metadata is not None:
+                metadata = [metadata[i] for i in order]
+            offsets = np.zeros(nlist + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum(np.bincount(assignment, minlength=nlist))
+            extra = {"centroids.npy": centroids, "list_offsets.npy": offsets}
+
+        codec = train_codec(quantization, mat, pq_m) if n else None
+
+        name, path = new_generation(root)
+        mat.tofile(os.path.join(path, "vectors.f32"))
+        if codec is not None:
+            np.save(os.path.join(path, "codes.npy"), codec.encode(mat))
+            save_codec(path, codec)
+        np.save(os.path.join(path, "jd_ids.npy"), jd_ids)
+        np.save(os.path.join(path, "chunk_index.npy"), chunk_indexes)
+        for fname, arr in extra.items():
+            np.save(os.path.join(path, fname), arr)
+        with open(os.path.join(path, "chunk_ids.json"), "w") as f:
+            json.dump(list(chunk_ids), f)
+        with open(os.path.join(path, "object_urls.json"), "w") as f:
+            json.dump(list(object_urls), f)
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"dim": dim, "count": n, "nlist": nlist, "metric": "COSINE",
+                       "quantization": codec.name if codec is not None else "none", "created_at": time.time()}, f)
+        if metadata is not None:
+            MetadataColumns.build(metadata).save(path)
+
+        publish_generation(root, name)
+        return path
+
+    # -- search --------------------------------------------------------------
+    def _hits(self, rows: np.ndarray, scores: np.ndarray) -> list[dict]:
+        return [
+            {
+                "chunk_id": self.chunk_ids[r],
+                "jd_id": int(self.jd_ids[r]),
+                "chunk_index": int(self.chunk_index[r]),
+                "object_url": self.object_urls[r],
+                "score": float(s),
+            }
+            for r, s in zip(rows, scores)
+        ]
+
+    def filter_mask(self, filters: Optional[dict]) -> Optional[np.ndarray]:
+        """Row mask for `filters` (cached per distinct filter), None when unfiltered."""
+        if not normalize_filters(filters):
+            return None
+        if self.metadata is None:
+            raise ValueError("This local index was built without JD metadata; rebuild it (EMBED_MODE=full) to filter")
+        key = filters_key(filters)
+        mask = self._masks.get(key)
+        if mask is None:
+            if len(self._masks) >= MASK_CACHE_SIZE:
+                self._masks.clear()
+            mask = self._masks[key] = self.metadata.mask(filters)
+        return mask
+
+    def _scores(self, queries: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """(queries x rows) cosine scores; estimated from the codes on a quantized index."""
+        if self.codec is None:
+            return queries @ (self.vectors if rows is None else self.vectors[rows]).T
+        return self.codec.scores(queries, self.codes if rows is None else self.codes[rows])
+
+    def _top_hits(self, queries: np.ndarray, scores: np.ndarray, top_k: int,
+                  rows: Optional[np.ndarray] = None) -> list[list[dict]]:
+        """
+        Best hits per query from a (queries x candidates) score matrix whose
+        column j is row rows[j] (row j when rows is None). On a quantized
+        index the best top_k * rescore candidates are re-ranked exactly.
+        """
+        rescore = self.codec is not None and self.rescore > 0
+        best, best_scores = top_k_rows(scores, top_k * self.rescore if rescore else top_k)
+        out = []
+        for q, b, s in zip(queries, best, best_scores):
+            keep = np.isfinite(s)
+            candidates, s = (b[keep] if rows is None else rows[b[keep]]), s[keep]
+            if rescore and len(candidates):
+                candidates = np.sort(candidates)  # sequential reads of the memory map
+                r, s = top_k_rows((np.asarray(self.vectors[candidates]) @ q)[None, :], top_k)
+                candidates, s = candidates[r[0]], s[0]
+            out.append(self._hits(candidates, s))
+        return out
+
+    def _search_rows(self, queries: np.ndarray, rows: np.ndarray, top_k: int) -> list[list[dict]]:
+        """Search restricted to `rows`."""
+        if not len(rows):
+            return [[] for _ in range(len(queries))]
+        return self._top_hits(queries, self._scores(queries, rows), top_k, rows)
+
+    def search(self, vectors: list[list[float]], top_k: int, filters: Optional[dict] = None) -> list[list[dict]]:
+        queries = normalize(vectors)
+        if not len(self.chunk_ids):
+            return [[] for _ in range(len(queries))]
+        mask = self.filter_mask(filters)
+        selected = np.flatnonzero(mask) if mask is not None else None
+
+        if not self.nlist:
+            if selected is not None and len(selected) < len(self.chunk_ids) // 2:
+                # Selective filter: score only the matching rows (less work than unfiltered)
+                return self._search_rows(queries, selected, top_k)
+            scores = self._scores(queries)
+            if mask is not None:
+                scores[:, ~mask] = -np.inf
+            return self._top_hits(queries, scores, top_k)
+
+        # IVF: probe the nprobe closest lists of each query
+        probe, _ = top_k_rows(queries @ self.centroids.T, self.nprobe)
+        probed_rows = self.nprobe * len(self.chunk_ids) // self.nlist
+        if selected is not None and len(selected) <= probed_rows:
+            # Fewer matching rows than a probe would scan: exact search over them
+            return self._search_rows(queries, selected, top_k)
+        out = []
+        for q, lists in zip(queries, probe):
+            candidates = np.concatenate(
+                [np.arange(self.list_offsets[l], self.list_offsets[l + 1]) for l in lists]
+            )
+            if mask is not None:
+                candidates = candidates[mask[candidates]]
+            if not len(candidates):
+                out.append([])
+                continue
+            out += self._top_hits(q[None, :], self._scores(q[None, :], candidates), top_k, candidates)
+        return out
+
+    def count(self) -> int:
+        return len(self.chunk_ids)
+
+    def health(self) -> dict:
+        return {
+            "backend": self.backend,
+            "index_path": self.path,
+            "total_entities": self.count(),
+            "nlist": self.nlist,
+            "nprobe": self.nprobe,
+            "metadata": self.metadata is not None,
+            "quantization": self.quantization,
+            "rescore": self.rescore if self.codec is not None else 0,
+            # What a search scans in RAM (float32 rows stay memory-mapped when quantized)
+            "vector_bytes": int(self.codes.nbytes if self.codes is not None else self.vectors.nbytes),
+        }
+
+
+class LocalIndexBuilder:
+    """
+    Maintains a local index incrementally: starts from the live generation,
+    drops the rows of changed/removed JDs and appends the new rows.
+    """
+
+    def __init__(self, root: str = LOCAL_INDEX_DIR, full: bool = False):
+        self.root = root
+        self.base = None
+        if not full and LocalVectorIndex.current_path(root):
+            self.base = LocalVectorIndex.open(root)
+        self.dropped: set[int] = set()
+        self.rows: list[tuple] = []
+        self.metas: list[dict] = []
+
+    def drop_jds(self, jd_ids: Iterable[int]) -> None:
+        self.dropped.update(int(j) for j in jd_ids)
+
+    def add(self, chunk_id: str, vector: list[float], jd_id: int, chunk_index: int, object_url: str,
+            meta: Optional[dict] = None) -> None:
+        self.rows.append((chunk_id, vector, jd_id, chunk_index, object_url))
+        self.metas.append(meta or empty_meta())
+
+    def save(self, nlist: int = LOCAL_INDEX_NLIST) -> str:
+        chunk_ids, vectors, jd_ids, idxs, urls, metas = [], [], [], [], [], []
+        parts = []
+        if self.base is not None and self.base.count():
+            keep = ~np.isin(self.base.jd_ids, np.fromiter(self.dropped, dtype=np.int64, count=len(self.dropped)))
+            keep_rows = np.flatnonzero(keep)
+            parts.append(np.asarray(self.base.vectors[keep_rows]))
+            chunk_ids += [self.base.chunk_ids[r] for r in keep_rows]
+            jd_ids += self.base.jd_ids[keep_rows].tolist()
+            idxs += self.base.chunk_index[keep_rows].tolist()
+            urls += [self.base.object_urls[r] for r in keep_rows]
+            if self.base.metadata is not None:
+                metas += self.base.metadata.rows_meta(keep_rows)
+            else:
+                metas += [empty_meta() for _ in keep_rows]
+        if self.rows:
+            new_ids, new_vecs, new_jds, new_idxs, new_urls = zip(*self.rows)
+            parts.append(normalize(new_vecs))
+            chunk_ids += new_ids
+            jd_ids += new_jds
+            idxs += new_idxs
+            urls += new_urls
+            metas += self.metas
+        vectors = np.vstack(parts) if parts else np.zeros((0, 0), dtype=np.float32)
+        return LocalVectorIndex.write(self.root, chunk_ids, vectors, jd_ids, idxs, urls, nlist=nlist, metadata=metas)